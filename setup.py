@@ -8,10 +8,12 @@ setup(
     install_requires=[
         "click>=8.0.0",
         "tqdm>=4.65.0",
+        "py7zr>=1.0.0",
     ],
     entry_points={
         "console_scripts": [
             "extract-archives=archiver.cli:main",
+            "archiver=archiver.cli:cli",
         ],
     },
     author="ggfevans",
@@ -2,10 +2,8 @@
 recursive-archive-extractor: A tool for recursively extracting archives in directories
 """
 
-from .core import ArchiveProcessor
+from .core import ArchiveProcessor, ArchiveResult
 from .extractors.base import BaseExtractor
-from .extractors.zip import ZipExtractor
-from .extractors.rar import RarExtractor
 
 __version__ = "0.1.0"
 __author__ = "ggfevans"
@@ -13,7 +11,21 @@ __author_email__ = "admin@local.host"
 
 __all__ = [
     "ArchiveProcessor",
+    "ArchiveResult",
     "BaseExtractor",
     "ZipExtractor",
     "RarExtractor",
 ]
+
+# Extractor classes are imported on first access, like the extractors the
+# processor creates, so importing the package stays cheap
+_LAZY_EXTRACTORS = {
+    "ZipExtractor": "zip",
+    "RarExtractor": "rar",
+}
+
+def __getattr__(name):
+    if name in _LAZY_EXTRACTORS:
+        from .extractors import load_extractor_class
+        return load_extractor_class(_LAZY_EXTRACTORS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,107 @@
+import io
+import logging
+import os
+import shutil
+import tarfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List
+
+from .core import ArchiveProcessor
+from .utils.config import ArchiveConfig
+from .utils.durability import DURABILITY_MODES
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BenchmarkResult:
+    """Timing of one extraction in a durability mode."""
+    mode: str
+    seconds: float
+    files: int
+    bytes: int
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / self.seconds / (1024 * 1024) if self.seconds else 0.0
+
+def build_tarball(archive_path: Path, files: int, file_size: int, per_directory: int = 100) -> int:
+    """Write an uncompressed tarball of random files.
+
+    Args:
+        archive_path: Tarball to create
+        files: Number of files
+        file_size: Size of each file
+        per_directory: Files per directory inside the tarball
+
+    Returns:
+        Total size of the files
+    """
+    with tarfile.open(archive_path, 'w') as tar:
+        for i in range(files):
+            info = tarfile.TarInfo(f"data/{i // per_directory:04d}/{i:06d}.bin")
+            info.size = file_size
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(os.urandom(file_size)))
+    return files * file_size
+
+def benchmark_durability(
+    work_dir: Path,
+    files: int = 2000,
+    file_size: int = 16 * 1024,
+    modes: Iterable[str] = DURABILITY_MODES
+) -> List[BenchmarkResult]:
+    """Extract the same tarball once per durability mode and time it.
+
+    Every run extracts into a fresh directory, and the page cache is
+    flushed before each one so a mode doesn't pay for the writeback of
+    the previous run.
+
+    Args:
+        work_dir: Directory on the filesystem to measure
+        files: Number of files in the tarball
+        file_size: Size of each file
+        modes: Durability modes to measure
+
+    Returns:
+        One result per mode
+    """
+    work_dir.mkdir(parents=True, exist_ok=True)
+    archive_path = work_dir / 'benchmark.tar'
+    total = build_tarball(archive_path, files, file_size)
+
+    results = []
+    for mode in modes:
+        run_dir = work_dir / f"run-{mode}"
+        shutil.rmtree(run_dir, ignore_errors=True)
+        run_dir.mkdir()
+        run_archive = run_dir / archive_path.name
+        os.link(archive_path, run_archive)
+
+        config = ArchiveConfig(
+            base_dir=run_dir,
+            durability=mode,
+            verify_integrity=False,
+            reserve_disk_space=False,
+            failure_cache=False
+        )
+        processor = ArchiveProcessor(config=config)
+        os.sync()
+        start = time.perf_counter()
+        job = processor.process_archive(run_archive)
+        seconds = time.perf_counter() - start
+        processor.durability.close()
+        if not job.success:
+            raise RuntimeError(f"Extraction failed in durability mode {mode}")
+
+        logger.info(f"Durability {mode}: {seconds:.2f}s for {files} files")
+        results.append(BenchmarkResult(mode=mode, seconds=seconds, files=files, bytes=total))
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    archive_path.unlink()
+    return results
@@ -1,11 +1,115 @@
 import logging
 from pathlib import Path
+import shutil
+import signal
 import sys
 import click
+from click.core import ParameterSource
 
 from .core import ArchiveProcessor
+from .utils.durability import DURABILITY_MODES
 from .utils.logging import setup_logging
-from .utils.config import ArchiveConfig
+from .utils.config import ArchiveConfig, parse_size
+
+def _parse_size_option(ctx: click.Context, param: click.Parameter, value: str | None) -> int | None:
+    """Click callback converting a human readable size option to bytes."""
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+def _parse_device_workers_option(
+    ctx: click.Context,
+    param: click.Parameter,
+    value: tuple[str, ...]
+) -> dict[str, int]:
+    """Click callback converting ``PATH=N`` options to a limit per path."""
+    limits = {}
+    for item in value:
+        path, sep, count = item.rpartition('=')
+        if not sep or not path or not count.isdigit() or int(count) < 1:
+            raise click.BadParameter(f"Expected PATH=N with N at least 1: {item}")
+        limits[path] = int(count)
+    return limits
+
+# Configuration setting changed by each option of the extract command
+EXTRACT_OPTION_SETTINGS = {
+    'verbose': 'verbose',
+    'dry_run': 'dry_run',
+    'log_file': 'log_file',
+    'parallel': 'parallel_processing',
+    'max_workers': 'max_workers',
+    'order': 'schedule_policy',
+    'scan_workers': 'scan_workers',
+    'device_workers': 'device_workers',
+    'auto_device_workers': 'auto_device_workers',
+    'starvation_limit': 'starvation_limit',
+    'delete_after': 'delete_after_extract',
+    'verify': 'verify_integrity',
+    'atomic': 'atomic_extraction',
+    'resume': 'resumable_extraction',
+    'preserve_metadata': 'preserve_metadata',
+    'durability': 'durability',
+    'space_check': 'reserve_disk_space',
+    'min_free_space': 'min_free_space',
+    'max_ratio': 'max_compression_ratio',
+    'max_output': 'max_output_size',
+    'max_members': 'max_archive_members',
+    'max_write_rate': 'max_write_rate',
+    'nice': 'nice',
+    'io_idle': 'io_idle',
+    'adaptive_workers': 'adaptive_concurrency',
+    'hooks': 'hook_commands',
+    'hook_callables': 'hook_callables',
+    'hook_workers': 'hook_workers',
+    'hook_window': 'hook_batch_window',
+    'hook_batch_size': 'hook_batch_size',
+    'hook_group_by': 'hook_group_by',
+    'coordination_dir': 'coordination_dir',
+    'lease_ttl': 'lease_ttl',
+    'failure_cache': 'failure_cache',
+    'retry_failed': 'retry_failed',
+    'quarantine_dir': 'quarantine_dir',
+    'process_nested': 'process_nested',
+    'max_depth': 'max_depth',
+    'enable_zip': 'enable_zip',
+    'enable_rar': 'enable_rar',
+    'enable_7z': 'enable_7z',
+    'enable_tar': 'enable_tar',
+    'skip_existing': 'skip_existing',
+    'passwords': 'passwords',
+    'password_file': 'password_file',
+    'include': 'include_patterns',
+    'exclude': 'exclude_patterns',
+    'min_size': 'min_member_size',
+    'max_size': 'max_member_size',
+    'dedup': 'dedup_mode',
+    'dedup_min_size': 'dedup_min_size',
+    'dedup_index': 'dedup_index_file',
+}
+
+def _given_settings(ctx: click.Context, option_settings: dict[str, str]) -> dict[str, object]:
+    """Return the configuration settings of the options given on the command line.
+
+    Options left at their default don't override the configuration, so a
+    setting from a configuration file only changes when its option is given.
+
+    Args:
+        ctx: Context of the invoked command
+        option_settings: Configuration setting of each option, by parameter name
+
+    Returns:
+        Settings to merge into the configuration
+    """
+    settings = {}
+    for name, key in option_settings.items():
+        if ctx.get_parameter_source(name) in (None, ParameterSource.DEFAULT):
+            continue
+        value = ctx.params[name]
+        settings[key] = list(value) if isinstance(value, tuple) else value
+    return settings
 
 @click.command()
 @click.argument(
@@ -44,6 +148,35 @@ from .utils.config import ArchiveConfig
     default=4,
     help='Maximum number of parallel workers'
 )
+@click.option(
+    '--order',
+    type=click.Choice(['fifo', 'smallest', 'newest', 'shortest-time']),
+    help='Order in which found archives are processed (default fifo)'
+)
+@click.option(
+    '--scan-workers',
+    type=click.IntRange(min=0),
+    help='Directories to list at once while scanning (default: 16 on network '
+         'filesystems, 1 on local disks)'
+)
+@click.option(
+    '--device-workers',
+    multiple=True,
+    callback=_parse_device_workers_option,
+    help='Extract at most N archives at once reading from or writing to the device '
+         'holding PATH, as PATH=N (can be repeated)'
+)
+@click.option(
+    '--auto-device-workers',
+    is_flag=True,
+    help='Tune the number of archives extracted at once per device from measured throughput'
+)
+@click.option(
+    '--starvation-limit',
+    type=int,
+    help='Process an archive first once this many others were dispatched while it waited '
+         '(default 100)'
+)
 @click.option(
     '--delete-after/--no-delete-after',
     default=False,
@@ -54,6 +187,133 @@ from .utils.config import ArchiveConfig
     default=True,
     help='Verify archive integrity before extraction'
 )
+@click.option(
+    '--atomic/--no-atomic',
+    default=True,
+    help='Extract into a hidden staging directory and rename into place on success '
+         '(default on)'
+)
+@click.option(
+    '--resume/--no-resume',
+    default=True,
+    help='Keep interrupted atomic extractions and skip their finished members on the next run '
+         '(default on)'
+)
+@click.option(
+    '--preserve-metadata/--no-preserve-metadata',
+    default=True,
+    help='Apply the permissions and timestamps stored in archives to extracted files (default on)'
+)
+@click.option(
+    '--durability',
+    type=click.Choice(['none', 'archive', 'directory', 'file']),
+    help='How extracted files are flushed to disk: not at all (default), one syncfs '
+         'per archive, batched fsyncs per directory, or an fsync per file'
+)
+@click.option(
+    '--space-check/--no-space-check',
+    default=True,
+    help='Defer extractions until their declared size fits in free disk space (default on)'
+)
+@click.option(
+    '--min-free-space',
+    callback=_parse_size_option,
+    help='Free space to always leave on the target filesystem (e.g. 1G)'
+)
+@click.option(
+    '--max-ratio',
+    type=click.FloatRange(min=0),
+    help='Abort archives that expand more than this many times their size '
+         '(default 1000, 0 for no limit)'
+)
+@click.option(
+    '--max-output',
+    callback=_parse_size_option,
+    help='Abort archives whose output exceeds this size (e.g. 100G)'
+)
+@click.option(
+    '--max-members',
+    type=click.IntRange(min=0),
+    help='Abort archives with more than this many members'
+)
+@click.option(
+    '--max-write-rate',
+    callback=_parse_size_option,
+    help='Limit bytes written per second across all workers (e.g. 50M)'
+)
+@click.option(
+    '--nice',
+    type=click.IntRange(0, 19),
+    help='Nice level for extraction workers and unrar'
+)
+@click.option(
+    '--io-idle',
+    is_flag=True,
+    help='Run extraction workers and unrar in the idle I/O scheduling class'
+)
+@click.option(
+    '--adaptive-workers',
+    is_flag=True,
+    help='Reduce the number of parallel workers while write latency is high'
+)
+@click.option(
+    '--hook',
+    'hooks',
+    multiple=True,
+    help='Shell command run on each batch of extracted archives, with the batch as JSON '
+         'on stdin and $ARCHIVER_DIRECTORY, $ARCHIVER_ARCHIVES set (can be repeated)'
+)
+@click.option(
+    '--hook-callable',
+    'hook_callables',
+    multiple=True,
+    help='Python function, as module:function, called with each batch (can be repeated)'
+)
+@click.option(
+    '--hook-workers',
+    type=click.IntRange(min=1),
+    help='Batches of hooks run at once (default 2)'
+)
+@click.option(
+    '--hook-window',
+    type=click.FloatRange(min=0),
+    help='Seconds to collect extracted archives into one batch (default 5)'
+)
+@click.option(
+    '--hook-batch-size',
+    type=click.IntRange(min=1),
+    help='Send a batch early once it holds this many archives (default 100)'
+)
+@click.option(
+    '--hook-group-by',
+    type=click.Choice(['directory', 'none']),
+    help='Batch archives per directory (default) or all together'
+)
+@click.option(
+    '--coordination-dir',
+    type=click.Path(file_okay=False, path_type=Path),
+    help='Shared directory for lease files when several hosts process the same tree'
+)
+@click.option(
+    '--lease-ttl',
+    type=float,
+    help='Seconds without heartbeat after which another host takes over an archive'
+)
+@click.option(
+    '--failure-cache/--no-failure-cache',
+    default=False,
+    help='Skip archives that failed before until they change or their backoff expires (default off)'
+)
+@click.option(
+    '--retry-failed',
+    is_flag=True,
+    help='Retry archives in the failure cache even if they are backing off'
+)
+@click.option(
+    '--quarantine-dir',
+    type=click.Path(file_okay=False, path_type=Path),
+    help='Move archives that keep failing into this directory, enables --failure-cache'
+)
 # Nested archive options
 @click.option(
     '--process-nested/--no-process-nested',
@@ -94,8 +354,52 @@ from .utils.config import ArchiveConfig
     help='Skip extraction if files already exist'
 )
 @click.option(
-    '--password',
-    help='Password for encrypted archives'
+    '--password', 'passwords',
+    multiple=True,
+    help='Password for encrypted archives; may be repeated to try several'
+)
+@click.option(
+    '--password-file',
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help='File with one candidate password per line'
+)
+# Member filter options
+@click.option(
+    '--include',
+    multiple=True,
+    help='Only extract members matching this glob (e.g. "*.epub"); may be repeated'
+)
+@click.option(
+    '--exclude',
+    multiple=True,
+    help='Skip members matching this glob (e.g. "*.nfo", "Proof/"); may be repeated'
+)
+@click.option(
+    '--min-size',
+    callback=_parse_size_option,
+    help='Skip members smaller than this size (e.g. 10M)'
+)
+@click.option(
+    '--max-size',
+    callback=_parse_size_option,
+    help='Skip members larger than this size (e.g. 4G)'
+)
+# Deduplication options
+@click.option(
+    '--dedup',
+    type=click.Choice(['off', 'hardlink', 'reflink']),
+    help='Link extracted files identical to earlier output instead of writing them again '
+         '(default off)'
+)
+@click.option(
+    '--dedup-min-size',
+    callback=_parse_size_option,
+    help='Only deduplicate files at least this large (default 1M)'
+)
+@click.option(
+    '--dedup-index',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='File to persist the deduplication index between runs'
 )
 def main(
     directory: Path,
@@ -105,8 +409,37 @@ def main(
     config: Path | None,
     parallel: bool,
     max_workers: int,
+    order: str | None,
+    scan_workers: int | None,
+    device_workers: dict[str, int],
+    auto_device_workers: bool,
+    starvation_limit: int | None,
     delete_after: bool,
     verify: bool,
+    atomic: bool,
+    resume: bool,
+    preserve_metadata: bool,
+    durability: str | None,
+    space_check: bool,
+    min_free_space: int | None,
+    max_ratio: float | None,
+    max_output: int | None,
+    max_members: int | None,
+    max_write_rate: int | None,
+    nice: int | None,
+    io_idle: bool,
+    adaptive_workers: bool,
+    hooks: tuple[str, ...],
+    hook_callables: tuple[str, ...],
+    hook_workers: int | None,
+    hook_window: float | None,
+    hook_batch_size: int | None,
+    hook_group_by: str | None,
+    coordination_dir: Path | None,
+    lease_ttl: float | None,
+    failure_cache: bool,
+    retry_failed: bool,
+    quarantine_dir: Path | None,
     process_nested: bool,
     max_depth: int,
     enable_zip: bool,
@@ -114,7 +447,15 @@ def main(
     enable_7z: bool,
     enable_tar: bool,
     skip_existing: bool,
-    password: str | None,
+    passwords: tuple[str, ...],
+    password_file: Path | None,
+    include: tuple[str, ...],
+    exclude: tuple[str, ...],
+    min_size: int | None,
+    max_size: int | None,
+    dedup: str | None,
+    dedup_min_size: int | None,
+    dedup_index: Path | None,
 ) -> None:
     """
     Recursively extract archives in the specified directory.
@@ -122,49 +463,16 @@ def main(
     DIRECTORY: The target directory to process
     """
     try:
+        settings = _given_settings(click.get_current_context(), EXTRACT_OPTION_SETTINGS)
+
         # Initialize configuration
         if config:
-            # Load from config file
+            # Load from config file and override with the options given
             config_obj = ArchiveConfig.from_file(config)
-            # Override with command line arguments
-            config_obj.merge({
-                'base_dir': directory,
-                'verbose': verbose,
-                'dry_run': dry_run,
-                'log_file': log_file,
-                'parallel_processing': parallel,
-                'max_workers': max_workers,
-                'delete_after_extract': delete_after,
-                'verify_integrity': verify,
-                'process_nested': process_nested,
-                'max_depth': max_depth,
-                'enable_zip': enable_zip,
-                'enable_rar': enable_rar,
-                'enable_7z': enable_7z,
-                'enable_tar': enable_tar,
-                'skip_existing': skip_existing,
-                'password': password,
-            })
+            config_obj.merge({'base_dir': directory, **settings})
         else:
             # Create config from command line arguments
-            config_obj = ArchiveConfig(
-                base_dir=directory,
-                dry_run=dry_run,
-                verbose=verbose,
-                log_file=log_file,
-                parallel_processing=parallel,
-                max_workers=max_workers,
-                delete_after_extract=delete_after,
-                verify_integrity=verify,
-                process_nested=process_nested,
-                max_depth=max_depth,
-                enable_zip=enable_zip,
-                enable_rar=enable_rar,
-                enable_7z=enable_7z,
-                enable_tar=enable_tar,
-                skip_existing=skip_existing,
-                password=password,
-            )
+            config_obj = ArchiveConfig(base_dir=directory, **settings)
 
         # Validate configuration
         config_obj.validate()
@@ -178,6 +486,7 @@ def main(
         # Create and run processor
         processor = ArchiveProcessor(config=config_obj)
         stats = processor.process_directory()
+        processor.close()
 
         # Print summary
         click.echo("\n=== Processing Summary ===")
@@ -187,6 +496,27 @@ def main(
         click.echo(f"Failed extractions: {stats['failed_extractions']}")
         if 'nested_archives_processed' in stats:
             click.echo(f"Nested archives processed: {stats['nested_archives_processed']}")
+        if 'skipped_archives' in stats:
+            click.echo(f"Archives handled by other hosts: {stats['skipped_archives']}")
+        if stats.get('known_bad_archives'):
+            click.echo(
+                f"Known-bad archives skipped: {stats['known_bad_archives']} "
+                f"(unchanged since they failed; --retry-failed to try again)"
+            )
+        if 'throttled_seconds' in stats:
+            click.echo(f"Seconds throttled by the write rate limit: {stats['throttled_seconds']}")
+        if 'device_limits' in stats:
+            click.echo(f"Archives extracted at once per device: {stats['device_limits']}")
+        if 'hook_batches' in stats:
+            click.echo(
+                f"Post-extraction hook batches: {stats['hook_batches']} "
+                f"({stats['hook_failures']} failed)"
+            )
+        if 'deduplicated_files' in stats:
+            click.echo(
+                f"Deduplicated files: {stats['deduplicated_files']} "
+                f"({stats['deduplicated_bytes']} bytes not written)"
+            )
 
         # Exit with error if any extractions failed
         if stats['failed_extractions'] > 0:
@@ -196,5 +526,320 @@ def main(
         click.echo(f"Error: {str(e)}", err=True)
         sys.exit(1)
 
+@click.group()
+def cli() -> None:
+    """Recursive archive extractor."""
+
+cli.add_command(main, name='extract')
+
+@cli.command()
+@click.argument(
+    'directory',
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+    required=False,
+)
+@click.option(
+    '--socket', 'socket_path',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='Unix socket to listen on (default: $XDG_RUNTIME_DIR/archiver.sock)'
+)
+@click.option(
+    '--config',
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help='Path to configuration file'
+)
+@click.option(
+    '--max-jobs',
+    type=int,
+    default=2,
+    help='Number of jobs processed concurrently'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose output'
+)
+@click.option(
+    '--log-file',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='Log file to write to'
+)
+def serve(
+    directory: Path | None,
+    socket_path: Path | None,
+    config: Path | None,
+    max_jobs: int,
+    verbose: bool,
+    log_file: Path | None,
+) -> None:
+    """
+    Run a resident extraction daemon that accepts jobs over a Unix socket.
+
+    DIRECTORY: Default directory for scan jobs (default: current directory)
+    """
+    from .daemon import ArchiveDaemon
+
+    try:
+        base_dir = directory or Path.cwd()
+        if config:
+            config_obj = ArchiveConfig.from_file(config)
+            config_obj.base_dir = base_dir
+        else:
+            config_obj = ArchiveConfig(base_dir=base_dir)
+        if verbose:
+            config_obj.verbose = True
+        if log_file:
+            config_obj.log_file = log_file
+        config_obj.validate()
+
+        setup_logging(log_file=config_obj.log_file, verbose=config_obj.verbose)
+
+        daemon = ArchiveDaemon(
+            ArchiveProcessor(config=config_obj),
+            socket_path=socket_path,
+            max_jobs=max_jobs
+        )
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.shutdown())
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            daemon.shutdown()
+
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command()
+@click.argument('path', type=click.Path(exists=True, path_type=Path))
+@click.option(
+    '--socket', 'socket_path',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='Socket of the daemon (default: $XDG_RUNTIME_DIR/archiver.sock)'
+)
+@click.option(
+    '--scan',
+    is_flag=True,
+    help='Scan PATH as a directory tree instead of extracting it'
+)
+@click.option(
+    '--wait',
+    is_flag=True,
+    help='Wait for the job to finish and exit non-zero if it failed'
+)
+def submit(path: Path, socket_path: Path | None, scan: bool, wait: bool) -> None:
+    """
+    Submit an extraction job to a running daemon.
+
+    PATH: Archive or directory to process
+    """
+    from .daemon import default_socket_path, send_request
+
+    try:
+        response = send_request(
+            {'op': 'scan' if scan else 'extract', 'path': str(path.absolute()), 'wait': wait},
+            socket_path=socket_path or default_socket_path()
+        )
+    except ConnectionError as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+    if not response.get('ok'):
+        click.echo(f"Error: {response.get('error')}", err=True)
+        sys.exit(1)
+
+    job = response['job']
+    result = job.get('result')
+    if result is None:
+        click.echo(f"Job {job['id']} {job['status']}")
+    elif 'error' in result:
+        click.echo(f"Job {job['id']} failed: {result['error']}", err=True)
+        sys.exit(1)
+    else:
+        click.echo(
+            f"Job {job['id']} {job['status']}: {result['successful']} successful, "
+            f"{result['failed']} failed"
+        )
+        if result['failed']:
+            sys.exit(1)
+
+@cli.command()
+@click.argument(
+    'directory',
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+    required=False,
+)
+@click.option(
+    '--index', 'index_file',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='Content index database (default: $XDG_CACHE_HOME/archiver/index.sqlite)'
+)
+@click.option(
+    '--config',
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help='Path to configuration file'
+)
+@click.option(
+    '--parallel/--no-parallel',
+    default=False,
+    help='List archives in parallel'
+)
+@click.option(
+    '-v', '--verbose',
+    is_flag=True,
+    help='Enable verbose output'
+)
+def index(
+    directory: Path | None,
+    index_file: Path | None,
+    config: Path | None,
+    parallel: bool,
+    verbose: bool,
+) -> None:
+    """
+    Index the members of all archives in a directory without extracting them.
+
+    Only archives that are new or changed since the last run are listed.
+
+    DIRECTORY: The directory to index (default: current directory)
+    """
+    from .utils.content_index import ContentIndex, default_index_path
+
+    try:
+        base_dir = directory or Path.cwd()
+        if config:
+            config_obj = ArchiveConfig.from_file(config)
+            config_obj.base_dir = base_dir
+        else:
+            config_obj = ArchiveConfig(base_dir=base_dir)
+        config_obj.verbose = verbose or config_obj.verbose
+        config_obj.parallel_processing = parallel or config_obj.parallel_processing
+        config_obj.validate()
+
+        setup_logging(log_file=config_obj.log_file, verbose=config_obj.verbose)
+
+        with ContentIndex(index_file or default_index_path()) as content_index:
+            stats = ArchiveProcessor(config=config_obj).index_directory(content_index)
+
+        click.echo("\n=== Indexing Summary ===")
+        click.echo(f"Archives indexed: {stats['archives_indexed']}")
+        click.echo(f"Archives unchanged: {stats['archives_unchanged']}")
+        click.echo(f"Archives removed: {stats['archives_removed']}")
+        click.echo(f"Archives that could not be listed: {stats['index_errors']}")
+
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+
+@cli.command(name='list')
+@click.argument('query', nargs=-1)
+@click.option(
+    '--index', 'index_file',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='Content index database (default: $XDG_CACHE_HOME/archiver/index.sqlite)'
+)
+@click.option(
+    '--archive',
+    type=click.Path(dir_okay=False, path_type=Path),
+    help='List the members of this archive'
+)
+@click.option(
+    '--limit',
+    type=int,
+    help='Show at most this many matches'
+)
+def list_command(
+    query: tuple[str, ...],
+    index_file: Path | None,
+    archive: Path | None,
+    limit: int | None,
+) -> None:
+    """
+    Search the content index for archive members, without extracting anything.
+
+    Without QUERY the indexed archives are listed. Build the index with
+    `archiver index` first.
+
+    QUERY: Words that must all appear in the member names
+    """
+    from .utils.content_index import ContentIndex, default_index_path
+
+    index_file = index_file or default_index_path()
+    if not index_file.exists():
+        click.echo(f"Error: No content index at {index_file}; run 'archiver index' first", err=True)
+        sys.exit(1)
+
+    with ContentIndex(index_file) as content_index:
+        if archive is not None:
+            for member in content_index.members(archive):
+                click.echo(f"{member.size:>14}  {member.name}")
+        elif query:
+            for archive_path, member in content_index.search(' '.join(query), limit=limit):
+                click.echo(f"{archive_path}: {member.name} ({member.size} bytes)")
+        else:
+            for archive_path, count, total, error in content_index.archives():
+                if error:
+                    click.echo(f"{archive_path}: could not be listed ({error})")
+                else:
+                    click.echo(f"{archive_path}: {count} members, {total} bytes")
+
+@cli.command()
+@click.option(
+    '--directory',
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path('archiver-benchmark'),
+    show_default=True,
+    help='Scratch directory on the filesystem to measure; removed afterwards if created'
+)
+@click.option(
+    '--files',
+    type=click.IntRange(1),
+    default=2000,
+    show_default=True,
+    help='Number of files in the test archive'
+)
+@click.option(
+    '--file-size',
+    callback=_parse_size_option,
+    default='16K',
+    show_default=True,
+    help='Size of each file in the test archive'
+)
+@click.option(
+    '--mode', 'modes',
+    type=click.Choice(['none', 'archive', 'directory', 'file']),
+    multiple=True,
+    help='Durability mode to measure; may be repeated (default: all)'
+)
+def benchmark(directory: Path, files: int, file_size: int, modes: tuple[str, ...]) -> None:
+    """
+    Measure what each durability mode costs on this filesystem.
+
+    A tarball of random files is extracted once per mode.
+    """
+    from .benchmark import benchmark_durability
+
+    created = not directory.exists()
+    try:
+        results = benchmark_durability(
+            directory,
+            files=files,
+            file_size=file_size,
+            modes=modes or DURABILITY_MODES
+        )
+    except Exception as e:
+        click.echo(f"Error: {str(e)}", err=True)
+        sys.exit(1)
+    finally:
+        if created:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    baseline = results[0].seconds
+    click.echo(f"{'mode':<10} {'seconds':>8} {'files/s':>9} {'MB/s':>8} {'cost':>6}")
+    for result in results:
+        click.echo(
+            f"{result.mode:<10} {result.seconds:>8.2f} {result.files_per_second:>9.0f} "
+            f"{result.megabytes_per_second:>8.1f} {result.seconds / baseline:>5.1f}x"
+        )
+
 if __name__ == '__main__':
     main()
@@ -1,60 +1,254 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Type
+from typing import (
+    Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Type, Union,
+    TYPE_CHECKING
+)
 
-from .extractors.base import BaseExtractor
-from .extractors.zip import ZipExtractor
-from .extractors.rar import RarExtractor
-from .extractors.seven_zip import SevenZipExtractor
-from .extractors.tar import TarExtractor
+from .extractors import LazyExtractor, enabled_formats
+from .extractors.base import ArchiveMember, BaseExtractor
 from .extractors.nested import NestedArchiveHandler
 from .utils.progress import ProgressTracker
 from .utils.config import ArchiveConfig
+from .utils.dedup import DedupIndex
+from .utils.devices import DeviceLimiter
+from .utils.durability import Durability
+from .utils.diskspace import DiskSpaceGovernor
+from .utils.failure_cache import FailureCache, FailureRecord, default_failure_cache_path
+from .utils.hooks import (
+    CallableHook, HookBatch, HookEvent, HookPipeline, PostExtractionHook, hooks_from_config
+)
+from .utils.leases import LeaseManager
+from .utils.passwords import PasswordCache
+from .utils.random_access import MemberCache
+from .utils.scheduling import ArchiveJob, WorkQueue, create_policy
+from .utils.throttle import AdaptiveConcurrency, ResourceGovernor
+from .utils.staging import STAGING_DIR_NAME, StagingArea, cleanup_stale_staging
+from .utils.walker import scan_workers_for
+
+if TYPE_CHECKING:
+    from .utils.content_index import ContentIndex
 
 logger = logging.getLogger(__name__)
 
+# Longest wait for another run to release space or device slots; free space
+# can also grow without any release, e.g. when other processes delete files
+RELEASE_WAIT = 1.0
+
+@dataclass
+class ArchiveResult:
+    """Outcome of processing one archive, as streamed by the async API."""
+    path: Path
+    outcome: str
+    bytes: int = 0
+    duration: float = 0.0
+    outputs: List[Path] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        """Whether the archive was processed successfully."""
+        return self.outcome != 'failed'
+
 class ArchiveProcessor:
     """Main class for processing archives in directories."""
 
     def __init__(
         self,
         config: ArchiveConfig,
-        extractors: Optional[List[Type[BaseExtractor]]] = None
+        extractors: Optional[List[Type[BaseExtractor]]] = None,
+        hooks: Optional[List[Union[PostExtractionHook, Callable[[HookBatch], Any]]]] = None
     ):
         """Initialize the archive processor.
 
         Args:
             config: Configuration settings
             extractors: Optional list of extractor classes to use
+            hooks: Optional post-extraction hooks, or functions taking a
+                HookBatch, run after the configured ones
         """
         self.config = config
         self.config.validate()
         
-        # Initialize extractors
+        # Share one deduplication index between all extractors
+        self.dedup_index: Optional[DedupIndex] = None
+        if self.config.dedup_mode != 'off':
+            self.dedup_index = DedupIndex(
+                mode=self.config.dedup_mode,
+                min_size=self.config.dedup_min_size
+            )
+            if self.config.dedup_index_file:
+                self.dedup_index.load(self.config.dedup_index_file)
+
+        # Decompressed members kept for repeated reads through open_member
+        self.member_cache: Optional[MemberCache] = None
+        if self.config.member_cache_size:
+            self.member_cache = MemberCache(self.config.member_cache_size)
+
+        # Share the write rate limit and priority settings between all workers
+        self.resource_governor: Optional[ResourceGovernor] = None
+        if (
+            self.config.max_write_rate or self.config.nice
+            or self.config.io_idle or self.config.adaptive_concurrency
+        ):
+            adaptive = None
+            if self.config.adaptive_concurrency:
+                adaptive = AdaptiveConcurrency(
+                    self.config.max_workers,
+                    threshold=self.config.latency_threshold
+                )
+            self.resource_governor = ResourceGovernor(
+                max_write_rate=self.config.max_write_rate,
+                nice=self.config.nice,
+                io_idle=self.config.io_idle,
+                adaptive=adaptive
+            )
+
+        # Passwords that opened one archive of a release are tried first
+        # for its other volumes and archives
+        self.password_cache = PasswordCache()
+
+        # Share the fsync thread pool between all workers
+        self.durability = Durability(self.config.durability)
+
+        # Initialize extractors; the built-in ones are only imported once an
+        # archive of their format turns up
         self.extractors = []
-        extractor_classes = extractors or [
-            ZipExtractor,
-            RarExtractor,
-            SevenZipExtractor,
-            TarExtractor
+        if not extractors:
+            for fmt, extensions in enabled_formats(self.config).items():
+                self.extractors.append(LazyExtractor(
+                    fmt,
+                    self.config.base_dir,
+                    self.config,
+                    extensions=extensions,
+                    setup=self._setup_extractor
+                ))
+        else:
+            for extractor_class in extractors:
+                try:
+                    extractor = extractor_class(self.config.base_dir, self.config)
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to initialize {extractor_class.__name__}: {e}"
+                    )
+                    continue
+                self._setup_extractor(extractor)
+                self.extractors.append(extractor)
+
+        # Admit extractions only when their declared size fits on disk
+        self.space_governor: Optional[DiskSpaceGovernor] = None
+        if self.config.reserve_disk_space and not self.config.dry_run:
+            self.space_governor = DiskSpaceGovernor(self.config.min_free_space)
+
+        # Cap concurrent extractions per source and target device
+        self.device_limiter: Optional[DeviceLimiter] = None
+        if self.config.device_workers or self.config.auto_device_workers:
+            self.device_limiter = DeviceLimiter.from_config(self.config)
+
+        # Signalled when a finished job gives its space and device slots
+        # back, so runs of this processor with nothing left to admit wait
+        # for each other instead of polling
+        self._released = threading.Condition()
+        self._release_count = 0
+
+        # Claim archives through lease files when sharing the tree with other hosts
+        self.lease_manager: Optional[LeaseManager] = None
+        if self.config.coordination_dir and not self.config.dry_run:
+            self.lease_manager = LeaseManager(
+                self.config.coordination_dir,
+                self.config.base_dir,
+                ttl=self.config.lease_ttl
+            )
+
+        # Remember archives that failed, so unchanged ones aren't retried every run
+        self.failure_cache: Optional[FailureCache] = None
+        self.failure_cache_file: Optional[Path] = None
+        if (self.config.failure_cache or self.config.quarantine_dir) and not self.config.dry_run:
+            self.failure_cache = FailureCache(
+                backoff=self.config.failure_backoff,
+                max_backoff=self.config.failure_backoff_max
+            )
+            self.failure_cache_file = self.config.failure_cache_file or default_failure_cache_path()
+            self.failure_cache.load(self.failure_cache_file)
+
+        # Ordering policy for the work queue; kept across runs so measured
+        # throughput carries over
+        self.ordering_policy = create_policy(self.config.schedule_policy)
+
+        # Run post-extraction hooks on batches of finished archives
+        self.hook_pipeline: Optional[HookPipeline] = None
+        post_extraction_hooks = hooks_from_config(self.config) + [
+            h if isinstance(h, PostExtractionHook) else CallableHook(h) for h in hooks or []
         ]
-        
-        for extractor_class in extractor_classes:
-            try:
-                self.extractors.append(extractor_class(self.config.base_dir))
-            except Exception as e:
-                logger.warning(
-                    f"Failed to initialize {extractor_class.__name__}: {e}"
-                )
+        if post_extraction_hooks and not self.config.dry_run:
+            self.hook_pipeline = HookPipeline(
+                post_extraction_hooks,
+                workers=self.config.hook_workers,
+                window=self.config.hook_batch_window,
+                max_batch=self.config.hook_batch_size,
+                group_by=self.config.hook_group_by
+            )
 
         # Initialize nested archive handler
         self.nested_handler = NestedArchiveHandler(
             extractors=self.extractors,
             max_depth=self.config.max_depth,
-            verify_nested=self.config.verify_integrity
+            verify_nested=self.config.verify_integrity,
+            extract=self._extract_archive
         )
 
+    def _setup_extractor(self, extractor: BaseExtractor) -> None:
+        """Attach the state shared by all extractors to a new extractor.
+
+        Args:
+            extractor: Newly created extractor
+        """
+        extractor.dedup_index = self.dedup_index
+        extractor.member_cache = self.member_cache
+        extractor.resource_governor = self.resource_governor
+        extractor.durability = self.durability
+        extractor.password_cache = self.password_cache
+
+    def _init_worker(self) -> None:
+        """Lower the priority of a thread about to extract archives, if configured."""
+        if self.resource_governor is not None:
+            self.resource_governor.deprioritize_current_thread()
+
+    def _process_deprioritized(self, job: ArchiveJob) -> ArchiveJob:
+        """Process a job on a worker thread of lowered priority, if configured.
+
+        Without privileges a thread's priority can't be raised again, so the
+        calling thread is left alone and a short-lived thread is used instead.
+
+        Args:
+            job: Job to process
+
+        Returns:
+            The same job
+        """
+        governor = self.resource_governor
+        if governor is None or not (governor.nice or governor.io_idle):
+            return self._timed_process(job)
+        with ThreadPoolExecutor(max_workers=1, initializer=self._init_worker) as executor:
+            return executor.submit(self._timed_process, job).result()
+
+    def _worker_limit(self) -> int:
+        """Return how many archives may be extracted at once right now.
+
+        Returns:
+            The configured number of workers, or less while the resource
+            governor sees write latency rise
+        """
+        if self.resource_governor is None:
+            return self.config.max_workers
+        return self.resource_governor.concurrency(self.config.max_workers)
+
     def _get_extractor_for_file(self, file_path: Path) -> Optional[BaseExtractor]:
         """Get appropriate extractor for the given file.
 
@@ -69,11 +263,129 @@ class ArchiveProcessor:
                 return extractor
         return None
 
-    def _process_single_archive(self, archive_path: Path) -> bool:
+    def _commit_staging(self, staging: StagingArea, job: Optional[ArchiveJob] = None) -> None:
+        """Rename a successful extraction into place.
+
+        Args:
+            staging: Staging area holding the extracted files
+            job: Optional job to record the output size and paths on
+        """
+        staged_bytes = staging.size() if job is not None else 0
+        outputs = staging.commit()
+        self.durability.after_extraction(staging.target_dir, staging.changed_dirs)
+        if self.dedup_index is not None:
+            self.dedup_index.relocate(staging.path, staging.target_dir)
+        if job is not None:
+            job.bytes_written += staged_bytes
+            job.outputs.extend(outputs)
+
+    @staticmethod
+    def _count_commit_failure(extractor: BaseExtractor) -> None:
+        """Turn an extraction counted as successful into a failed one.
+
+        Args:
+            extractor: Extractor whose statistics to correct
+        """
+        if extractor.stats.successful_extractions:
+            extractor.stats.successful_extractions -= 1
+        extractor.stats.failed_extractions += 1
+
+    def _extract_archive(
+        self,
+        extractor: BaseExtractor,
+        archive_path: Path,
+        job: Optional[ArchiveJob] = None
+    ) -> bool:
+        """Extract an archive next to itself, through a staging area if enabled.
+
+        With atomic extraction the archive is extracted into a hidden
+        staging directory and only renamed into place once the extractor
+        succeeded, so failed extractions never leave partial output. A
+        resumable staging area survives the process being interrupted, and
+        the next extraction of the archive skips the members it holds.
+
+        Args:
+            extractor: Extractor for the archive
+            archive_path: Path to the archive file
+            job: Optional job to record the output on; a job cancelled in
+                the meantime is discarded instead of committed
+
+        Returns:
+            True if extraction was successful
+        """
+        if not self.config.atomic_extraction:
+            if not extractor.extract(archive_path):
+                return False
+            try:
+                self.durability.after_extraction(archive_path.parent)
+            except OSError as e:
+                logger.error(f"Failed to flush extraction of {archive_path}: {e}")
+                self._count_commit_failure(extractor)
+                return False
+            return True
+
+        staging = StagingArea(
+            archive_path.parent,
+            archive_path if self.config.resumable_extraction else None
+        )
+        interrupted = False
+        try:
+            staging.create()
+            if not extractor.extract(archive_path, staging.path, journal=staging.journal):
+                return False
+            if job is not None and job.abandoned:
+                logger.info(f"Discarding abandoned extraction of {archive_path}")
+                self._count_commit_failure(extractor)
+                return False
+            self._commit_staging(staging, job)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to commit extraction of {archive_path}: {e}")
+            self._count_commit_failure(extractor)
+            return False
+        except BaseException:
+            interrupted = True
+            raise
+        finally:
+            if interrupted and staging.journal is not None:
+                logger.info(f"Keeping interrupted extraction of {archive_path} to resume later")
+                staging.release()
+            else:
+                staging.discard()
+
+    def _after_extraction(self, archive_path: Path) -> None:
+        """Process nested archives and delete the archive, as configured.
+
+        Args:
+            archive_path: Path to the archive that was extracted
+        """
+        if self.config.process_nested:
+            # Process any nested archives
+            nested_success, nested_failed = self.nested_handler.process_nested_archives(
+                archive_path.parent
+            )
+            logger.info(
+                f"Processed nested archives: {nested_success} successful, "
+                f"{nested_failed} failed"
+            )
+
+        if self.config.delete_after_extract:
+            try:
+                archive_path.unlink()
+                logger.info(f"Deleted archive after extraction: {archive_path}")
+            except Exception as e:
+                logger.error(f"Failed to delete archive {archive_path}: {e}")
+
+    def _process_single_archive(
+        self,
+        archive_path: Path,
+        job: Optional[ArchiveJob] = None
+    ) -> bool:
         """Process a single archive file.
 
         Args:
             archive_path: Path to the archive file
+            job: Optional job to record the output on
 
         Returns:
             True if extraction was successful
@@ -87,86 +399,540 @@ class ArchiveProcessor:
             logger.info(f"[DRY RUN] Would extract: {archive_path}")
             return True
 
-        success = extractor.extract(archive_path)
-        
+        success = self._extract_archive(extractor, archive_path, job)
         if success:
-            if self.config.process_nested:
-                # Process any nested archives
-                nested_success, nested_failed = self.nested_handler.process_nested_archives(
-                    archive_path.parent
-                )
-                logger.info(
-                    f"Processed nested archives: {nested_success} successful, "
-                    f"{nested_failed} failed"
-                )
-            
-            if self.config.delete_after_extract:
+            self._after_extraction(archive_path)
+        return success
+
+    def _space_required(self, archive_path: Path) -> int:
+        """Estimate the disk space an extraction needs.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Declared uncompressed size, or the archive size when the
+            archive does not declare one
+        """
+        extractor = self._get_extractor_for_file(archive_path)
+        size = None
+        try:
+            size = extractor.declared_size(archive_path)
+        except Exception as e:
+            logger.debug(f"Could not read declared size of {archive_path}: {e}")
+        return size if size is not None else archive_path.stat().st_size
+
+    def _fail_for_space(self, job: ArchiveJob) -> None:
+        """Record an archive that can't be extracted for lack of disk space.
+
+        Args:
+            job: Job that was refused admission
+        """
+        logger.error(
+            f"Not enough disk space to extract {job.path} "
+            f"({job.declared_size} bytes required)"
+        )
+        job.success = False
+        self._get_extractor_for_file(job.path).stats.failed_extractions += 1
+
+    def _make_job(self, archive_path: Path, st: Optional[os.stat_result] = None) -> ArchiveJob:
+        """Create a work queue entry for an archive.
+
+        Args:
+            archive_path: Path to the archive file
+            st: ``stat`` of the archive, if already known
+
+        Returns:
+            ArchiveJob instance
+        """
+        st = st or archive_path.stat()
+        extractor = self._get_extractor_for_file(archive_path)
+        return ArchiveJob(
+            path=archive_path,
+            size=st.st_size,
+            mtime=st.st_mtime,
+            format=getattr(extractor, 'class_name', type(extractor).__name__)
+        )
+
+    def _reserve_space(self, job: ArchiveJob) -> bool:
+        """Reserve disk space for a job if admission control is enabled.
+
+        Args:
+            job: Job about to be dispatched
+
+        Returns:
+            True if the job may run
+        """
+        if self.space_governor is None:
+            return True
+        if job.declared_size is None:
+            job.declared_size = self._space_required(job.path)
+        return self.space_governor.try_reserve(job.path.parent, job.declared_size)
+
+    def _release_space(self, job: ArchiveJob) -> None:
+        """Release the disk space reserved for a finished job.
+
+        Args:
+            job: Finished job
+        """
+        if self.space_governor is not None:
+            self.space_governor.release(job.path.parent, job.declared_size)
+
+    def _acquire_devices(self, job: ArchiveJob) -> bool:
+        """Claim a slot on the devices of a job if per-device limits are set.
+
+        Args:
+            job: Job about to be dispatched
+
+        Returns:
+            True if the job may run
+        """
+        if self.device_limiter is None:
+            return True
+        return self.device_limiter.try_acquire(job)
+
+    def _release_devices(self, job: ArchiveJob) -> None:
+        """Release the device slots of a finished job.
+
+        Args:
+            job: Finished job
+        """
+        if self.device_limiter is not None:
+            self.device_limiter.release(job)
+
+    def _release_job(self, job: ArchiveJob) -> None:
+        """Release the space and device slots of a finished job.
+
+        Runs waiting in ``_wait_for_release`` are woken up.
+
+        Args:
+            job: Finished or cancelled job
+        """
+        self._release_space(job)
+        self._release_devices(job)
+        with self._released:
+            self._release_count += 1
+            self._released.notify_all()
+
+    def _wait_for_release(self, seen: int) -> None:
+        """Wait until a job finishes after a point, or ``RELEASE_WAIT`` passed.
+
+        Args:
+            seen: ``_release_count`` when admission was last tried
+        """
+        with self._released:
+            self._released.wait_for(lambda: self._release_count != seen, RELEASE_WAIT)
+
+    def _space_held_elsewhere(self, job: ArchiveJob) -> bool:
+        """Tell whether running jobs hold space on the target filesystem of a job.
+
+        Args:
+            job: Job that didn't fit
+
+        Returns:
+            True if the job may fit once those jobs finish
+        """
+        return (
+            self.space_governor is not None
+            and self.space_governor.reserved(job.path.parent) > 0
+        )
+
+    def _reserve_space_waiting(self, job: ArchiveJob) -> bool:
+        """Reserve disk space for a job, waiting while other runs hold reservations.
+
+        Args:
+            job: Job about to be processed
+
+        Returns:
+            True if the job may run, False if it doesn't fit on its own
+        """
+        while True:
+            seen = self._release_count
+            if self._reserve_space(job):
+                return True
+            if not self._space_held_elsewhere(job):
+                return False
+            self._wait_for_release(seen)
+
+    def _claim(self, job: ArchiveJob) -> bool:
+        """Lease an archive when coordinating with other hosts.
+
+        An archive that is leased by another host, or that another host
+        already processed, is marked skipped.
+
+        Args:
+            job: Job about to be processed
+
+        Returns:
+            True if this process should extract the archive
+        """
+        if self.lease_manager is None:
+            return True
+        job.lease = self.lease_manager.acquire(job.path)
+        if job.lease is None:
+            job.skipped = True
+            job.success = True
+            return False
+        return True
+
+    def _release_claim(self, job: ArchiveJob) -> None:
+        """Release the lease of a processed job.
+
+        Only successful jobs are marked done. Failed and abandoned jobs are
+        left for any host to pick up again.
+
+        Args:
+            job: Processed job
+        """
+        if job.lease is not None:
+            self.lease_manager.release(
+                job.lease,
+                None if job.abandoned else bool(job.success)
+            )
+
+    def _known_failure(self, st: os.stat_result) -> Optional[FailureRecord]:
+        """Look up an archive in the failure cache.
+
+        Args:
+            st: ``stat`` of the archive
+
+        Returns:
+            Failure record if the unchanged archive should not be retried yet
+        """
+        if self.failure_cache is None or self.config.retry_failed:
+            return None
+        return self.failure_cache.lookup(st)
+
+    def _quarantine(self, job: ArchiveJob, failures: int) -> None:
+        """Move a repeatedly failing archive to the quarantine directory.
+
+        The archive keeps its path relative to the base directory, and the
+        failure reason is written next to it.
+
+        Args:
+            job: Failed job
+            failures: Number of times the archive failed
+        """
+        try:
+            relative = job.path.absolute().relative_to(self.config.base_dir.absolute())
+        except ValueError:
+            relative = Path(job.path.name)
+        destination = self.config.quarantine_dir / relative
+        try:
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(job.path), str(destination))
+            destination.with_name(destination.name + '.reason').write_text(
+                f"{job.failure_reason}\n"
+            )
+        except OSError as e:
+            logger.error(f"Failed to quarantine {job.path}: {e}")
+            return
+        logger.warning(f"Quarantined {job.path} to {destination} after {failures} failures")
+
+    def _record_outcome(self, job: ArchiveJob) -> None:
+        """Update the failure cache with the outcome of a processed job.
+
+        Only failures the extractor blamed on the archive are recorded;
+        running out of disk space or losing a lease says nothing about it.
+
+        Args:
+            job: Processed job
+        """
+        extractor = self._get_extractor_for_file(job.path)
+        reason = extractor.failure_reasons.pop(job.path, None) if extractor else None
+        if self.failure_cache is None or job.skipped or job.abandoned:
+            return
+        if job.success:
+            self.failure_cache.forget(job.path)
+        elif reason is not None:
+            job.failure_reason = reason
+            try:
+                record = self.failure_cache.record_failure(job.path, reason)
+            except OSError:
+                return
+            if self.config.quarantine_dir and record.failures >= self.config.quarantine_after:
+                self._quarantine(job, record.failures)
+
+    def _notify_hooks(self, job: ArchiveJob) -> None:
+        """Queue a processed job for the post-extraction hooks if it was extracted.
+
+        Args:
+            job: Processed job
+        """
+        if self.hook_pipeline is None or not job.success or job.skipped or job.abandoned:
+            return
+        self.hook_pipeline.submit(HookEvent(
+            archive=job.path,
+            directory=job.path.parent,
+            outputs=list(job.outputs),
+            bytes=job.bytes_written,
+            duration=job.duration
+        ))
+
+    def _flush_hooks(self) -> None:
+        """Wait for the post-extraction hooks of all extracted archives."""
+        if self.hook_pipeline is not None:
+            self.hook_pipeline.flush()
+
+    def close(self) -> None:
+        """Finish the post-extraction hooks and stop the shared worker pools."""
+        if self.hook_pipeline is not None:
+            self.hook_pipeline.close()
+        self.durability.close()
+
+    def _save_failure_cache(self) -> None:
+        """Save the failure cache if this run changed it."""
+        if self.failure_cache is not None and self.failure_cache.changed:
+            self.failure_cache.save(self.failure_cache_file)
+
+    def _timed_process(self, job: ArchiveJob) -> ArchiveJob:
+        """Process a job, recording its outcome and how long it took.
+
+        Args:
+            job: Job to process
+
+        Returns:
+            The same job
+        """
+        start = time.monotonic()
+        try:
+            if self._claim(job):
                 try:
-                    archive_path.unlink()
-                    logger.info(f"Deleted archive after extraction: {archive_path}")
-                except Exception as e:
-                    logger.error(f"Failed to delete archive {archive_path}: {e}")
+                    job.success = self._process_single_archive(job.path, job)
+                    self._record_outcome(job)
+                finally:
+                    self._release_claim(job)
+        finally:
+            job.duration = time.monotonic() - start
+        self._notify_hooks(job)
+        return job
 
-        return success
+    def _run_sequential(self, queue: WorkQueue) -> Iterator[ArchiveJob]:
+        """Process queued archives one at a time in policy order.
+
+        Args:
+            queue: Pending archives
+
+        Yields:
+            Each job once it has been processed
+        """
+        for job in queue:
+            if not self._reserve_space_waiting(job):
+                self._fail_for_space(job)
+                yield job
+                continue
+            try:
+                self._process_deprioritized(job)
+                queue.record(job, job.duration)
+            finally:
+                self._release_job(job)
+            yield job
 
-    def process_directory(self) -> dict:
-        """Process all archives in the base directory recursively.
+    def _run_parallel(self, queue: WorkQueue) -> Iterator[ArchiveJob]:
+        """Process queued archives on a worker pool, admitting them as space allows.
+
+        Archives are dispatched in the order of the queue's policy. Archives
+        that don't fit in the unreserved free space of their target
+        filesystem are deferred until running extractions release their
+        reservations, so smaller archives overtake them; once a deferred
+        archive is starving, nothing else is admitted until it fits. An
+        archive that doesn't fit even with nothing else running, here or in
+        other runs of the processor, is failed untouched. With per-device
+        limits, an archive whose source or target device is busy waits for a
+        slot there while archives on other devices go ahead. While other
+        runs hold every slot or the space, this run sleeps until they
+        release some.
+
+        Args:
+            queue: Pending archives
+
+        Yields:
+            Each job once it has been processed
+        """
+        running = {}
+
+        with ThreadPoolExecutor(
+            max_workers=self.config.max_workers,
+            initializer=self._init_worker
+        ) as executor:
+            while len(queue) or running:
+                seen = self._release_count
+                for job in queue.candidates():
+                    if len(running) >= self._worker_limit():
+                        break
+                    if not self._acquire_devices(job):
+                        # Jobs on other devices go ahead in the meantime
+                        continue
+                    if not self._reserve_space(job):
+                        self._release_devices(job)
+                        if not running and not self._space_held_elsewhere(job):
+                            queue.take(job)
+                            self._fail_for_space(job)
+                            yield job
+                            continue
+                        if queue.is_starving(job):
+                            # Let running jobs drain so the starving one fits
+                            break
+                        continue
+                    queue.take(job)
+                    running[executor.submit(self._timed_process, job)] = job
+
+                if not running:
+                    if len(queue):
+                        # Other runs hold the devices or the space
+                        self._wait_for_release(seen)
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    self._release_job(job)
+                    try:
+                        future.result()
+                        queue.record(job, job.duration)
+                        if job.success:
+                            logger.debug(f"Successfully processed {job.path}")
+                        else:
+                            logger.error(f"Failed to process {job.path}")
+                    except Exception as e:
+                        job.success = False
+                        logger.error(f"Error processing {job.path}: {e}")
+                    yield job
+
+    def process_archive(self, archive_path: Path) -> ArchiveJob:
+        """Process a single archive outside of a directory scan.
+
+        Args:
+            archive_path: Path to the archive file
 
         Returns:
-            Dictionary containing combined statistics from all extractors
+            The processed job
+
+        Raises:
+            ValueError: If no extractor handles the file
         """
-        logger.info(f"Starting archive processing in {self.config.base_dir}")
-        
-        # Track overall statistics
-        total_stats = {
-            "directories_processed": 0,
-            "compressed_files_found": 0,
-            "successful_extractions": 0,
-            "failed_extractions": 0,
-            "nested_archives_processed": 0
-        }
+        if not self._get_extractor_for_file(archive_path):
+            raise ValueError(f"Not a supported archive: {archive_path}")
+        queue = WorkQueue(self.ordering_policy, self.config.starvation_limit)
+        queue.push(self._make_job(archive_path))
+        return next(self._run_sequential(queue))
+
+    def _scan(self, directory: Path, known_bad: Optional[List[ArchiveJob]] = None) -> WorkQueue:
+        """Find all archives below a directory.
 
-        # Walk through directories with progress bar
-        for root, _, files in ProgressTracker.walk_with_progress(self.config.base_dir):
+        Args:
+            directory: Directory to scan recursively
+            known_bad: Optional list receiving, instead of the queue, skipped
+                jobs for archives that failed before and haven't changed
+
+        Returns:
+            Queue holding a job for every archive found
+        """
+        queue = WorkQueue(self.ordering_policy, self.config.starvation_limit)
+        quarantine_dir = self.config.quarantine_dir
+        if quarantine_dir is not None:
+            quarantine_dir = quarantine_dir.absolute()
+
+        # Walk through directories with progress bar, listing many at once
+        # on network filesystems
+        workers = scan_workers_for(directory, self.config.scan_workers)
+        for root, dirs, files in ProgressTracker.walk_with_progress(directory, workers=workers):
             current_dir = Path(root)
             archive_paths = []
 
+            # Never descend into staging areas; clear out ones left by crashes
+            if STAGING_DIR_NAME in dirs:
+                dirs.remove(STAGING_DIR_NAME)
+                cleanup_stale_staging(current_dir)
+            if quarantine_dir is not None:
+                dirs[:] = [d for d in dirs if (current_dir / d).absolute() != quarantine_dir]
+
             # Find archives in current directory
             for file in files:
                 file_path = current_dir / file
                 if self._get_extractor_for_file(file_path):
                     archive_paths.append(file_path)
 
-            # Process found archives
             if archive_paths:
                 logger.info(f"Found {len(archive_paths)} archives in {current_dir}")
-                
-                if self.config.parallel_processing and len(archive_paths) > 1:
-                    # Process archives in parallel
-                    with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
-                        future_to_archive = {
-                            executor.submit(self._process_single_archive, archive): archive
-                            for archive in archive_paths
-                        }
-                        
-                        for future in ProgressTracker.process_archives_with_progress(
-                            as_completed(future_to_archive)
-                        ):
-                            archive = future_to_archive[future]
-                            try:
-                                success = future.result()
-                                if success:
-                                    logger.debug(f"Successfully processed {archive}")
-                                else:
-                                    logger.error(f"Failed to process {archive}")
-                            except Exception as e:
-                                logger.error(f"Error processing {archive}: {e}")
-                else:
-                    # Process archives sequentially
-                    for archive_path in ProgressTracker.process_archives_with_progress(
-                        archive_paths
-                    ):
-                        self._process_single_archive(archive_path)
+                for archive_path in archive_paths:
+                    try:
+                        st = archive_path.stat()
+                    except OSError as e:
+                        # Removed or made unreadable since it was listed
+                        logger.warning(f"Skipping {archive_path}: {e}")
+                        continue
+                    job = self._make_job(archive_path, st)
+                    record = self._known_failure(st) if known_bad is not None else None
+                    if record is None:
+                        queue.push(job)
+                        continue
+                    job.skipped = True
+                    job.success = True
+                    job.failure_reason = record.reason
+                    known_bad.append(job)
+
+        return queue
+
+    def iter_directory(self, directory: Optional[Path] = None) -> Iterator[ArchiveJob]:
+        """Process all archives below a directory, yielding each as it finishes.
+
+        The whole tree is scanned first and the archives found are then
+        processed in the order chosen by the configured ordering policy.
+        Archives that failed before and haven't changed since are yielded
+        first as skipped jobs carrying the earlier failure reason. Extracted
+        archives are passed to the post-extraction hooks as they finish,
+        and the generator only ends once the hooks are done.
+
+        Args:
+            directory: Directory to process, defaulting to the base directory
+
+        Yields:
+            Each job once it has been processed
+        """
+        directory = directory or self.config.base_dir
+        logger.info(f"Starting archive processing in {directory}")
+
+        known_bad: List[ArchiveJob] = []
+        queue = self._scan(directory, known_bad)
+        for job in known_bad:
+            logger.info(f"Skipping {job.path}, unchanged since it failed: {job.failure_reason}")
+            yield job
+
+        if self.config.parallel_processing and len(queue) > 1:
+            run = self._run_parallel(queue)
+        else:
+            run = self._run_sequential(queue)
+        yield from ProgressTracker.process_archives_with_progress(run, total=len(queue))
+        self._save_failure_cache()
+        self._flush_hooks()
+
+    def process_directory(self, directory: Optional[Path] = None) -> dict:
+        """Process all archives in a directory recursively.
+
+        Args:
+            directory: Directory to process, defaulting to the base directory
+
+        Returns:
+            Dictionary containing combined statistics from all extractors
+        """
+        # Track overall statistics
+        total_stats = {
+            "directories_processed": 0,
+            "compressed_files_found": 0,
+            "successful_extractions": 0,
+            "failed_extractions": 0,
+            "nested_archives_processed": 0
+        }
+
+        skipped = 0
+        known_bad = 0
+        for job in self.iter_directory(directory):
+            logger.debug(f"Finished {job.path}")
+            if job.skipped and job.failure_reason is not None:
+                known_bad += 1
+            else:
+                skipped += job.skipped
 
         # Combine statistics from all extractors
         for extractor in self.extractors:
@@ -175,4 +941,395 @@ class ArchiveProcessor:
                 if key in stats:
                     total_stats[key] += stats[key]
 
+        if self.lease_manager is not None:
+            total_stats["skipped_archives"] = skipped
+
+        if self.failure_cache is not None:
+            total_stats["known_bad_archives"] = known_bad
+
+        if self.resource_governor is not None:
+            total_stats.update(self.resource_governor.stats)
+
+        if self.device_limiter is not None:
+            total_stats.update(self.device_limiter.stats)
+
+        if self.hook_pipeline is not None:
+            total_stats.update(self.hook_pipeline.stats)
+
+        if self.dedup_index is not None:
+            total_stats.update(self.dedup_index.stats)
+            if self.config.dedup_index_file:
+                self.dedup_index.save(self.config.dedup_index_file)
+
         return total_stats
+
+    def open_member(self, archive_path: Path, name: str) -> BinaryIO:
+        """Read one member of an archive without extracting it.
+
+        Args:
+            archive_path: Path to the archive file
+            name: Member name as listed by the archive
+
+        Returns:
+            Binary file object positioned at the start of the member
+
+        Raises:
+            ValueError: If no extractor handles the file
+            KeyError: If the archive has no such member
+        """
+        extractor = self._get_extractor_for_file(archive_path)
+        if not extractor:
+            raise ValueError(f"Not a supported archive: {archive_path}")
+        return extractor.open_member(archive_path, name)
+
+    def _list_archive(self, job: ArchiveJob) -> Tuple[List[ArchiveMember], Optional[str]]:
+        """Read the member listing of an archive for the content index.
+
+        Args:
+            job: Job of the archive to list
+
+        Returns:
+            Tuple of the members and an error message, if listing failed
+        """
+        extractor = self._get_extractor_for_file(job.path)
+        try:
+            return extractor.list_members(job.path), None
+        except Exception as e:
+            logger.warning(f"Could not list {job.path}: {e}")
+            return [], str(e)
+
+    def index_directory(self, index: 'ContentIndex', directory: Optional[Path] = None) -> dict:
+        """Record the members of all archives below a directory in a content index.
+
+        Only the archive headers are read: the ZIP central directory, tar
+        headers, 7z headers or the ``unrar`` listing. Archives whose size and
+        modification time match the index are not listed again, and
+        archives that disappeared are dropped from it. Listing runs on the
+        worker pool when parallel processing is enabled.
+
+        Args:
+            index: Content index to update
+            directory: Directory to index, defaulting to the base directory
+
+        Returns:
+            Dictionary with the number of archives listed, unchanged,
+            removed and failed
+        """
+        directory = directory or self.config.base_dir
+        logger.info(f"Indexing archives in {directory}")
+
+        jobs = list(self._scan(directory))
+        stale = []
+        for job in jobs:
+            try:
+                st = job.path.stat()
+            except OSError as e:
+                logger.warning(f"Skipping {job.path}: {e}")
+                continue
+            if not index.is_current(job.path, st.st_size, st.st_mtime_ns):
+                stale.append((job, st))
+
+        stats = {
+            "archives_indexed": 0,
+            "archives_unchanged": len(jobs) - len(stale),
+            "archives_removed": index.prune(directory, (job.path for job in jobs)),
+            "index_errors": 0,
+        }
+
+        if self.config.parallel_processing and len(stale) > 1:
+            executor = ThreadPoolExecutor(max_workers=self.config.max_workers)
+            listings = executor.map(self._list_archive, (job for job, _ in stale))
+        else:
+            executor = None
+            listings = map(self._list_archive, (job for job, _ in stale))
+
+        try:
+            progress = ProgressTracker.process_archives_with_progress(
+                [job for job, _ in stale], desc="Indexing archives"
+            )
+            for job, (_, st), (members, error) in zip(progress, stale, listings):
+                index.update(job.path, st.st_size, st.st_mtime_ns, members, error)
+                stats["archives_indexed"] += 1
+                stats["index_errors"] += error is not None
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return stats
+
+    def _result(self, job: ArchiveJob) -> ArchiveResult:
+        """Turn a finished job into the result reported by the async API.
+
+        Args:
+            job: Finished job
+
+        Returns:
+            ArchiveResult instance
+        """
+        if not job.success:
+            outcome = 'failed'
+        elif job.skipped:
+            outcome = 'skipped'
+        elif self.config.dry_run:
+            outcome = 'dry-run'
+        else:
+            outcome = 'extracted'
+        return ArchiveResult(
+            path=job.path,
+            outcome=outcome,
+            bytes=job.bytes_written,
+            duration=job.duration,
+            outputs=list(job.outputs),
+            error=job.failure_reason
+        )
+
+    async def _aextract_archive(
+        self,
+        extractor: BaseExtractor,
+        job: ArchiveJob,
+        executor: Executor
+    ) -> bool:
+        """Extract an archive on the event loop, if its extractor allows it.
+
+        Extractors with an ``aextract`` coroutine (RAR, which drives an
+        external process) run on the event loop. All other extractors are
+        CPU-bound and run ``_extract_archive`` on the executor, staging
+        included, so a cancelled extraction cleans up after itself on the
+        worker thread.
+
+        Args:
+            extractor: Extractor for the archive
+            job: Job to process
+            executor: Executor for blocking work
+
+        Returns:
+            True if extraction was successful
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        aextract = getattr(extractor, 'aextract', None)
+        if aextract is None:
+            return await loop.run_in_executor(
+                executor, self._extract_archive, extractor, job.path, job
+            )
+
+        if not self.config.atomic_extraction:
+            if not await aextract(job.path, executor=executor):
+                return False
+            try:
+                await loop.run_in_executor(
+                    executor, self.durability.after_extraction, job.path.parent
+                )
+            except OSError as e:
+                logger.error(f"Failed to flush extraction of {job.path}: {e}")
+                self._count_commit_failure(extractor)
+                return False
+            return True
+
+        staging = StagingArea(
+            job.path.parent,
+            job.path if self.config.resumable_extraction else None
+        )
+        interrupted = False
+        try:
+            await loop.run_in_executor(executor, staging.create)
+            if not await aextract(
+                job.path, staging.path, journal=staging.journal, executor=executor
+            ):
+                return False
+            if job.abandoned:
+                logger.info(f"Discarding abandoned extraction of {job.path}")
+                self._count_commit_failure(extractor)
+                return False
+            await loop.run_in_executor(executor, self._commit_staging, staging, job)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to commit extraction of {job.path}: {e}")
+            self._count_commit_failure(extractor)
+            return False
+        except BaseException:
+            interrupted = True
+            raise
+        finally:
+            if interrupted and staging.journal is not None:
+                logger.info(f"Keeping interrupted extraction of {job.path} to resume later")
+                staging.release()
+            else:
+                staging.discard()
+
+    async def _aprocess_job(self, job: ArchiveJob, executor: Executor) -> ArchiveJob:
+        """Process a job on the event loop, recording its outcome and duration.
+
+        Args:
+            job: Job to process
+            executor: Executor for blocking work
+
+        Returns:
+            The same job
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        try:
+            extractor = self._get_extractor_for_file(job.path)
+            if self.config.dry_run:
+                logger.info(f"[DRY RUN] Would extract: {job.path}")
+                job.success = True
+            elif await loop.run_in_executor(executor, self._claim, job):
+                try:
+                    job.success = await self._aextract_archive(extractor, job, executor)
+                    if job.success:
+                        await loop.run_in_executor(executor, self._after_extraction, job.path)
+                    await loop.run_in_executor(executor, self._record_outcome, job)
+                finally:
+                    self._release_claim(job)
+        finally:
+            job.duration = time.monotonic() - start
+        self._notify_hooks(job)
+        return job
+
+    async def _adispatch(
+        self,
+        queue: WorkQueue,
+        results: 'asyncio.Queue',
+        executor: Executor
+    ) -> None:
+        """Run queued archives as tasks, admitting them as space allows.
+
+        This mirrors ``_run_parallel``. Finished jobs are put on ``results``,
+        which is bounded; while the consumer lags behind, no new archives
+        are started. Cancelling the dispatcher cancels the running jobs.
+
+        Args:
+            queue: Pending archives
+            results: Queue receiving finished jobs, then None or the
+                exception that stopped the dispatcher
+            executor: Executor for blocking work
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        running: Dict[asyncio.Task, ArchiveJob] = {}
+        error: Optional[Exception] = None
+
+        try:
+            while len(queue) or running:
+                seen = self._release_count
+                for job in queue.candidates():
+                    concurrency = self._worker_limit() if self.config.parallel_processing else 1
+                    if len(running) >= concurrency:
+                        break
+                    if not self._acquire_devices(job):
+                        # Jobs on other devices go ahead in the meantime
+                        continue
+                    if self.space_governor is not None and job.declared_size is None:
+                        # Reading the declared size may list the whole archive
+                        job.declared_size = await loop.run_in_executor(
+                            executor, self._space_required, job.path
+                        )
+                    if not self._reserve_space(job):
+                        self._release_devices(job)
+                        if not running and not self._space_held_elsewhere(job):
+                            queue.take(job)
+                            self._fail_for_space(job)
+                            await results.put(job)
+                            continue
+                        if queue.is_starving(job):
+                            # Let running jobs drain so the starving one fits
+                            break
+                        continue
+                    queue.take(job)
+                    running[asyncio.create_task(self._aprocess_job(job, executor))] = job
+
+                if not running:
+                    if len(queue):
+                        # Other runs hold the devices or the space
+                        await loop.run_in_executor(executor, self._wait_for_release, seen)
+                    continue
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    job = running.pop(task)
+                    self._release_job(job)
+                    try:
+                        task.result()
+                        queue.record(job, job.duration)
+                    except Exception as e:
+                        job.success = False
+                        logger.error(f"Error processing {job.path}: {e}")
+                    await results.put(job)
+        except Exception as e:
+            error = e
+        finally:
+            for task, job in running.items():
+                job.cancelled = True
+                task.cancel()
+                self._release_job(job)
+        await results.put(error)
+
+    async def aprocess_directory(
+        self,
+        directory: Optional[Path] = None,
+        max_pending: Optional[int] = None
+    ) -> AsyncIterator[ArchiveResult]:
+        """Process all archives below a directory, streaming per-archive results.
+
+        Asyncio counterpart of ``iter_directory``. RAR archives are
+        extracted by an asyncio subprocess; all other formats run on a
+        worker pool of ``max_workers`` threads. At most ``max_pending``
+        results are buffered for a slow consumer before new archives are
+        held back. Closing the generator or cancelling the task consuming
+        it cancels the running extractions: unrar is killed, and archives
+        being extracted on the pool are discarded instead of committed.
+
+        Output sizes and paths are read from the staging area, so they are
+        only reported with atomic extraction.
+
+        Args:
+            directory: Directory to process, defaulting to the base directory
+            max_pending: Results buffered for the consumer, defaulting to
+                the number of workers
+
+        Yields:
+            ArchiveResult for each archive once it has been processed
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        directory = directory or self.config.base_dir
+        logger.info(f"Starting archive processing in {directory}")
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.config.max_workers,
+            thread_name_prefix='archiver',
+            initializer=self._init_worker
+        )
+        dispatcher: Optional[asyncio.Task] = None
+        try:
+            known_bad: List[ArchiveJob] = []
+            queue = await loop.run_in_executor(executor, self._scan, directory, known_bad)
+            for job in known_bad:
+                yield self._result(job)
+
+            results: asyncio.Queue = asyncio.Queue(maxsize=max_pending or self.config.max_workers)
+            dispatcher = asyncio.create_task(self._adispatch(queue, results, executor))
+
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield self._result(item)
+            await loop.run_in_executor(executor, self._save_failure_cache)
+            await loop.run_in_executor(executor, self._flush_hooks)
+        finally:
+            if dispatcher is not None and not dispatcher.done():
+                dispatcher.cancel()
+                try:
+                    await dispatcher
+                except asyncio.CancelledError:
+                    pass
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,277 @@
+import json
+import logging
+import os
+import socket
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+def fallback_runtime_dir() -> Path:
+    """Return the per-user directory used when there is no ``$XDG_RUNTIME_DIR``.
+
+    Returns:
+        ``archiver-<uid>`` in the temp directory
+    """
+    return Path(tempfile.gettempdir()) / f'archiver-{os.getuid()}'
+
+def default_socket_path() -> Path:
+    """Return the default location of the daemon socket.
+
+    Returns:
+        Path inside ``$XDG_RUNTIME_DIR``, or inside the per-user directory
+        in the temp directory
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    return (Path(runtime_dir) if runtime_dir else fallback_runtime_dir()) / 'archiver.sock'
+
+def _ensure_private_dir(directory: Path) -> None:
+    """Create a directory only the current user can enter, or check an existing one.
+
+    The temp directory is shared, so another user could have created the
+    directory first to hijack the socket.
+
+    Args:
+        directory: Directory to create
+
+    Raises:
+        RuntimeError: If the directory exists but is not private to this user
+    """
+    try:
+        directory.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise RuntimeError(f"{directory} is not a directory private to this user")
+
+def send_request(
+    request: Dict[str, Any],
+    socket_path: Optional[Path] = None,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """Send a request to a running daemon and return its response.
+
+    Args:
+        request: Request object
+        socket_path: Daemon socket, defaulting to ``default_socket_path()``
+        timeout: Optional timeout in seconds
+
+    Returns:
+        Response object
+
+    Raises:
+        ConnectionError: If the daemon is not reachable or hangs up
+    """
+    socket_path = socket_path or default_socket_path()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+            with sock.makefile('rb') as f:
+                line = f.readline()
+    except OSError as e:
+        raise ConnectionError(f"Cannot reach archiver daemon at {socket_path}: {e}")
+    if not line:
+        raise ConnectionError("Archiver daemon closed the connection")
+    return json.loads(line)
+
+class ArchiveDaemon:
+    """Serves extraction jobs from a resident ArchiveProcessor.
+
+    Jobs arrive over a Unix domain socket, one JSON object per line in each
+    direction, e.g. ``{"op": "extract", "path": "/downloads/foo"}``. The
+    processor, its extractors and the worker pool stay warm between jobs, so
+    hooks pay only for a socket round trip instead of a full CLI start-up.
+    """
+
+    MAX_FINISHED_JOBS = 1000
+
+    def __init__(self, processor: Any, socket_path: Optional[Path] = None, max_jobs: int = 2):
+        """Initialize the daemon.
+
+        Args:
+            processor: ArchiveProcessor used for every job
+            socket_path: Socket to listen on, defaulting to ``default_socket_path()``
+            max_jobs: Number of jobs processed concurrently
+        """
+        self.processor = processor
+        self.socket_path = socket_path or default_socket_path()
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix='archiver-job')
+        self.jobs: 'OrderedDict[int, Dict[str, Any]]' = OrderedDict()
+        self._futures: Dict[int, Future] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._stopping = threading.Event()
+
+    def _run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute a job on a worker thread.
+
+        Args:
+            job: Job record
+
+        Returns:
+            Result object stored on the job record
+        """
+        job['status'] = 'running'
+        path = Path(job['path'])
+        try:
+            if job['op'] == 'extract' and path.is_file():
+                finished = self.processor.process_archive(path)
+                result = {
+                    'archives': 1,
+                    'successful': int(bool(finished.success)),
+                    'failed': int(not finished.success),
+                }
+            else:
+                results = list(self.processor.iter_directory(path))
+                successful = sum(1 for r in results if r.success)
+                result = {
+                    'archives': len(results),
+                    'successful': successful,
+                    'failed': len(results) - successful,
+                }
+            job['status'] = 'done'
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            result = {'error': str(e)}
+            job['status'] = 'error'
+        job['result'] = result
+        return result
+
+    def submit(self, op: str, path: str) -> Dict[str, Any]:
+        """Queue a job.
+
+        Args:
+            op: 'extract' for an archive or directory, 'scan' for a directory
+            path: Target path
+
+        Returns:
+            Job record
+        """
+        with self._lock:
+            job = {'id': self._next_id, 'op': op, 'path': path, 'status': 'queued'}
+            self._next_id += 1
+            self.jobs[job['id']] = job
+            while len(self.jobs) > self.MAX_FINISHED_JOBS:
+                oldest = next(iter(self.jobs))
+                if self.jobs[oldest]['status'] in ('queued', 'running'):
+                    break
+                self.jobs.pop(oldest)
+                self._futures.pop(oldest, None)
+        self._futures[job['id']] = self.executor.submit(self._run_job, job)
+        logger.info(f"Queued job {job['id']}: {op} {path}")
+        return job
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle one client request.
+
+        Args:
+            request: Request object
+
+        Returns:
+            Response object
+        """
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True}
+        if op in ('extract', 'scan'):
+            path = request.get('path')
+            if not path or not os.path.exists(path):
+                return {'ok': False, 'error': f"No such path: {path}"}
+            job = self.submit(op, os.path.abspath(path))
+            if request.get('wait'):
+                self._futures[job['id']].result()
+            return {'ok': True, 'job': dict(job)}
+        if op == 'status':
+            job = self.jobs.get(request.get('job'))
+            if job is None:
+                return {'ok': False, 'error': f"Unknown job: {request.get('job')}"}
+            return {'ok': True, 'job': dict(job)}
+        if op == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f"Unknown operation: {op}"}
+
+    def _serve_connection(self, conn: socket.socket) -> None:
+        """Read one request from a connection and answer it.
+
+        Args:
+            conn: Accepted client connection
+        """
+        with conn:
+            try:
+                with conn.makefile('rb') as f:
+                    line = f.readline()
+                response = self.handle_request(json.loads(line))
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            try:
+                conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+            except OSError:
+                pass
+
+    def _bind(self) -> socket.socket:
+        """Create the listening socket, replacing a stale socket file.
+
+        Returns:
+            Listening socket
+
+        Raises:
+            RuntimeError: If another daemon is already listening, or the
+                per-user directory for the socket is not private
+        """
+        if self.socket_path.parent == fallback_runtime_dir():
+            _ensure_private_dir(self.socket_path.parent)
+        if self.socket_path.exists():
+            try:
+                send_request({'op': 'ping'}, self.socket_path, timeout=1)
+            except ConnectionError:
+                self.socket_path.unlink()
+            else:
+                raise RuntimeError(f"An archiver daemon is already running on {self.socket_path}")
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Create the socket file as 0600 rather than restricting it after
+        # bind, when other users could already have connected
+        umask = os.umask(0o177)
+        try:
+            sock.bind(str(self.socket_path))
+        finally:
+            os.umask(umask)
+        sock.listen(64)
+        return sock
+
+    def serve_forever(self) -> None:
+        """Accept requests until ``shutdown`` is called."""
+        self._sock = self._bind()
+        logger.info(f"Archiver daemon listening on {self.socket_path}")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.executor.shutdown(wait=True)
+            self.processor.close()
+            self.socket_path.unlink(missing_ok=True)
+            logger.info("Archiver daemon stopped")
+
+    def shutdown(self) -> None:
+        """Stop accepting requests; queued jobs are finished first."""
+        self._stopping.set()
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
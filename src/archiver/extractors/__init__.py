@@ -0,0 +1,157 @@
+import importlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Type, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..utils.config import ArchiveConfig
+    from .base import BaseExtractor
+
+logger = logging.getLogger(__name__)
+
+# Format -> (module, class, extensions). The extensions are kept here so that
+# archives can be recognized without importing the extractor modules, which
+# pull in py7zr, subprocess and friends.
+EXTRACTOR_REGISTRY: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    'zip': ('.zip', 'ZipExtractor', ('.zip',)),
+    'rar': ('.rar', 'RarExtractor', ('.rar',)),
+    '7z': ('.seven_zip', 'SevenZipExtractor', ('.7z',)),
+    'tar': ('.tar', 'TarExtractor', (
+        '.tar',
+        '.tar.gz', '.tgz',
+        '.tar.bz2', '.tbz2',
+        '.tar.xz', '.txz'
+    )),
+}
+
+def load_extractor_class(fmt: str) -> Type['BaseExtractor']:
+    """Import the extractor class registered for a format.
+
+    Args:
+        fmt: Format name from EXTRACTOR_REGISTRY
+
+    Returns:
+        Extractor class
+    """
+    module_name, class_name, _ = EXTRACTOR_REGISTRY[fmt]
+    module = importlib.import_module(module_name, __name__)
+    return getattr(module, class_name)
+
+def enabled_formats(config: 'ArchiveConfig') -> Dict[str, Tuple[str, ...]]:
+    """Return the enabled formats and the extensions each should handle.
+
+    Args:
+        config: Configuration settings
+
+    Returns:
+        Dictionary mapping format names to extensions
+    """
+    formats: Dict[str, Tuple[str, ...]] = {}
+    if config.enable_zip:
+        formats['zip'] = EXTRACTOR_REGISTRY['zip'][2]
+    if config.enable_rar:
+        formats['rar'] = EXTRACTOR_REGISTRY['rar'][2]
+    if config.enable_7z:
+        formats['7z'] = EXTRACTOR_REGISTRY['7z'][2]
+    if config.enable_tar:
+        tar_extensions = ('.tar',)
+        if config.enable_tar_gz:
+            tar_extensions += ('.tar.gz', '.tgz')
+        if config.enable_tar_bz2:
+            tar_extensions += ('.tar.bz2', '.tbz2')
+        if config.enable_tar_xz:
+            tar_extensions += ('.tar.xz', '.txz')
+        formats['tar'] = tar_extensions
+    return formats
+
+class LazyExtractor:
+    """Stand-in for an extractor that is only imported and created when needed.
+
+    File names are matched against the registered extensions directly. The
+    real extractor is created the first time a matching file is seen, so a
+    run over a tree without 7z files never imports py7zr and one without RAR
+    files never probes for ``unrar``. Everything else is delegated to the
+    real extractor.
+    """
+
+    def __init__(
+        self,
+        fmt: str,
+        base_dir: Path,
+        config: Optional['ArchiveConfig'] = None,
+        extensions: Optional[Tuple[str, ...]] = None,
+        setup: Optional[Callable[['BaseExtractor'], None]] = None
+    ):
+        """Initialize the lazy extractor.
+
+        Args:
+            fmt: Format name from EXTRACTOR_REGISTRY
+            base_dir: Base directory for extraction operations
+            config: Optional configuration settings
+            extensions: Extensions to handle, defaulting to the registered ones
+            setup: Optional function called with the extractor once created
+        """
+        _, class_name, registered = EXTRACTOR_REGISTRY[fmt]
+        self.format = fmt
+        self.class_name = class_name
+        self.supported_extensions = tuple(extensions or registered)
+        self.base_dir = base_dir
+        self.config = config
+        self._setup = setup
+        self._extractor: Optional['BaseExtractor'] = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the real extractor has been created."""
+        return self._extractor is not None
+
+    def load(self) -> Optional['BaseExtractor']:
+        """Create the real extractor if that hasn't been tried yet.
+
+        Returns:
+            The extractor, or None if it could not be initialized
+        """
+        with self._lock:
+            if self._extractor is None and not self._failed:
+                try:
+                    extractor = load_extractor_class(self.format)(self.base_dir, self.config)
+                    if self._setup is not None:
+                        self._setup(extractor)
+                    self._extractor = extractor
+                except Exception as e:
+                    logger.warning(f"Failed to initialize {self.class_name}: {e}")
+                    self._failed = True
+            return self._extractor
+
+    def can_handle(self, file_path: Path) -> bool:
+        """Check if this extractor can handle the given file.
+
+        Args:
+            file_path: Path to the file to check
+
+        Returns:
+            True if the extension matches and the extractor is available
+        """
+        if not file_path.name.lower().endswith(self.supported_extensions):
+            return False
+        return self.load() is not None
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get current extraction statistics without forcing a load.
+
+        Returns:
+            Dictionary containing current statistics
+        """
+        if self._extractor is None:
+            from .base import ExtractionStats
+            return ExtractionStats().__dict__
+        return self._extractor.get_stats()
+
+    def __getattr__(self, name: str) -> Any:
+        extractor = self.load()
+        if extractor is None:
+            raise AttributeError(f"{self.class_name} is not available")
+        return getattr(extractor, name)
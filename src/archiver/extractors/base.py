@@ -1,7 +1,23 @@
+import io
+import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.config import ArchiveConfig
+from ..utils.dedup import DedupIndex
+from ..utils.durability import Durability
+from ..utils.failure_cache import is_transient
+from ..utils.filters import MemberFilter
+from ..utils.limits import ExtractionLimits, OutputBudget
+from ..utils.passwords import PasswordCache, PasswordNotFound, password_candidates
+from ..utils.random_access import MemberCache, archive_key
+from ..utils.throttle import ResourceGovernor
+from .writer import ExtractionWriter
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class ExtractionStats:
@@ -11,17 +27,40 @@ class ExtractionStats:
     successful_extractions: int = 0
     failed_extractions: int = 0
 
+@dataclass
+class ArchiveMember:
+    """Metadata for a single archive member, as read from the archive listing."""
+    name: str
+    size: int
+    compressed_size: Optional[int] = None
+    crc: Optional[int] = None
+    is_dir: bool = False
+    encrypted: bool = False
+
 class BaseExtractor(ABC):
     """Base class for archive extractors."""
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, config: Optional[ArchiveConfig] = None):
         """Initialize the extractor.
 
         Args:
             base_dir: Base directory for extraction operations
+            config: Optional configuration settings
         """
         self.base_dir = base_dir
+        self.config = config
+        self.member_filter = MemberFilter.from_config(config) if config else MemberFilter()
+        self.limits = ExtractionLimits.from_config(config) if config else ExtractionLimits()
+        self.passwords = password_candidates(config) if config else []
+        # Shared with the other extractors by the processor when enabled
+        self.dedup_index: Optional[DedupIndex] = None
+        self.member_cache: Optional[MemberCache] = None
+        self.resource_governor: Optional[ResourceGovernor] = None
+        self.durability: Optional[Durability] = None
+        self.password_cache = PasswordCache()
         self.stats = ExtractionStats()
+        # Why archives failed, for failures that are the archive's fault
+        self.failure_reasons: Dict[Path, str] = {}
 
     @property
     @abstractmethod
@@ -42,15 +81,257 @@ class BaseExtractor(ABC):
         Returns:
             True if the file can be handled by this extractor
         """
-        return file_path.suffix.lower() in self.supported_extensions
+        return file_path.name.lower().endswith(self.supported_extensions)
+
+    def list_members(self, archive_path: Path) -> List[ArchiveMember]:
+        """List the members of an archive without extracting anything.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            List of archive members
+
+        Raises:
+            NotImplementedError: If the extractor cannot list archive contents
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support listing archive members"
+        )
+
+    def select_members(self, archive_path: Path) -> Optional[List[ArchiveMember]]:
+        """Select the members to extract according to the member filter.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            List of selected members, or None if the whole archive should be
+            extracted because no filter is configured
+        """
+        if not self.member_filter.active:
+            return None
+        members = self.list_members(archive_path)
+        selected = [m for m in members if self.member_filter.matches(m)]
+        logger.debug(
+            f"Selected {len(selected)} of {len(members)} members from {archive_path}"
+        )
+        return selected
+
+    def declared_size(self, archive_path: Path) -> Optional[int]:
+        """Return the uncompressed size the archive declares in its headers.
+
+        Only the members selected by the member filter are counted.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Total uncompressed size in bytes, or None if it cannot be
+            determined without decompressing the archive
+        """
+        try:
+            members = self.select_members(archive_path)
+            if members is None:
+                members = self.list_members(archive_path)
+        except NotImplementedError:
+            return None
+        return sum(m.size for m in members if not m.is_dir)
+
+    def is_encrypted(self, archive_path: Path) -> bool:
+        """Check whether extracting an archive needs a password.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            True if the archive or any of its members is encrypted
+        """
+        return False
+
+    def check_password(self, archive_path: Path, password: str) -> bool:
+        """Check a password against as little of an archive as possible.
+
+        Args:
+            archive_path: Path to the archive file
+            password: Candidate password
+
+        Returns:
+            True if the password opens the archive
+
+        Raises:
+            NotImplementedError: If the format has no encryption support
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support encrypted archives"
+        )
+
+    def find_password(self, archive_path: Path) -> Optional[str]:
+        """Find the candidate password that opens an encrypted archive.
+
+        Each candidate is checked by ``check_password``, which only reads a
+        small member or the encrypted header. The password that works is
+        cached, so the other archives of the release try it first, and
+        later calls for the same archive return it right away.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            The password, or None if the archive is not encrypted
+
+        Raises:
+            PasswordNotFound: If no candidate opens the archive
+        """
+        known, password = self.password_cache.lookup(archive_path)
+        if known:
+            return password
+        if not self.is_encrypted(archive_path):
+            self.password_cache.remember(archive_path, None)
+            return None
+        if not self.passwords:
+            raise PasswordNotFound(f"{archive_path} is encrypted and no password is configured")
+
+        candidates = self.password_cache.candidates(archive_path, self.passwords)
+        for tried, password in enumerate(candidates, 1):
+            if self.check_password(archive_path, password):
+                logger.debug(f"Password {tried} of {len(candidates)} opens {archive_path}")
+                self.password_cache.remember(archive_path, password)
+                return password
+        raise PasswordNotFound(
+            f"None of {len(candidates)} candidate passwords opens {archive_path}"
+        )
+
+    def output_budget(self, archive_path: Path) -> Optional[OutputBudget]:
+        """Start accounting for the output of an archive against the limits.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Budget for the archive, or None if no limit is configured
+        """
+        if not self.limits.active:
+            return None
+        return self.limits.budget(archive_path.stat().st_size)
+
+    def create_writer(
+        self,
+        target_dir: Path,
+        archive_path: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> ExtractionWriter:
+        """Create the writer used to materialize members of one archive.
+
+        Given a checkpoint journal, the writer records finished members in
+        it and skips those an interrupted earlier run recorded. Given the
+        archive, the writer aborts once its output crosses the
+        decompression bomb limits.
+
+        Args:
+            target_dir: Directory the archive is extracted into
+            archive_path: Optional archive being extracted
+            journal: Optional checkpoint journal of a resumable extraction
+
+        Returns:
+            ExtractionWriter instance
+        """
+        return ExtractionWriter(
+            target_dir,
+            dedup_index=self.dedup_index,
+            journal=journal,
+            governor=self.resource_governor,
+            durability=self.durability,
+            budget=self.output_budget(archive_path) if archive_path is not None else None,
+            preserve_metadata=self.config.preserve_metadata if self.config else True
+        )
+
+    def _open_member(self, archive_path: Path, name: str) -> Tuple[BinaryIO, Optional[int]]:
+        """Open one member of an archive for reading.
+
+        Args:
+            archive_path: Path to the archive file
+            name: Member name as listed by ``list_members``
+
+        Returns:
+            Tuple of a binary file object and the member size, if known
+
+        Raises:
+            KeyError: If the archive has no such member
+            NotImplementedError: If the extractor cannot read single members
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support reading single members"
+        )
+
+    def open_member(self, archive_path: Path, name: str) -> BinaryIO:
+        """Read one member of an archive without extracting anything.
+
+        Members small enough for the member cache are read completely and
+        kept there, so repeated reads don't touch the archive again.
+
+        Args:
+            archive_path: Path to the archive file
+            name: Member name as listed by ``list_members``
+
+        Returns:
+            Binary file object positioned at the start of the member
+
+        Raises:
+            KeyError: If the archive has no such member
+            NotImplementedError: If the extractor cannot read single members
+        """
+        if self.member_cache is None:
+            return self._open_member(archive_path, name)[0]
+
+        key = archive_key(archive_path) + (name,)
+        data = self.member_cache.get(key)
+        if data is not None:
+            return io.BytesIO(data)
+
+        f, size = self._open_member(archive_path, name)
+        if not self.member_cache.fits(size):
+            return f
+        with f:
+            data = f.read()
+        self.member_cache.put(key, data)
+        return io.BytesIO(data)
+
+    def _fail(self, archive_path: Path, reason: str, error: Optional[BaseException] = None) -> bool:
+        """Log and count a failed extraction.
+
+        Unless the error is transient, such as running out of disk space,
+        the reason is kept so the processor can avoid retrying the
+        unchanged archive.
+
+        Args:
+            archive_path: Path to the archive file
+            reason: Error message
+            error: Exception that caused the failure, if any
+
+        Returns:
+            False, for returning from ``extract``
+        """
+        logger.error(reason)
+        self.stats.failed_extractions += 1
+        if not is_transient(error):
+            self.failure_reasons[archive_path] = reason
+        return False
 
     @abstractmethod
-    def extract(self, archive_path: Path, target_dir: Optional[Path] = None) -> bool:
+    def extract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> bool:
         """Extract the archive to the target directory.
 
         Args:
             archive_path: Path to the archive file
             target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Optional checkpoint journal of a resumable extraction,
+                used to skip members an interrupted earlier run finished
 
         Returns:
             True if extraction was successful
@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import List, Optional, Set, Type
+from typing import Callable, List, Optional, Set, Type
 from .base import BaseExtractor
 
 logger = logging.getLogger(__name__)
@@ -12,7 +12,8 @@ class NestedArchiveHandler:
         self,
         extractors: List[BaseExtractor],
         max_depth: int = 5,
-        verify_nested: bool = True
+        verify_nested: bool = True,
+        extract: Optional[Callable[[BaseExtractor, Path], bool]] = None
     ):
         """Initialize nested archive handler.
 
@@ -20,10 +21,13 @@ class NestedArchiveHandler:
             extractors: List of available extractors
             max_depth: Maximum recursion depth for nested archives
             verify_nested: Whether to verify nested archives
+            extract: Optional function used to run an extractor on an
+                archive, defaulting to calling ``extractor.extract``
         """
         self.extractors = extractors
         self.max_depth = max_depth
         self.verify_nested = verify_nested
+        self.extract = extract or (lambda extractor, path: extractor.extract(path))
         self.processed_archives: Set[Path] = set()
 
     def _get_extractor_for_file(self, file_path: Path) -> Optional[BaseExtractor]:
@@ -85,7 +89,7 @@ class NestedArchiveHandler:
                 
                 if extractor:
                     logger.info(f"Processing nested archive at depth {current_depth}: {item}")
-                    if extractor.extract(item):
+                    if self.extract(extractor, item):
                         successful += 1
                         # Recursively process the extraction directory
                         sub_success, sub_failed = self.process_nested_archives(
@@ -1,26 +1,61 @@
+import io
 import logging
+import os
 import subprocess
+import tempfile
 from pathlib import Path
-from typing import Optional
+from concurrent.futures import Executor
+from typing import BinaryIO, List, Optional, Tuple
 import shutil
 
-from .base import BaseExtractor
+from .base import ArchiveMember, BaseExtractor
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.config import ArchiveConfig
 
 logger = logging.getLogger(__name__)
 
+# unrar exit codes for write, open, out-of-memory, create and user-break
+# errors, which are no fault of the archive
+UNRAR_TRANSIENT_EXIT_CODES = {5, 6, 8, 9, 255}
+
+# unrar exit code for a missing or wrong password
+UNRAR_BAD_PASSWORD_EXIT_CODE = 11
+
+class _ProcessOutput(io.RawIOBase):
+    """Standard output of a process, reaping the process when closed."""
+
+    def __init__(self, process: subprocess.Popen):
+        super().__init__()
+        self.process = process
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        return self.process.stdout.readinto(buffer)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.process.stdout.close()
+            if self.process.poll() is None:
+                self.process.kill()
+            self.process.wait()
+        super().close()
+
 class RarExtractor(BaseExtractor):
     """Extractor for RAR archives."""
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, config: Optional[ArchiveConfig] = None):
         """Initialize the RAR extractor.
 
         Args:
             base_dir: Base directory for extraction operations
+            config: Optional configuration settings
 
         Raises:
             RuntimeError: If unrar command is not available
         """
-        super().__init__(base_dir)
+        super().__init__(base_dir, config)
         if not shutil.which('unrar'):
             raise RuntimeError("unrar command not found. Please install unrar.")
 
@@ -33,12 +68,340 @@ class RarExtractor(BaseExtractor):
         """
         return ('.rar',)
 
-    def extract(self, archive_path: Path, target_dir: Optional[Path] = None) -> bool:
+    @staticmethod
+    def _password_option(password: Optional[str]) -> str:
+        """Return the unrar switch for a password.
+
+        A password is never put on the command line, where other users can
+        read it from the process list. ``-p`` makes unrar prompt for it, and
+        the prompt is answered on standard input. Without a password unrar
+        is told not to ask for one, so it never waits for input on an
+        encrypted archive.
+
+        Args:
+            password: Password, or None
+
+        Returns:
+            The ``-p`` switch
+        """
+        return '-p' if password else '-p-'
+
+    @staticmethod
+    def _password_input(password: Optional[str]) -> Optional[bytes]:
+        """Return the answer to the password prompt of unrar.
+
+        Args:
+            password: Password, or None
+
+        Returns:
+            The password line, or None if unrar won't prompt
+        """
+        return (password + '\n').encode() if password else None
+
+    def _run_unrar(
+        self,
+        command: List[str],
+        password: Optional[str],
+        text: bool = False
+    ) -> subprocess.CompletedProcess:
+        """Run unrar to completion, answering its password prompt.
+
+        unrar reads the password from the terminal when it has one, so it
+        runs in a new session without a controlling terminal and reads the
+        password from its standard input instead.
+
+        Args:
+            command: Command line, built with ``_password_option``
+            password: Password, or None
+            text: Whether to decode the output
+
+        Returns:
+            Completed unrar process
+        """
+        answer = self._password_input(password)
+        result = subprocess.run(
+            command,
+            input=answer,
+            stdin=subprocess.DEVNULL if answer is None else None,
+            capture_output=True,
+            start_new_session=True,
+            check=False
+        )
+        if text:
+            result.stdout = result.stdout.decode('utf-8', errors='replace')
+            result.stderr = result.stderr.decode('utf-8', errors='replace')
+        return result
+
+    def _run_listing(
+        self,
+        archive_path: Path,
+        password: Optional[str]
+    ) -> subprocess.CompletedProcess:
+        """Run ``unrar lt`` on an archive.
+
+        Args:
+            archive_path: Path to the RAR archive
+            password: Password for encrypted headers, or None
+
+        Returns:
+            Completed unrar process
+        """
+        return self._run_unrar(
+            ['unrar', 'lt', '-c-', self._password_option(password), str(archive_path)],
+            password,
+            text=True
+        )
+
+    def list_members(self, archive_path: Path) -> List[ArchiveMember]:
+        """List members using the technical listing of ``unrar lt``.
+
+        Args:
+            archive_path: Path to the RAR archive
+
+        Returns:
+            List of archive members
+
+        Raises:
+            RuntimeError: If unrar cannot list the archive
+            PasswordNotFound: If no candidate password opens the archive
+        """
+        result = self._run_listing(archive_path, self.find_password(archive_path))
+        if result.returncode != 0:
+            raise RuntimeError(f"unrar failed to list {archive_path}: {result.stderr}")
+        return self._parse_listing(result.stdout)
+
+    @staticmethod
+    def _parse_listing(output: str) -> List[ArchiveMember]:
+        """Parse the output of ``unrar lt``.
+
+        Args:
+            output: Technical listing
+
+        Returns:
+            List of archive members
+        """
+
+        members: List[ArchiveMember] = []
+        fields: dict = {}
+
+        def flush() -> None:
+            if 'Name' in fields:
+                crc = fields.get('CRC32')
+                members.append(ArchiveMember(
+                    name=fields['Name'],
+                    size=int(fields.get('Size', 0)),
+                    compressed_size=int(fields['Packed size']) if 'Packed size' in fields else None,
+                    crc=int(crc, 16) if crc else None,
+                    is_dir=fields.get('Type') == 'Directory',
+                    encrypted='encrypted' in fields.get('Flags', '')
+                ))
+            fields.clear()
+
+        for line in output.splitlines():
+            key, sep, value = line.strip().partition(': ')
+            if not sep:
+                continue
+            if key == 'Name':
+                flush()
+            fields[key] = value.strip()
+        flush()
+        return members
+
+    def is_encrypted(self, archive_path: Path) -> bool:
+        """Check the listing for encrypted headers or members.
+
+        Args:
+            archive_path: Path to the RAR archive
+
+        Returns:
+            True if a password is needed
+
+        Raises:
+            RuntimeError: If unrar cannot list the archive
+        """
+        result = self._run_listing(archive_path, None)
+        if result.returncode == UNRAR_BAD_PASSWORD_EXIT_CODE:
+            # The headers themselves are encrypted
+            return True
+        if result.returncode != 0:
+            raise RuntimeError(f"unrar failed to list {archive_path}: {result.stderr}")
+        return any(m.encrypted for m in self._parse_listing(result.stdout))
+
+    def check_password(self, archive_path: Path, password: str) -> bool:
+        """Check a password on the headers and the smallest encrypted member.
+
+        Args:
+            archive_path: Path to the RAR archive
+            password: Candidate password
+
+        Returns:
+            True if the password opens the archive
+        """
+        result = self._run_listing(archive_path, password)
+        if result.returncode != 0:
+            return False
+        encrypted = [
+            m for m in self._parse_listing(result.stdout)
+            if m.encrypted and not m.is_dir
+        ]
+        if not encrypted:
+            return True
+        member = min(encrypted, key=lambda m: m.compressed_size or m.size)
+        result = self._run_unrar(
+            ['unrar', 't', '-inul', '-y', self._password_option(password),
+             str(archive_path), member.name],
+            password
+        )
+        return result.returncode == 0
+
+    def _open_member(self, archive_path: Path, name: str) -> Tuple[BinaryIO, Optional[int]]:
+        """Stream a member from ``unrar p``.
+
+        Args:
+            archive_path: Path to the RAR archive
+            name: Member name
+
+        Returns:
+            Tuple of the unrar output stream and None, as the size isn't known
+        """
+        password = self.find_password(archive_path)
+        answer = self._password_input(password)
+        process = subprocess.Popen(
+            [
+                'unrar', 'p', '-inul', '-y', self._password_option(password),
+                str(archive_path), name
+            ],
+            stdin=subprocess.DEVNULL if answer is None else subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        if answer is not None:
+            try:
+                process.stdin.write(answer)
+                process.stdin.close()
+            except BrokenPipeError:
+                # unrar exited before prompting; the stream reports it
+                pass
+        return _ProcessOutput(process), None
+
+    def _prepare_command(
+        self,
+        archive_path: Path,
+        target_dir: Path
+    ) -> Optional[Tuple[List[str], Optional[str], Optional[List[ArchiveMember]], Optional[str]]]:
+        """Build the unrar command line for an extraction.
+
+        Args:
+            archive_path: Path to the RAR archive
+            target_dir: Directory to extract into
+
+        Returns:
+            Tuple of the command, the password to answer its prompt with,
+            the selected members (None for all) and the list file to delete
+            afterwards, or None if the member filter selected nothing
+
+        Raises:
+            PasswordNotFound: If no candidate password opens the archive
+            ExtractionLimitExceeded: If the archive declares more output than
+                the decompression bomb limits allow
+        """
+        # Find the password first, so the headers can be listed
+        password = self.find_password(archive_path)
+        selected = self.select_members(archive_path)
+        if selected is not None and not selected:
+            return None
+
+        # unrar writes the files itself, so the limits can only be checked
+        # against the sizes the headers declare
+        budget = self.output_budget(archive_path)
+        if budget is not None:
+            budget.check_declared(
+                selected if selected is not None else self.list_members(archive_path)
+            )
+
+        command = ['unrar', 'x', '-y', self._password_option(password), str(archive_path)]
+        list_file = None
+        if selected is not None:
+            # Pass the selected names through a UTF-8 list file so large
+            # selections don't overflow the command line
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', suffix='.lst', delete=False
+            ) as f:
+                f.write('\n'.join(m.name for m in selected))
+            list_file = f.name
+            command[3:3] = ['-scul']
+            command.append(f'@{list_file}')
+        command.append(str(target_dir) + os.sep)
+        return command, password, selected, list_file
+
+    def _command_prefix(self) -> List[str]:
+        """Return the prefix lowering the priority of unrar, if configured.
+
+        unrar writes the extracted files itself, so the write rate limit
+        doesn't apply to it; its CPU and I/O priority do.
+
+        Returns:
+            Arguments to put in front of the unrar command
+        """
+        if self.resource_governor is None:
+            return []
+        return self.resource_governor.command_prefix()
+
+    def _finish(
+        self,
+        archive_path: Path,
+        target_dir: Path,
+        selected: Optional[List[ArchiveMember]],
+        returncode: int,
+        stderr: str
+    ) -> bool:
+        """Record the outcome of an unrar run.
+
+        Args:
+            archive_path: Path to the RAR archive
+            target_dir: Directory the archive was extracted into
+            selected: Selected members, or None if all were extracted
+            returncode: Exit status of unrar
+            stderr: Error output of unrar
+
+        Returns:
+            True if extraction was successful
+        """
+        if returncode != 0:
+            reason = f"unrar failed with error: {stderr}"
+            if returncode in UNRAR_TRANSIENT_EXIT_CODES:
+                logger.error(reason)
+                self.stats.failed_extractions += 1
+                return False
+            return self._fail(archive_path, reason)
+
+        syncs_files = self.durability is not None and self.durability.mode in ('directory', 'file')
+        if self.dedup_index is not None or syncs_files:
+            # unrar writes the files itself, so duplicates can only be
+            # linked, and files flushed, after the fact
+            writer = self.create_writer(target_dir)
+            members = selected if selected is not None else self.list_members(archive_path)
+            files = [m for m in members if not m.is_dir]
+            if self.dedup_index is not None:
+                for member in files:
+                    writer.dedup_existing(member.name, member.size, member.crc)
+            writer.sync_existing(m.name for m in files)
+        self.stats.successful_extractions += 1
+        return True
+
+    def extract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> bool:
         """Extract a RAR archive using unrar command.
 
         Args:
             archive_path: Path to the RAR archive
             target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Ignored; unrar extracts every selected member again
 
         Returns:
             True if extraction was successful
@@ -47,23 +410,99 @@ class RarExtractor(BaseExtractor):
             target_dir = target_dir or archive_path.parent
             logger.info(f"Extracting {archive_path} to {target_dir}")
 
+            prepared = self._prepare_command(archive_path, target_dir)
+            if prepared is None:
+                logger.info(f"No members of {archive_path} matched the member filter")
+                self.stats.successful_extractions += 1
+                return True
+            command, password, selected, list_file = prepared
+
             # Run unrar command
-            result = subprocess.run(
-                ['unrar', 'x', '-y', str(archive_path), str(target_dir)],
-                capture_output=True,
-                text=True,
-                check=False  # Don't raise exception on non-zero exit
+            try:
+                result = self._run_unrar(self._command_prefix() + command, password, text=True)
+            finally:
+                if list_file:
+                    os.unlink(list_file)
+
+            return self._finish(
+                archive_path, target_dir, selected, result.returncode, result.stderr
             )
 
-            if result.returncode == 0:
+        except Exception as e:
+            return self._fail(
+                archive_path, f"Error extracting RAR file {archive_path}: {str(e)}", e
+            )
+
+    async def aextract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None,
+        executor: Optional[Executor] = None
+    ) -> bool:
+        """Extract a RAR archive without blocking the event loop.
+
+        unrar runs as an asyncio subprocess, so no worker thread is tied up
+        while it works. Cancelling the coroutine kills unrar.
+
+        Args:
+            archive_path: Path to the RAR archive
+            target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Ignored; unrar extracts every selected member again
+            executor: Executor for listing the archive and the work after
+                unrar exits, defaulting to the event loop's
+
+        Returns:
+            True if extraction was successful
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        try:
+            target_dir = target_dir or archive_path.parent
+            logger.info(f"Extracting {archive_path} to {target_dir}")
+
+            # Listing the archive for the member filter runs unrar as well
+            prepared = await loop.run_in_executor(
+                executor, self._prepare_command, archive_path, target_dir
+            )
+            if prepared is None:
+                logger.info(f"No members of {archive_path} matched the member filter")
                 self.stats.successful_extractions += 1
                 return True
-            else:
-                logger.error(f"unrar failed with error: {result.stderr}")
-                self.stats.failed_extractions += 1
-                return False
+            command, password, selected, list_file = prepared
+            answer = self._password_input(password)
+
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *self._command_prefix(),
+                    *command,
+                    stdin=asyncio.subprocess.DEVNULL if answer is None else asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True
+                )
+                try:
+                    _, stderr = await process.communicate(answer)
+                except asyncio.CancelledError:
+                    process.kill()
+                    await process.wait()
+                    raise
+            finally:
+                if list_file:
+                    os.unlink(list_file)
+
+            return await loop.run_in_executor(
+                executor,
+                self._finish,
+                archive_path,
+                target_dir,
+                selected,
+                process.returncode,
+                stderr.decode('utf-8', errors='replace')
+            )
 
         except Exception as e:
-            logger.error(f"Error extracting RAR file {archive_path}: {str(e)}")
-            self.stats.failed_extractions += 1
-            return False
+            return self._fail(
+                archive_path, f"Error extracting RAR file {archive_path}: {str(e)}", e
+            )
@@ -1,26 +1,158 @@
+import io
 import logging
 import py7zr
+import py7zr.io
 import shutil
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
-from .base import BaseExtractor
+from py7zr.helpers import ArchiveTimestamp
+
+from .base import ArchiveMember, BaseExtractor
+from .writer import ExtractionWriter, MemberSink
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.config import ArchiveConfig
+from ..utils.random_access import archive_key
 
 logger = logging.getLogger(__name__)
 
+class _SinkIO(py7zr.io.Py7zIO):
+    """Adapter feeding py7zr output for one member into a writer sink."""
+
+    def __init__(self, sink: MemberSink):
+        self.sink = sink
+
+    def write(self, s: bytes) -> int:
+        return self.sink.write(s)
+
+    def read(self, size: Optional[int] = None) -> bytes:
+        return b''
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return 0
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return self.sink.length
+
+    def close(self) -> None:
+        self.sink.close()
+
+class _SymlinkIO(py7zr.io.Py7zIO):
+    """Collects the link target stored as member data and creates the link."""
+
+    def __init__(self, writer: ExtractionWriter, name: str):
+        self.writer = writer
+        self.name = name
+        self.target = bytearray()
+
+    def write(self, s: bytes) -> int:
+        self.target += s
+        return len(s)
+
+    def read(self, size: Optional[int] = None) -> bytes:
+        return b''
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return 0
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return len(self.target)
+
+    def close(self) -> None:
+        self.writer.make_symlink(self.name, self.target.decode('utf-8'))
+
+class _WriterFactory(py7zr.io.WriterFactory):
+    """Routes every member py7zr decompresses through an ExtractionWriter."""
+
+    def __init__(self, writer: ExtractionWriter, files: Dict[str, 'py7zr.py7zr.ArchiveFile']):
+        """Initialize the writer factory.
+
+        Args:
+            writer: Writer for the archive being extracted
+            files: Archive entries by member name
+        """
+        self.writer = writer
+        self.files = files
+
+    def create(self, filename: str) -> py7zr.io.Py7zIO:
+        name = Path(filename).relative_to(self.writer.target_dir).as_posix()
+        entry = self.files.get(name)
+        if entry is None:
+            return _SinkIO(self.writer.open_member(name))
+        if entry.is_symlink:
+            return _SymlinkIO(self.writer, name)
+
+        mtime = entry.lastwritetime
+        return _SinkIO(self.writer.open_member(
+            name,
+            size=entry.uncompressed,
+            crc=entry.crc32,
+            mode=entry.posix_mode,
+            mtime=ArchiveTimestamp(mtime).totimestamp() if mtime is not None else None,
+            compressed_size=entry.compressed
+        ))
+
+class _MemoryIO(py7zr.io.Py7zIO):
+    """Collects member data in memory."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, s: bytes) -> int:
+        self.data += s
+        return len(s)
+
+    def read(self, size: Optional[int] = None) -> bytes:
+        return b''
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return 0
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return len(self.data)
+
+class _MemoryFactory(py7zr.io.WriterFactory):
+    """Decompresses members into memory."""
+
+    def __init__(self):
+        self.members: Dict[str, _MemoryIO] = {}
+
+    def create(self, filename: str) -> py7zr.io.Py7zIO:
+        self.members[filename] = _MemoryIO()
+        return self.members[filename]
+
 class SevenZipExtractor(BaseExtractor):
     """Extractor for 7-Zip archives."""
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, config: Optional[ArchiveConfig] = None):
         """Initialize the 7-Zip extractor.
 
         Args:
             base_dir: Base directory for extraction operations
+            config: Optional configuration settings
 
         Raises:
             RuntimeError: If py7zr is not available
         """
-        super().__init__(base_dir)
+        super().__init__(base_dir, config)
         try:
             import py7zr
         except ImportError:
@@ -35,6 +167,134 @@ class SevenZipExtractor(BaseExtractor):
         """
         return ('.7z',)
 
+    def list_members(self, archive_path: Path) -> List[ArchiveMember]:
+        """List members from the 7z headers.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            List of archive members
+        """
+        with self._open(archive_path) as archive:
+            return [
+                ArchiveMember(
+                    name=info.filename,
+                    size=info.uncompressed or 0,
+                    compressed_size=info.compressed,
+                    crc=info.crc32,
+                    is_dir=info.is_directory
+                )
+                for info in archive.list()
+            ]
+
+    def _open(self, archive_path: Path) -> py7zr.SevenZipFile:
+        """Open an archive, with its password if it is encrypted.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Open archive
+
+        Raises:
+            PasswordNotFound: If no candidate password opens the archive
+        """
+        return py7zr.SevenZipFile(
+            archive_path, mode='r', password=self.find_password(archive_path)
+        )
+
+    def is_encrypted(self, archive_path: Path) -> bool:
+        """Check whether the headers or any member are encrypted.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            True if a password is needed
+        """
+        try:
+            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+                return archive.needs_password()
+        except py7zr.PasswordRequired:
+            # The headers themselves are encrypted
+            return True
+
+    def check_password(self, archive_path: Path, password: str) -> bool:
+        """Check a password by decrypting the headers and one small member.
+
+        The member is the smallest one starting a block, so nothing else
+        has to be decompressed to reach it.
+
+        Args:
+            archive_path: Path to the archive file
+            password: Candidate password
+
+        Returns:
+            True if the password opens the archive
+        """
+        try:
+            with py7zr.SevenZipFile(archive_path, mode='r', password=password) as archive:
+                firsts = {}
+                for entry in archive.files:
+                    if not entry.is_directory and entry.uncompressed and entry.folder is not None:
+                        firsts.setdefault(id(entry.folder), entry)
+                if not firsts:
+                    return True
+                entry = min(firsts.values(), key=lambda e: e.uncompressed)
+                archive.extract(targets=[entry.filename], factory=_MemoryFactory())
+            return True
+        except Exception as e:
+            # Wrong passwords surface as decompression or CRC errors
+            logger.debug(f"Password rejected for {archive_path}: {e}")
+            return False
+
+    def _open_member(self, archive_path: Path, name: str) -> Tuple[BinaryIO, Optional[int]]:
+        """Decompress a single member into memory.
+
+        In a solid archive the members stored before the wanted one in the
+        same block have to be decompressed anyway. Those that fit in the
+        member cache are kept there, so reading through the members of a
+        block decompresses it once instead of once per member.
+
+        Args:
+            archive_path: Path to the archive file
+            name: Member name
+
+        Returns:
+            Tuple of the member file object and its size
+
+        Raises:
+            KeyError: If the archive has no file of that name
+        """
+        key = archive_key(archive_path)
+        with self._open(archive_path) as archive:
+            entry = next((f for f in archive.files if f.filename == name), None)
+            if entry is None or entry.is_directory:
+                raise KeyError(f"No file named {name!r} in {archive_path}")
+
+            targets = {name}
+            if self.member_cache is not None and entry.folder is not None:
+                for other in archive.files:
+                    if other is entry:
+                        break
+                    if (
+                        other.folder is entry.folder
+                        and not other.is_directory
+                        and self.member_cache.fits(other.uncompressed)
+                        and key + (other.filename,) not in self.member_cache
+                    ):
+                        targets.add(other.filename)
+
+            factory = _MemoryFactory()
+            archive.extract(targets=targets, factory=factory)
+
+        for other_name, other in factory.members.items():
+            if other_name != name:
+                self.member_cache.put(key + (other_name,), bytes(other.data))
+        data = bytes(factory.members[name].data) if name in factory.members else b''
+        return io.BytesIO(data), len(data)
+
     def verify_integrity(self, archive_path: Path) -> bool:
         """Verify the integrity of a 7z archive.
 
@@ -45,18 +305,24 @@ class SevenZipExtractor(BaseExtractor):
             True if archive is valid
         """
         try:
-            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
-                return archive.test()
+            with self._open(archive_path) as archive:
+                return archive.testzip() is None
         except Exception as e:
             logger.error(f"Failed to verify 7z archive {archive_path}: {e}")
             return False
 
-    def extract(self, archive_path: Path, target_dir: Optional[Path] = None) -> bool:
+    def extract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> bool:
         """Extract a 7z archive.
 
         Args:
             archive_path: Path to the archive file
             target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Optional checkpoint journal of a resumable extraction
 
         Returns:
             True if extraction was successful
@@ -65,19 +331,54 @@ class SevenZipExtractor(BaseExtractor):
             target_dir = target_dir or archive_path.parent
             logger.info(f"Extracting {archive_path} to {target_dir}")
 
-            # Verify integrity first
-            if not self.verify_integrity(archive_path):
-                logger.error(f"Archive {archive_path} failed integrity check")
-                self.stats.failed_extractions += 1
-                return False
+            # Find the password with a cheap check first; it is cached for
+            # listing and verifying the archive too
+            self.find_password(archive_path)
+
+            selected = self.select_members(archive_path)
+            writer = self.create_writer(Path(target_dir).absolute(), archive_path, journal)
+
+            # Check the sizes from the headers before decompressing anything
+            if writer.budget is not None:
+                self.output_budget(archive_path).check_declared(
+                    selected if selected is not None else self.list_members(archive_path)
+                )
+
+            # Verify integrity first. With a member filter, or when resuming,
+            # the CRCs of the extracted members are checked during extraction
+            # instead.
+            if selected is None and not writer.resuming and not self.verify_integrity(archive_path):
+                return self._fail(archive_path, f"Archive {archive_path} failed integrity check")
 
             # Extract the archive
-            with py7zr.SevenZipFile(archive_path, mode='r') as archive:
-                archive.extractall(target_dir)
+            with self._open(archive_path) as archive:
+                files = {f.filename: f for f in archive.files}
+                targets = None if selected is None else [m.name for m in selected]
+                for name, entry in files.items():
+                    if entry.is_directory and (targets is None or name in targets):
+                        writer.make_dir(name)
+                if writer.resuming:
+                    targets = [
+                        name for name, entry in files.items()
+                        if (targets is None or name in targets)
+                        and not entry.is_directory
+                        and not writer.completed(name, size=entry.uncompressed, crc=entry.crc32)
+                    ]
+                try:
+                    if targets is None or targets:
+                        archive.extract(
+                            writer.target_dir,
+                            targets=targets,
+                            factory=_WriterFactory(writer, files)
+                        )
+                except BaseException:
+                    writer.abort()
+                    raise
+                writer.finish()
                 self.stats.successful_extractions += 1
                 return True
 
         except Exception as e:
-            logger.error(f"Error extracting 7z file {archive_path}: {str(e)}")
-            self.stats.failed_extractions += 1
-            return False
+            return self._fail(
+                archive_path, f"Error extracting 7z file {archive_path}: {str(e)}", e
+            )
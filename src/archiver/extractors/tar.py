@@ -1,22 +1,64 @@
+import bz2
+import contextlib
+import gzip
+import io
 import logging
+import lzma
+import os
+import posixpath
+import struct
 import tarfile
+import zlib
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
 
-from .base import BaseExtractor
+from .base import ArchiveMember, BaseExtractor
+from .writer import ExtractionWriter
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.config import ArchiveConfig
+from ..utils.limits import ExtractionLimitExceeded
+from ..utils.random_access import (
+    FileSlice,
+    GzipSeekIndex,
+    IndexedGzipReader,
+    LRUCache,
+    archive_key,
+    gzip_indexing_reader,
+)
 
 logger = logging.getLogger(__name__)
 
+# Magic number and compression method starting every gzip member
+GZIP_MEMBER_MAGIC = b'\x1f\x8b\x08'
+# Compressed data read at once while looking for further gzip members
+GZIP_SCAN_CHUNK = 1024 * 1024
+# Largest gzip file searched for further members; the search reads the
+# whole file, so larger ones report no declared size
+GZIP_SCAN_LIMIT = 16 * 1024 * 1024
+
+@dataclass
+class _TarIndex:
+    """Member listing of a tarball with the data offsets of its files."""
+    members: List[ArchiveMember] = field(default_factory=list)
+    offsets: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    gzip_index: Optional[GzipSeekIndex] = None
+
 class TarExtractor(BaseExtractor):
     """Extractor for tar archives (including compressed variants)."""
 
-    def __init__(self, base_dir: Path):
+    # Tarballs whose listing and seek points are kept for member reads
+    INDEXED_ARCHIVES = 16
+
+    def __init__(self, base_dir: Path, config: Optional[ArchiveConfig] = None):
         """Initialize the tar extractor.
 
         Args:
             base_dir: Base directory for extraction operations
+            config: Optional configuration settings
         """
-        super().__init__(base_dir)
+        super().__init__(base_dir, config)
+        self._indexes = LRUCache(self.INDEXED_ARCHIVES)
 
     @property
     def supported_extensions(self) -> tuple[str, ...]:
@@ -32,23 +74,255 @@ class TarExtractor(BaseExtractor):
             '.tar.xz', '.txz'
         )
 
-    def _is_safe_path(self, path: str, target_dir: Path) -> bool:
+    @staticmethod
+    def _to_member(info: tarfile.TarInfo) -> ArchiveMember:
+        """Convert a tar header to an archive member.
+
+        Args:
+            info: Tar header
+
+        Returns:
+            Archive member
+        """
+        return ArchiveMember(name=info.name, size=info.size, is_dir=info.isdir())
+
+    def _tar_index(self, archive_path: Path) -> _TarIndex:
+        """Read the tar headers, remembering where each file's data starts.
+
+        The pass over a gzip tarball also records seek points into the
+        compressed stream, so members can later be read without
+        decompressing everything before them.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Index of the tarball
+        """
+        key = archive_key(archive_path)
+        index = self._indexes.get(key)
+        if index is not None:
+            return index
+
+        index = _TarIndex()
+        if self.get_compression_type(archive_path) == 'gzip':
+            index.gzip_index = GzipSeekIndex()
+            with gzip_indexing_reader(archive_path, index.gzip_index) as stream:
+                with tarfile.open(fileobj=stream, mode='r|') as tar:
+                    self._read_headers(tar, index)
+        else:
+            with tarfile.open(archive_path, 'r:*') as tar:
+                self._read_headers(tar, index)
+        self._indexes.put(key, index)
+        return index
+
+    def _read_headers(self, tar: tarfile.TarFile, index: _TarIndex) -> None:
+        """Add all headers of a tarball to an index.
+
+        Args:
+            tar: Open tarball
+            index: Index to fill
+        """
+        for info in tar:
+            index.members.append(self._to_member(info))
+            if info.isfile():
+                index.offsets[info.name] = (info.offset_data, info.size)
+
+    def list_members(self, archive_path: Path) -> List[ArchiveMember]:
+        """List members from the tar headers.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            List of archive members
+        """
+        return list(self._tar_index(archive_path).members)
+
+    def _open_member(self, archive_path: Path, name: str) -> Tuple[BinaryIO, Optional[int]]:
+        """Open a member at the data offset recorded by the header scan.
+
+        Plain tarballs are read with a single seek. Gzip tarballs resume
+        decompression at the nearest seek point. bzip2 and xz
+        decompressors can't be resumed midway, so those are decompressed
+        from the start up to the member.
+
+        Args:
+            archive_path: Path to the archive file
+            name: Member name
+
+        Returns:
+            Tuple of the member file object and its size
+
+        Raises:
+            KeyError: If the archive has no regular file of that name
+        """
+        index = self._tar_index(archive_path)
+        if name not in index.offsets:
+            raise KeyError(f"No file named {name!r} in {archive_path}")
+        offset, size = index.offsets[name]
+
+        compression = self.get_compression_type(archive_path)
+        if compression == 'gzip':
+            stream = IndexedGzipReader(archive_path, index.gzip_index)
+        elif compression == 'bzip2':
+            stream = bz2.open(archive_path, 'rb')
+        elif compression == 'lzma':
+            stream = lzma.open(archive_path, 'rb')
+        else:
+            stream = open(archive_path, 'rb')
+        return io.BufferedReader(FileSlice(stream, offset, size)), size
+
+    @staticmethod
+    def _starts_gzip_member(fd: int, offset: int) -> bool:
+        """Check whether a gzip member starts at an offset of a file.
+
+        Args:
+            fd: File descriptor of the gzip file
+            offset: Offset of a candidate member header
+
+        Returns:
+            True if the data there inflates as the start of a gzip member
+        """
+        data = os.pread(fd, 64 * 1024, offset)
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            output = decompressor.decompress(data, 64 * 1024)
+        except zlib.error:
+            return False
+        return decompressor.eof or len(output) > 0
+
+    def _is_single_gzip_member(self, archive_path: Path) -> bool:
+        """Check that a gzip file is one member, so its trailer covers all of it.
+
+        Concatenated and block compressed (bgzip) files are several members
+        with a trailer each. The compressed data is searched for further
+        member headers without inflating it; a match only counts if the
+        data following it inflates.
+
+        Args:
+            archive_path: Path to the gzip file
+
+        Returns:
+            True if no second member was found
+        """
+        with open(archive_path, 'rb') as f:
+            fd = f.fileno()
+            position = 0
+            tail = b''
+            while True:
+                chunk = f.read(GZIP_SCAN_CHUNK)
+                if not chunk:
+                    return True
+                data = tail + chunk
+                base = position - len(tail)
+                index = data.find(GZIP_MEMBER_MAGIC, 1 if base == 0 else 0)
+                while index != -1:
+                    if self._starts_gzip_member(fd, base + index):
+                        return False
+                    index = data.find(GZIP_MEMBER_MAGIC, index + 1)
+                tail = data[-(len(GZIP_MEMBER_MAGIC) - 1):]
+                position += len(chunk)
+
+    def declared_size(self, archive_path: Path) -> Optional[int]:
+        """Return the uncompressed size of the tar stream.
+
+        Listing the members of a compressed tarball means decompressing it,
+        so the size is taken from the container instead: the file size for
+        plain tar and the ISIZE trailer for gzip. The trailer only covers
+        the last member of a gzip file, so files of several members have no
+        declared size. Telling them apart reads the whole file, which is only
+        done up to ``GZIP_SCAN_LIMIT``; larger gzip files have no declared
+        size either. The member filter is not applied, which makes the
+        result an upper bound.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Uncompressed size in bytes, or None for bzip2, xz and gzip files
+            of several members or over the scan limit
+        """
+        compression = self.get_compression_type(archive_path)
+        archive_size = archive_path.stat().st_size
+        if compression == 'none':
+            return archive_size
+        if compression != 'gzip' or archive_size > GZIP_SCAN_LIMIT:
+            return None
+        if not self._is_single_gzip_member(archive_path):
+            return None
+
+        # ISIZE holds the uncompressed size modulo 2**32; assume the
+        # smallest size that is not clearly smaller than the compressed data
+        with open(archive_path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            size = struct.unpack('<I', f.read(4))[0]
+        while size + (archive_size >> 6) + 1024 < archive_size:
+            size += 1 << 32
+        return size
+
+    def _is_safe_path(
+        self,
+        path: str,
+        target_dir: Path,
+        resolved: Optional[Dict[str, Path]] = None
+    ) -> bool:
         """Check if the extraction path is safe (no path traversal).
 
+        Symbolic links are followed, so a member can't be written through a
+        link pointing outside the target directory either.
+
         Args:
             path: Path to check
             target_dir: Target directory for extraction
+            resolved: Optional cache of resolved directories, shared by the
+                checks of one archive. It must be cleared whenever a link
+                is created below the target directory.
 
         Returns:
             True if path is safe
         """
         try:
-            extraction_path = (target_dir / path).resolve()
-            common_prefix = Path(target_dir).resolve()
-            return common_prefix in extraction_path.parents
+            if resolved is None:
+                resolved = {}
+            parent, _, name = path.rstrip('/').rpartition('/')
+            if name in ('', '.', '..'):
+                parent, name = path, ''
+            if '' not in resolved:
+                resolved[''] = Path(target_dir).resolve()
+            if parent not in resolved:
+                resolved[parent] = (target_dir / parent).resolve()
+            extraction_path = resolved[parent] / name if name else resolved[parent]
+            if name and extraction_path.is_symlink():
+                extraction_path = extraction_path.resolve()
+            return resolved[''] in extraction_path.parents
         except Exception:
             return False
 
+    def _is_safe_link(
+        self,
+        member: tarfile.TarInfo,
+        target_dir: Path,
+        resolved: Optional[Dict[str, Path]] = None
+    ) -> bool:
+        """Check that a link member points inside the target directory.
+
+        Args:
+            member: Member to check
+            target_dir: Target directory for extraction
+            resolved: Optional cache of resolved directories
+
+        Returns:
+            True if the member is not a link or its target is safe
+        """
+        if member.issym():
+            target = posixpath.join(posixpath.dirname(member.name), member.linkname)
+        elif member.islnk():
+            target = member.linkname
+        else:
+            return True
+        return self._is_safe_path(target, target_dir, resolved)
+
     def verify_integrity(self, archive_path: Path) -> bool:
         """Verify the integrity of a tar archive.
 
@@ -57,27 +331,127 @@ class TarExtractor(BaseExtractor):
 
         Returns:
             True if archive is valid
+
+        Raises:
+            ExtractionLimitExceeded: If the headers declare more output than
+                the decompression bomb limits allow
         """
+        budget = self.output_budget(archive_path)
+        resolved: Dict[str, Path] = {}
         try:
             with tarfile.open(archive_path, 'r:*') as tar:
                 # Try to read and verify the entire archive
                 for member in tar:
                     if not member.name:
                         return False
-                    if not self._is_safe_path(member.name, archive_path.parent):
+                    if not self._is_safe_path(member.name, archive_path.parent, resolved):
                         logger.error(f"Unsafe path detected in archive: {member.name}")
                         return False
+                    if not self._is_safe_link(member, archive_path.parent, resolved):
+                        logger.error(f"Unsafe link detected in archive: {member.name} -> {member.linkname}")
+                        return False
+                    if budget is not None:
+                        budget.check_declared([self._to_member(member)])
                 return True
+        except ExtractionLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f"Failed to verify tar archive {archive_path}: {e}")
             return False
 
-    def extract(self, archive_path: Path, target_dir: Optional[Path] = None) -> bool:
+    @contextlib.contextmanager
+    def _open_tar(self, archive_path: Path, offset: Optional[int] = None) -> Iterator[tarfile.TarFile]:
+        """Open a tarball for sequential reading, optionally at a header offset.
+
+        Plain tarballs seek straight to the offset. Compressed streams are
+        decompressed up to it, which skips parsing and writing the members
+        before it but not the decompression.
+
+        Args:
+            archive_path: Path to the archive file
+            offset: Offset of a header in the uncompressed stream
+
+        Yields:
+            Open tarball
+        """
+        if offset is None:
+            with tarfile.open(archive_path, 'r:*') as tar:
+                yield tar
+            return
+
+        opener = {
+            'gzip': gzip.open,
+            'bzip2': bz2.open,
+            'lzma': lzma.open,
+        }.get(self.get_compression_type(archive_path), open)
+        with opener(archive_path, 'rb') as stream:
+            stream.seek(offset)
+            with tarfile.open(fileobj=stream, mode='r:') as tar:
+                yield tar
+
+    def _extract_member(
+        self,
+        tar: tarfile.TarFile,
+        member: tarfile.TarInfo,
+        writer: ExtractionWriter,
+        target_dir: Path,
+        resolved: Optional[Dict[str, Path]] = None
+    ) -> None:
+        """Extract one member through the writer.
+
+        Args:
+            tar: Open tarball
+            member: Member to extract
+            writer: Writer for the archive
+            target_dir: Directory the archive is extracted into
+            resolved: Optional cache of resolved directories for path checks
+        """
+        # Skip unsafe paths and members rejected by the member filter
+        if not self._is_safe_path(member.name, target_dir, resolved):
+            return
+        if not self._is_safe_link(member, target_dir, resolved):
+            return
+        if not self.member_filter.matches(self._to_member(member)):
+            return
+
+        if member.isdir():
+            writer.make_dir(member.name, mode=member.mode, mtime=member.mtime)
+        elif member.isfile():
+            if writer.completed(member.name, size=member.size):
+                return
+            with tar.extractfile(member) as source:
+                writer.write_member(
+                    member.name,
+                    source,
+                    size=member.size,
+                    mode=member.mode,
+                    mtime=member.mtime
+                )
+        else:
+            # Links and special files are left to tarfile, which may replace
+            # a member still waiting for its metadata
+            writer.flush()
+            tar.extract(member, path=target_dir, set_attrs=writer.preserve_metadata)
+            if resolved is not None:
+                # A new link can change where paths below it resolve to
+                resolved.clear()
+
+    def extract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> bool:
         """Extract a tar archive.
 
+        With a checkpoint journal the position after every member is
+        checkpointed, and an interrupted extraction continues from the
+        last checkpoint.
+
         Args:
             archive_path: Path to the archive file
             target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Optional checkpoint journal of a resumable extraction
 
         Returns:
             True if extraction was successful
@@ -85,26 +459,31 @@ class TarExtractor(BaseExtractor):
         try:
             target_dir = target_dir or archive_path.parent
             logger.info(f"Extracting {archive_path} to {target_dir}")
+            writer = self.create_writer(target_dir, archive_path, journal)
 
-            # Verify integrity first
-            if not self.verify_integrity(archive_path):
-                logger.error(f"Archive {archive_path} failed integrity check")
-                self.stats.failed_extractions += 1
-                return False
+            # Verify integrity first. A resumed extraction skips the full
+            # pass; the headers it still reads are checked as it goes.
+            if not writer.resuming and not self.verify_integrity(archive_path):
+                return self._fail(archive_path, f"Archive {archive_path} failed integrity check")
 
             # Extract the archive
-            with tarfile.open(archive_path, 'r:*') as tar:
-                # Filter out unsafe paths
-                members = [m for m in tar if self._is_safe_path(m.name, target_dir)]
-                tar.extractall(path=target_dir, members=members)
-                
+            offset = writer.resume_offset()
+            if offset is not None:
+                logger.info(f"Resuming {archive_path} at offset {offset}")
+            resolved: Dict[str, Path] = {}
+            with self._open_tar(archive_path, offset) as tar:
+                for member in tar:
+                    self._extract_member(tar, member, writer, target_dir, resolved)
+                    writer.checkpoint(tar.offset)
+                writer.finish()
+
                 self.stats.successful_extractions += 1
                 return True
 
         except Exception as e:
-            logger.error(f"Error extracting tar file {archive_path}: {str(e)}")
-            self.stats.failed_extractions += 1
-            return False
+            return self._fail(
+                archive_path, f"Error extracting tar file {archive_path}: {str(e)}", e
+            )
 
     def get_compression_type(self, archive_path: Path) -> str:
         """Determine the compression type of the tar archive.
@@ -0,0 +1,695 @@
+import filecmp
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.dedup import DedupIndex, clone_file
+from ..utils.durability import Durability, wait_all
+from ..utils.limits import OutputBudget
+from ..utils.throttle import ResourceGovernor
+
+logger = logging.getLogger(__name__)
+
+class MemberSink:
+    """Write side of a single archive member.
+
+    Data is pushed in with ``write`` and the member is finalized with
+    ``close``. When the deduplication index knows a file that may hold the
+    same content, incoming data is compared against that file instead of
+    being written; the output is only materialized from the point where the
+    contents diverge, and a fully matching member becomes a link.
+    """
+
+    def __init__(
+        self,
+        writer: 'ExtractionWriter',
+        path: Path,
+        size: Optional[int] = None,
+        crc: Optional[int] = None,
+        mode: Optional[int] = None,
+        mtime: Optional[float] = None,
+        compressed_size: Optional[int] = None
+    ):
+        """Initialize the member sink.
+
+        Args:
+            writer: Writer the member belongs to
+            path: Output path of the member
+            size: Uncompressed size from the archive metadata
+            crc: CRC32 from the archive metadata
+            mode: Permission bits to apply once written
+            mtime: Modification time to apply once written
+            compressed_size: Compressed size from the archive metadata
+        """
+        self.writer = writer
+        self.path = path
+        self.mode = mode
+        self.mtime = mtime
+        self.compressed_size = compressed_size
+        self.length = 0
+        self.crc = 0
+        self.linked = False
+        self._byte_limit: Optional[int] = None
+        if writer.budget is not None:
+            self._byte_limit = writer.budget.limits.ratio_limit(compressed_size)
+        self._file: Optional[BinaryIO] = None
+        self._candidate: Optional[Path] = None
+        self._candidate_file: Optional[BinaryIO] = None
+
+        index = writer.dedup_index
+        if index is not None:
+            self._candidate = index.lookup(size, crc)
+        if self._candidate is not None:
+            try:
+                self._candidate_file = open(self._candidate, 'rb')
+            except OSError:
+                self._candidate = None
+        if self._candidate_file is None:
+            self._open_output()
+
+    def _open_output(self) -> None:
+        """Open the output file, replacing whatever is at the path."""
+        self.writer.ensure_dir(self.path.parent)
+        # Never write through an existing file: it may be a hardlink shared
+        # with another extracted copy. Creating exclusively costs no extra
+        # syscall when, as usual, nothing is there yet.
+        try:
+            self._file = open(self.path, 'xb')
+        except FileExistsError:
+            self.path.unlink()
+            self._file = open(self.path, 'xb')
+
+    def _diverge(self, matched: int) -> None:
+        """Switch from comparing to writing after a content mismatch.
+
+        Args:
+            matched: Number of leading bytes known to equal the candidate
+        """
+        candidate_file = self._candidate_file
+        self._candidate_file = None
+        self._candidate = None
+        self._open_output()
+        candidate_file.seek(0)
+        remaining = matched
+        while remaining:
+            chunk = candidate_file.read(min(remaining, ExtractionWriter.CHUNK_SIZE))
+            if not chunk:
+                break
+            self.writer.write_chunk(self._file, chunk)
+            remaining -= len(chunk)
+        candidate_file.close()
+
+    def write(self, data: bytes) -> int:
+        """Write a chunk of member data.
+
+        Args:
+            data: Next chunk of uncompressed data
+
+        Returns:
+            Number of bytes consumed
+
+        Raises:
+            ExtractionLimitExceeded: If the archive or member expands too much
+        """
+        size = len(data)
+        self.length += size
+        budget = self.writer.budget
+        if budget is not None:
+            budget.add_bytes(size)
+            if self._byte_limit is not None and self.length > self._byte_limit:
+                name = self.writer._relative(self.path)
+                budget.limits.check_member(name, self.length, self.compressed_size)
+        self.crc = zlib.crc32(data, self.crc)
+        if self._candidate_file is not None:
+            if self._candidate_file.read(size) == data:
+                return size
+            self._diverge(self.length - size)
+        self.writer.write_chunk(self._file, data)
+        return size
+
+    def close(self) -> Path:
+        """Finalize the member.
+
+        Permissions and timestamps are applied later, in batches, by the
+        writer.
+
+        Returns:
+            Output path of the member
+        """
+        if self._candidate_file is not None:
+            if self._candidate_file.read(1) == b'':
+                self._candidate_file.close()
+                self._candidate_file = None
+                self.writer.ensure_dir(self.path.parent)
+                method = clone_file(self._candidate, self.path, self.writer.dedup_index.mode)
+                self.writer.dedup_index.record_duplicate(self.length)
+                logger.debug(f"Deduplicated {self.path} against {self._candidate} ({method})")
+                self.linked = method == 'hardlink'
+            else:
+                self._diverge(self.length)
+        if self._file is not None:
+            if self.writer.durability_mode == 'file':
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            if self.writer.dedup_index is not None:
+                self.writer.dedup_index.register(self.path, self.length, self.crc)
+
+        self.writer._finish_member(self)
+        return self.path
+
+    def abort(self) -> None:
+        """Discard a partially written member."""
+        for f in (self._file, self._candidate_file):
+            if f is not None:
+                f.close()
+        self._file = self._candidate_file = None
+        self.path.unlink(missing_ok=True)
+        self.writer._finish_member(self, aborted=True)
+
+class ExtractionWriter:
+    """Shared write path used by extractors to materialize archive members.
+
+    Extractors hand every regular member to the writer instead of letting
+    the archive library write it, so features such as deduplication apply
+    uniformly to all formats.
+
+    Directories created are remembered, so members sharing a directory
+    don't repeat the ``mkdir`` calls. Permissions and timestamps of
+    finished members are applied in batches of ``METADATA_BATCH_SIZE``,
+    and by ``finish``, rather than one member at a time, or not at all
+    when metadata is not preserved.
+
+    With a checkpoint journal finished members are recorded in the same
+    batches, after their metadata is applied, and members recorded by an
+    interrupted earlier run are reported by ``completed`` so extractors can
+    skip them. Batches are then also cut every ``JOURNAL_INTERVAL`` seconds
+    and ``JOURNAL_BYTES`` of output, so a killed extraction loses little
+    work however large its members are. A checkpointed archive position is
+    only recorded once every member before it is.
+
+    With an output budget every member and every chunk of data is charged
+    against the decompression bomb limits of the archive, and extraction
+    aborts with ``ExtractionLimitExceeded`` as soon as one is crossed.
+
+    In ``file`` durability mode every member is fsynced before it is
+    closed. In ``directory`` mode finished members are collected per
+    directory and fsynced in batches on the durability thread pool while
+    extraction goes on; ``finish`` waits for them and flushes the
+    directories.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # Finished members collected before their metadata is applied
+    METADATA_BATCH_SIZE = 1024
+
+    # Seconds and output bytes after which finished members are journaled
+    # even if the metadata batch is not full
+    JOURNAL_INTERVAL = 1.0
+    JOURNAL_BYTES = 64 * 1024 * 1024
+
+    def __init__(
+        self,
+        target_dir: Path,
+        dedup_index: Optional[DedupIndex] = None,
+        journal: Optional[CheckpointJournal] = None,
+        governor: Optional[ResourceGovernor] = None,
+        durability: Optional[Durability] = None,
+        budget: Optional[OutputBudget] = None,
+        preserve_metadata: bool = True
+    ):
+        """Initialize the extraction writer.
+
+        Args:
+            target_dir: Directory members are extracted into
+            dedup_index: Optional index used to deduplicate output files
+            journal: Optional checkpoint journal of the extraction
+            governor: Optional governor rate limiting the output
+            durability: Optional durability mode for the output
+            budget: Optional decompression bomb limits of the archive
+            preserve_metadata: Whether to apply the permissions and
+                timestamps stored in the archive
+        """
+        self.target_dir = Path(target_dir)
+        self._real_target = os.path.realpath(self.target_dir)
+        self.dedup_index = dedup_index
+        self.journal = journal
+        self.governor = governor
+        self.durability = durability
+        self.durability_mode = durability.mode if durability is not None else 'none'
+        self.budget = budget
+        self.preserve_metadata = preserve_metadata
+        self.bytes_written = 0
+        self.members_written = 0
+        self.members_skipped = 0
+        self._open_sinks: Set[MemberSink] = set()
+        self._created_dirs: Set[Path] = set()
+        self._finished: List[MemberSink] = []
+        self._pending_offset: Optional[int] = None
+        self._unjournaled_bytes = 0
+        self._journaled_at = time.monotonic()
+        self._dir_metadata: List[Tuple[Path, Optional[int], Optional[float]]] = []
+        self._journaled_dirs: Set[str] = set()
+        self._sync_batches: Dict[Path, List[Path]] = {}
+        self._synced_dirs: Set[Path] = set()
+        self._pending_syncs: List[Future] = []
+        self._lock = threading.Lock()
+        if journal is not None:
+            for entry in journal.dirs:
+                self._journaled_dirs.add(entry['dir'])
+                self._dir_metadata.append(
+                    (self.target_dir / entry['dir'], entry['mode'], entry['mtime'])
+                )
+
+    @property
+    def resuming(self) -> bool:
+        """Whether an earlier run of this extraction left finished members."""
+        return self.journal is not None and bool(self.journal.files)
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.target_dir).as_posix()
+
+    def completed(self, name: str, size: Optional[int] = None, crc: Optional[int] = None) -> bool:
+        """Check whether an earlier run already wrote a member.
+
+        The journal entry must match the archive metadata, if given, and
+        the file must still have the size and modification time it was
+        left with. Reading it back is avoided on purpose: that would cost
+        as much I/O as the extraction the journal saves.
+
+        Args:
+            name: Member name
+            size: Uncompressed size from the archive metadata
+            crc: CRC32 from the archive metadata
+
+        Returns:
+            True if the member can be skipped
+        """
+        if not self.resuming:
+            return False
+        path = self.resolve(name)
+        entry = self.journal.files.get(self._relative(path))
+        if entry is None or not self._verify(path, entry):
+            return False
+        if (size is not None and size != entry['size']) or (crc is not None and crc != entry['crc']):
+            return False
+        with self._lock:
+            self.members_skipped += 1
+        return True
+
+    @staticmethod
+    def _verify(path: Path, entry: dict) -> bool:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return False
+        return st.st_size == entry['size'] and st.st_mtime_ns == entry['mtime_ns']
+
+    def checkpoint(self, offset: int) -> None:
+        """Record that every member before an archive position is written.
+
+        The position is recorded with the next batch of finished members.
+
+        Args:
+            offset: Position in the (uncompressed) archive stream
+        """
+        if self.journal is not None:
+            with self._lock:
+                self._pending_offset = offset
+
+    def resume_offset(self) -> Optional[int]:
+        """Return the archive position an earlier run got to.
+
+        The position is only trusted when every file recorded before it is
+        still intact.
+
+        Returns:
+            Position to resume reading at, or None to start from the beginning
+        """
+        if not self.resuming or self.journal.offset is None:
+            return None
+        for name, entry in self.journal.files.items():
+            if not self._verify(self.target_dir / name, entry):
+                logger.info(f"{name} changed since it was extracted, not resuming at the checkpoint")
+                return None
+        with self._lock:
+            self.members_skipped += len(self.journal.files)
+        return self.journal.offset
+
+    def write_chunk(self, f: BinaryIO, data: bytes) -> None:
+        """Write output data, within the governor's rate limit if there is one.
+
+        Args:
+            f: Output file
+            data: Data to write
+        """
+        if self.governor is None:
+            f.write(data)
+        else:
+            self.governor.write(f, data)
+
+    def resolve(self, name: str) -> Path:
+        """Map a member name to a path inside the target directory.
+
+        Absolute paths, drive letters and ``..`` components are stripped,
+        so members can never be written outside the target directory.
+
+        Args:
+            name: Member name as stored in the archive
+
+        Returns:
+            Output path
+
+        Raises:
+            ValueError: If nothing is left of the name after sanitizing
+        """
+        parts = [p for p in name.replace('\\', '/').split('/') if p not in ('', '.', '..')]
+        if parts and len(parts[0]) == 2 and parts[0][1] == ':':
+            parts = parts[1:]
+        if not parts:
+            raise ValueError(f"Invalid member name: {name!r}")
+        return self.target_dir.joinpath(*parts)
+
+    def _is_inside(self, path: Union[str, Path]) -> bool:
+        """Tell whether a path, with symlinks resolved, is in the target directory."""
+        real = os.path.realpath(path)
+        return real == self._real_target or real.startswith(self._real_target + os.sep)
+
+    def ensure_dir(self, path: Path) -> None:
+        """Create a directory and its parents if needed.
+
+        Directories this writer already created or found are skipped
+        without a syscall. Any other directory is first checked to stay
+        inside the target directory once symlinks are resolved, so a link
+        extracted earlier cannot redirect later members.
+
+        Args:
+            path: Directory to create
+
+        Raises:
+            ValueError: If the directory resolves outside the target directory
+        """
+        if path in self._created_dirs:
+            return
+        if not self._is_inside(path):
+            raise ValueError(f"{self._relative(path)} points outside of the target directory")
+        path.mkdir(parents=True, exist_ok=True)
+        for directory in (path, *path.parents):
+            if directory in self._created_dirs:
+                break
+            self._created_dirs.add(directory)
+            if directory == self.target_dir:
+                break
+
+    def make_dir(self, name: str, mode: Optional[int] = None, mtime: Optional[float] = None) -> Path:
+        """Create a directory member.
+
+        Directory metadata is applied by ``finish`` so that restrictive
+        permissions don't prevent writing the directory's contents.
+
+        Args:
+            name: Member name
+            mode: Permission bits to apply
+            mtime: Modification time to apply
+
+        Returns:
+            Directory path
+        """
+        path = self.resolve(name)
+        if self.budget is not None:
+            self.budget.add_member()
+        self.ensure_dir(path)
+        if self.preserve_metadata and (mode is not None or mtime is not None):
+            relative = self._relative(path)
+            with self._lock:
+                self._dir_metadata.append((path, mode, mtime))
+                journal_it = self.journal is not None and relative not in self._journaled_dirs
+                self._journaled_dirs.add(relative)
+            if journal_it:
+                self.journal.record_dir(relative, mode, mtime)
+        return path
+
+    def make_symlink(self, name: str, target: str) -> Path:
+        """Create a symbolic link member.
+
+        Args:
+            name: Member name
+            target: Link target as stored in the archive
+
+        Returns:
+            Link path
+
+        Raises:
+            ValueError: If the link would point outside the target directory
+        """
+        path = self.resolve(name)
+        if self.budget is not None:
+            self.budget.add_member()
+        self.ensure_dir(path.parent)
+        if not self._is_inside(path.parent / target):
+            raise ValueError(f"Symlink {name} -> {target} points outside of the target directory")
+        if path.is_symlink() or path.is_file():
+            self.flush()
+            path.unlink()
+        os.symlink(target, path)
+        # Directories seen so far were checked without this link in place
+        self._created_dirs.clear()
+        return path
+
+    def open_member(
+        self,
+        name: str,
+        size: Optional[int] = None,
+        crc: Optional[int] = None,
+        mode: Optional[int] = None,
+        mtime: Optional[float] = None,
+        compressed_size: Optional[int] = None
+    ) -> MemberSink:
+        """Open a regular file member for push-style writing.
+
+        Args:
+            name: Member name
+            size: Uncompressed size from the archive metadata
+            crc: CRC32 from the archive metadata
+            mode: Permission bits to apply once written
+            mtime: Modification time to apply once written
+            compressed_size: Compressed size from the archive metadata
+
+        Returns:
+            Sink accepting the member data
+
+        Raises:
+            ExtractionLimitExceeded: If the archive has too many members
+        """
+        path = self.resolve(name)
+        if self.budget is not None:
+            self.budget.add_member()
+        sink = MemberSink(self, path, size, crc, mode, mtime, compressed_size)
+        with self._lock:
+            self._open_sinks.add(sink)
+        return sink
+
+    def write_member(
+        self,
+        name: str,
+        source: BinaryIO,
+        size: Optional[int] = None,
+        crc: Optional[int] = None,
+        mode: Optional[int] = None,
+        mtime: Optional[float] = None,
+        compressed_size: Optional[int] = None
+    ) -> Path:
+        """Copy a regular file member from a readable stream.
+
+        Args:
+            name: Member name
+            source: Stream yielding the uncompressed member data
+            size: Uncompressed size from the archive metadata
+            crc: CRC32 from the archive metadata
+            mode: Permission bits to apply once written
+            mtime: Modification time to apply once written
+            compressed_size: Compressed size from the archive metadata
+
+        Returns:
+            Output path
+        """
+        sink = self.open_member(name, size, crc, mode, mtime, compressed_size)
+        try:
+            while True:
+                chunk = source.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                sink.write(chunk)
+        except BaseException:
+            sink.abort()
+            raise
+        return sink.close()
+
+    def dedup_existing(self, name: str, size: int, crc: Optional[int] = None) -> None:
+        """Deduplicate a member that was written by an external tool.
+
+        This only saves space, not write bandwidth, and is used for formats
+        whose data never passes through the writer.
+
+        Args:
+            name: Member name
+            size: Size from the archive metadata
+            crc: CRC32 from the archive metadata
+        """
+        if self.dedup_index is None:
+            return
+        path = self.resolve(name)
+        if not path.is_file():
+            return
+        candidate = self.dedup_index.lookup(size, crc)
+        if candidate is not None and candidate != path and filecmp.cmp(candidate, path, shallow=False):
+            clone_file(candidate, path, self.dedup_index.mode)
+            self.dedup_index.record_duplicate(size)
+        elif crc is not None:
+            self.dedup_index.register(path, size, crc)
+
+    def _finish_member(self, sink: MemberSink, aborted: bool = False) -> None:
+        """Book-keeping after a sink is closed or aborted.
+
+        Args:
+            sink: The finished sink
+            aborted: Whether the member was discarded
+        """
+        with self._lock:
+            self._open_sinks.discard(sink)
+            if aborted:
+                return
+            self.bytes_written += sink.length
+            self.members_written += 1
+            self._finished.append(sink)
+            full = len(self._finished) >= self.METADATA_BATCH_SIZE
+            if self.journal is not None:
+                self._unjournaled_bytes += sink.length
+                full = full or (
+                    self._unjournaled_bytes >= self.JOURNAL_BYTES
+                    or time.monotonic() - self._journaled_at >= self.JOURNAL_INTERVAL
+                )
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Apply metadata to finished members, then sync and journal them.
+
+        Must be called before anything but the writer replaces an output
+        path, so metadata is never applied through a link put there since.
+        Metadata is not applied through a hardlink made by deduplication
+        either; it belongs to the other copy.
+        """
+        with self._lock:
+            finished, self._finished = self._finished, []
+            offset, self._pending_offset = self._pending_offset, None
+            self._unjournaled_bytes = 0
+            self._journaled_at = time.monotonic()
+        entries = []
+        for sink in finished:
+            if self.preserve_metadata and not sink.linked:
+                if sink.mode is not None:
+                    os.chmod(sink.path, sink.mode & 0o777)
+                if sink.mtime is not None:
+                    os.utime(sink.path, (sink.mtime, sink.mtime))
+            if self.durability_mode in ('directory', 'file'):
+                self._queue_sync(sink.path)
+            if self.journal is not None:
+                entries.append((
+                    self._relative(sink.path), sink.length, sink.crc,
+                    os.lstat(sink.path).st_mtime_ns
+                ))
+        if self.journal is not None:
+            self.journal.record_files(entries)
+            if offset is not None:
+                self.journal.record_offset(offset)
+
+    def _queue_sync(self, path: Path) -> None:
+        """Note a finished file for the fsyncs of its durability mode.
+
+        Args:
+            path: Finished output file
+        """
+        with self._lock:
+            self._synced_dirs.add(path.parent)
+            if self.durability_mode != 'directory':
+                return
+            batch = self._sync_batches.setdefault(path.parent, [])
+            batch.append(path)
+            if len(batch) < self.durability.BATCH_SIZE:
+                return
+            del self._sync_batches[path.parent]
+            self._pending_syncs.extend(self.durability.submit_fsync(p) for p in batch)
+
+    def _flush_syncs(self) -> None:
+        """Issue the remaining fsyncs and wait for all of them.
+
+        Raises:
+            OSError: If any fsync failed
+        """
+        if self.durability_mode not in ('directory', 'file'):
+            return
+        with self._lock:
+            futures = self._pending_syncs
+            for batch in self._sync_batches.values():
+                futures.extend(self.durability.submit_fsync(p) for p in batch)
+            directories = self._synced_dirs
+            self._pending_syncs, self._sync_batches, self._synced_dirs = [], {}, set()
+        wait_all(futures)
+        # Entries are only durable once their directory is flushed too
+        wait_all([self.durability.submit_fsync(d, directory=True) for d in directories])
+
+    def sync_existing(self, names: Iterable[str]) -> None:
+        """Make members written by an external tool durable.
+
+        Args:
+            names: Member names of the regular files written
+        """
+        if self.durability_mode not in ('directory', 'file'):
+            return
+        with self._lock:
+            self._synced_dirs.add(self.target_dir)
+        for name in names:
+            path = self.resolve(name)
+            if path.is_file() and not path.is_symlink():
+                self._pending_syncs.append(self.durability.submit_fsync(path))
+                with self._lock:
+                    self._synced_dirs.add(path.parent)
+        self._flush_syncs()
+
+    def abort(self) -> None:
+        """Discard all members that are still being written."""
+        with self._lock:
+            sinks = list(self._open_sinks)
+        for sink in sinks:
+            sink.abort()
+
+    def finish(self) -> None:
+        """Apply deferred metadata and wait for outstanding fsyncs.
+
+        Directory metadata is applied last, deepest directories first.
+
+        Raises:
+            OSError: If the output could not be made durable
+        """
+        if self.members_skipped:
+            logger.info(f"Skipped {self.members_skipped} members finished by an earlier run")
+        self.flush()
+        self._flush_syncs()
+        for path, mode, mtime in sorted(self._dir_metadata, key=lambda d: len(d[0].parts), reverse=True):
+            try:
+                if mode is not None:
+                    os.chmod(path, mode & 0o777)
+                if mtime is not None:
+                    os.utime(path, (mtime, mtime))
+            except OSError as e:
+                logger.debug(f"Could not apply metadata to {path}: {e}")
+        self._dir_metadata.clear()
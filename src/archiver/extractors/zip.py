@@ -1,15 +1,34 @@
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, List, Optional, Tuple
 import zipfile
 
-from .base import BaseExtractor
+from .base import ArchiveMember, BaseExtractor
+from ..utils.checkpoint import CheckpointJournal
+from ..utils.config import ArchiveConfig
+from ..utils.random_access import LRUCache, archive_key
 
 logger = logging.getLogger(__name__)
 
+# General purpose flag bit marking an encrypted entry
+ZIP_FLAG_ENCRYPTED = 0x1
+
 class ZipExtractor(BaseExtractor):
     """Extractor for ZIP archives."""
 
+    # Archives whose central directory is kept parsed for member reads
+    OPEN_ARCHIVES = 8
+
+    def __init__(self, base_dir: Path, config: Optional[ArchiveConfig] = None):
+        """Initialize the ZIP extractor.
+
+        Args:
+            base_dir: Base directory for extraction operations
+            config: Optional configuration settings
+        """
+        super().__init__(base_dir, config)
+        self._open_archives = LRUCache(self.OPEN_ARCHIVES)
+
     @property
     def supported_extensions(self) -> tuple[str, ...]:
         """Return supported file extensions.
@@ -19,12 +38,128 @@ class ZipExtractor(BaseExtractor):
         """
         return ('.zip',)
 
-    def extract(self, archive_path: Path, target_dir: Optional[Path] = None) -> bool:
+    def list_members(self, archive_path: Path) -> List[ArchiveMember]:
+        """List members from the ZIP central directory.
+
+        Args:
+            archive_path: Path to the ZIP archive
+
+        Returns:
+            List of archive members
+        """
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            return [self._to_member(info) for info in zip_ref.infolist()]
+
+    @staticmethod
+    def _to_member(info: zipfile.ZipInfo) -> ArchiveMember:
+        """Convert a ZIP entry to an archive member.
+
+        Args:
+            info: Entry from the central directory
+
+        Returns:
+            Archive member
+        """
+        return ArchiveMember(
+            name=info.filename,
+            size=info.file_size,
+            compressed_size=info.compress_size,
+            crc=info.CRC,
+            is_dir=info.is_dir(),
+            encrypted=bool(info.flag_bits & ZIP_FLAG_ENCRYPTED)
+        )
+
+    def is_encrypted(self, archive_path: Path) -> bool:
+        """Check the central directory for encrypted entries.
+
+        Args:
+            archive_path: Path to the ZIP archive
+
+        Returns:
+            True if any entry is encrypted
+        """
+        return any(member.encrypted for member in self.list_members(archive_path))
+
+    def check_password(self, archive_path: Path, password: str) -> bool:
+        """Check a password by decrypting the smallest encrypted entry.
+
+        The check byte of the encryption header rejects most wrong
+        passwords before any data is read; the CRC of the entry rejects
+        the rest.
+
+        Args:
+            archive_path: Path to the ZIP archive
+            password: Candidate password
+
+        Returns:
+            True if the password decrypts the entry
+        """
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            encrypted = [
+                info for info in zip_ref.infolist()
+                if info.flag_bits & ZIP_FLAG_ENCRYPTED and not info.is_dir()
+            ]
+            if not encrypted:
+                return True
+            info = min(encrypted, key=lambda i: i.compress_size)
+            try:
+                with zip_ref.open(info, pwd=password.encode('utf-8')) as member:
+                    while member.read(1024 * 1024):
+                        pass
+            except Exception:
+                # Bad password, or garbage inflated after a false positive
+                # check byte: a bad CRC, or a zlib error on the way there
+                return False
+            return True
+
+    def _open_member(self, archive_path: Path, name: str) -> Tuple[BinaryIO, Optional[int]]:
+        """Open a member by seeking straight to its local header.
+
+        The parsed central directory is kept for the most recently read
+        archives, so further reads from them cost one seek each.
+
+        Args:
+            archive_path: Path to the ZIP archive
+            name: Member name
+
+        Returns:
+            Tuple of the member file object and its size
+        """
+        key = archive_key(archive_path)
+        zip_ref = self._open_archives.get(key)
+        opened = zip_ref is None
+        if opened:
+            zip_ref = zipfile.ZipFile(archive_path, 'r')
+        try:
+            if opened:
+                password = self.find_password(archive_path)
+                if password is not None:
+                    zip_ref.setpassword(password.encode('utf-8'))
+            info = zip_ref.getinfo(name)
+            member = zip_ref.open(info)
+        except BaseException:
+            # Only archives that opened a member are kept
+            if opened:
+                zip_ref.close()
+            raise
+        if opened:
+            for evicted in self._open_archives.put(key, zip_ref):
+                # Members still being read keep their archive open
+                evicted.close()
+        return member, info.file_size
+
+    def extract(
+        self,
+        archive_path: Path,
+        target_dir: Optional[Path] = None,
+        journal: Optional[CheckpointJournal] = None
+    ) -> bool:
         """Extract a ZIP archive.
 
         Args:
             archive_path: Path to the ZIP archive
             target_dir: Optional target directory. If None, extract to archive's directory
+            journal: Optional checkpoint journal of a resumable extraction
 
         Returns:
             True if extraction was successful
@@ -33,21 +168,60 @@ class ZipExtractor(BaseExtractor):
             target_dir = target_dir or archive_path.parent
             logger.info(f"Extracting {archive_path} to {target_dir}")
 
+            selected = self.select_members(archive_path)
+            selected_names = None if selected is None else {m.name for m in selected}
+            writer = self.create_writer(target_dir, archive_path, journal)
+
+            # Find the password with a cheap check before anything is
+            # decompressed
+            password = self.find_password(archive_path)
+
             with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                # Verify archive integrity
-                try:
-                    zip_ref.testzip()
-                except zipfile.BadZipFile as e:
-                    logger.error(f"Archive {archive_path} is corrupted: {e}")
-                    self.stats.failed_extractions += 1
-                    return False
+                if password is not None:
+                    zip_ref.setpassword(password.encode('utf-8'))
+
+                # Check the sizes from the central directory before testzip
+                # decompresses anything. zipfile never reads past the
+                # declared size of a member, so they can't understate it.
+                if writer.budget is not None:
+                    self.output_budget(archive_path).check_declared(
+                        self._to_member(info) for info in zip_ref.infolist()
+                        if selected_names is None or info.filename in selected_names
+                    )
+
+                # Verify archive integrity. With a member filter, or when
+                # resuming, the CRC of each member is checked while it is
+                # extracted instead, so skipped members are never decompressed.
+                if selected is None and not writer.resuming:
+                    try:
+                        zip_ref.testzip()
+                    except zipfile.BadZipFile as e:
+                        return self._fail(
+                            archive_path, f"Archive {archive_path} is corrupted: {e}", e
+                        )
 
                 # Extract the archive
-                zip_ref.extractall(path=target_dir)
+                for info in zip_ref.infolist():
+                    if selected_names is not None and info.filename not in selected_names:
+                        continue
+                    if info.is_dir():
+                        writer.make_dir(info.filename)
+                        continue
+                    if writer.completed(info.filename, size=info.file_size, crc=info.CRC):
+                        continue
+                    with zip_ref.open(info) as source:
+                        writer.write_member(
+                            info.filename,
+                            source,
+                            size=info.file_size,
+                            crc=info.CRC,
+                            compressed_size=info.compress_size
+                        )
+                writer.finish()
                 self.stats.successful_extractions += 1
                 return True
 
         except Exception as e:
-            logger.error(f"Error extracting ZIP file {archive_path}: {str(e)}")
-            self.stats.failed_extractions += 1
-            return False
+            return self._fail(
+                archive_path, f"Error extracting ZIP file {archive_path}: {str(e)}", e
+            )
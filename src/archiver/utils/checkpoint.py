@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class CheckpointJournal:
+    """Append-only record of the members of an archive extracted so far.
+
+    Each line is a JSON object. The first one identifies the archive the
+    journal belongs to; after it come ``{"file": name, "size": n, "crc": c,
+    "mtime_ns": t}`` for a finished regular file, ``{"dir": name, "mode": m,
+    "mtime": t}`` for a directory and ``{"offset": n}`` once everything
+    before that position in the archive has been written. Lines are flushed
+    as they are written, so the journal survives the process being killed.
+    A torn last line is ignored when the journal is loaded.
+
+    The journal is locked while open, so two processes never resume the
+    same extraction at once.
+    """
+
+    def __init__(self, path: Path):
+        """Initialize the journal.
+
+        Args:
+            path: Journal file
+        """
+        self.path = Path(path)
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.dirs: List[Dict[str, Any]] = []
+        self.offset: Optional[int] = None
+        self.identity: Optional[Dict[str, Any]] = None
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def _lock_file(self) -> bool:
+        """Open and lock the journal file.
+
+        Returns:
+            False if another process holds the journal
+        """
+        while True:
+            self._file = open(self.path, 'a+', encoding='utf-8')
+            if fcntl is None:
+                return True
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                self._file = None
+                return False
+            # The previous holder may have deleted the file before we locked it
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino:
+                    return True
+            except FileNotFoundError:
+                pass
+            self._file.close()
+
+    def open(self, identity: Optional[Dict[str, Any]] = None) -> bool:
+        """Lock the journal and load the entries of an earlier run.
+
+        Args:
+            identity: Name, size and mtime of the archive being extracted.
+                A journal written for a different version of the archive
+                is emptied.
+
+        Returns:
+            False if another process holds the journal
+        """
+        if not self._lock_file():
+            return False
+
+        self._file.seek(0)
+        for line in self._file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if 'archive' in entry:
+                self.identity = entry['archive']
+            elif 'file' in entry:
+                self.files[entry['file']] = entry
+            elif 'dir' in entry:
+                self.dirs.append(entry)
+            elif 'offset' in entry:
+                self.offset = entry['offset']
+
+        if identity is not None and identity != self.identity:
+            self._file.truncate(0)
+            self.files.clear()
+            self.dirs.clear()
+            self.offset = None
+            self.identity = identity
+            self._append({'archive': identity})
+        elif self.files:
+            logger.info(f"Resuming extraction with {len(self.files)} members already done")
+        return True
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        self._append_many([entry])
+
+    def _append_many(self, entries: List[Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        with self._lock:
+            if self._file is not None:
+                self._file.write(''.join(json.dumps(e) + '\n' for e in entries))
+                self._file.flush()
+
+    def record_file(self, name: str, size: int, crc: int, mtime_ns: int) -> None:
+        """Record a finished regular file.
+
+        Args:
+            name: Output path relative to the target directory
+            size: File size
+            crc: CRC32 of the file data
+            mtime_ns: Modification time of the written file
+        """
+        entry = {'file': name, 'size': size, 'crc': crc, 'mtime_ns': mtime_ns}
+        self.files[name] = entry
+        self._append(entry)
+
+    def record_files(self, entries: List[Tuple[str, int, int, int]]) -> None:
+        """Record a batch of finished regular files in one write.
+
+        Args:
+            entries: Tuples of the arguments of ``record_file``
+        """
+        lines = []
+        for name, size, crc, mtime_ns in entries:
+            entry = {'file': name, 'size': size, 'crc': crc, 'mtime_ns': mtime_ns}
+            self.files[name] = entry
+            lines.append(entry)
+        self._append_many(lines)
+
+    def record_dir(self, name: str, mode: Optional[int], mtime: Optional[float]) -> None:
+        """Record a directory whose metadata is applied at the end.
+
+        Args:
+            name: Output path relative to the target directory
+            mode: Permission bits
+            mtime: Modification time
+        """
+        entry = {'dir': name, 'mode': mode, 'mtime': mtime}
+        self.dirs.append(entry)
+        self._append(entry)
+
+    def record_offset(self, offset: int) -> None:
+        """Record that everything before a position in the archive is written.
+
+        Args:
+            offset: Archive position to resume reading at
+        """
+        self.offset = offset
+        self._append({'offset': offset})
+
+    def close(self) -> None:
+        """Release the journal."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def remove(self) -> None:
+        """Close and delete the journal."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -1,11 +1,40 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_size(value: str) -> int:
+    """Parse a human readable byte size such as ``512``, ``10M`` or ``1.5G``.
+
+    Args:
+        value: Size string with an optional binary unit suffix (K, M, G, T)
+
+    Returns:
+        Size in bytes
+
+    Raises:
+        ValueError: If the size cannot be parsed
+    """
+    text = str(value).strip().upper()
+    if text.endswith('IB'):
+        text = text[:-2]
+    elif text.endswith('B'):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in _SIZE_UNITS else ''
+    number = text[:len(text) - len(unit)]
+    try:
+        size = int(float(number) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size: {value}")
+    if size < 0:
+        raise ValueError(f"Size must not be negative: {value}")
+    return size
+
 @dataclass
 class ArchiveConfig:
     """Configuration for archive processing."""
@@ -20,6 +49,54 @@ class ArchiveConfig:
     max_workers: int = 4
     delete_after_extract: bool = False
     verify_integrity: bool = True
+    reserve_disk_space: bool = True
+    atomic_extraction: bool = True
+    resumable_extraction: bool = True
+    durability: str = 'none'
+    preserve_metadata: bool = True
+    schedule_policy: str = 'fifo'
+    # Directories listed at once while scanning, 0 for automatic (many on
+    # network filesystems, one on local disks)
+    scan_workers: int = 0
+    # Archives extracted at once per device, keyed by any path on it
+    device_workers: Dict[str, int] = field(default_factory=dict)
+    auto_device_workers: bool = False
+    starvation_limit: int = 100
+    min_free_space: int = 0
+    
+    # Decompression bomb limits, 0 for no limit
+    max_compression_ratio: float = 1000.0
+    max_output_size: int = 0
+    max_archive_members: int = 0
+    
+    # Resource governance settings
+    max_write_rate: int = 0
+    nice: int = 0
+    io_idle: bool = False
+    adaptive_concurrency: bool = False
+    latency_threshold: float = 3.0
+    
+    # Post-extraction hook settings; callables are given as module:function
+    hook_commands: List[str] = field(default_factory=list)
+    hook_callables: List[str] = field(default_factory=list)
+    hook_workers: int = 2
+    hook_batch_window: float = 5.0
+    hook_batch_size: int = 100
+    hook_group_by: str = 'directory'
+    hook_timeout: float = 0.0
+    
+    # Multi-host coordination settings
+    coordination_dir: Optional[Path] = None
+    lease_ttl: float = 60.0
+    
+    # Failure cache settings, quarantine_dir enables the cache as well
+    failure_cache: bool = False
+    failure_cache_file: Optional[Path] = None
+    failure_backoff: float = 3600.0
+    failure_backoff_max: float = 7 * 24 * 3600.0
+    retry_failed: bool = False
+    quarantine_dir: Optional[Path] = None
+    quarantine_after: int = 3
     
     # Nested archive settings
     process_nested: bool = False
@@ -28,9 +105,25 @@ class ArchiveConfig:
     
     # Archive-specific settings
     password: Optional[str] = None
+    passwords: List[str] = field(default_factory=list)
+    password_file: Optional[Path] = None
     skip_existing: bool = True
     overwrite: bool = False
     
+    # Member filter settings
+    include_patterns: List[str] = field(default_factory=list)
+    exclude_patterns: List[str] = field(default_factory=list)
+    min_member_size: Optional[int] = None
+    max_member_size: Optional[int] = None
+    
+    # Deduplication settings
+    dedup_mode: str = 'off'
+    dedup_min_size: int = 1024 * 1024
+    dedup_index_file: Optional[Path] = None
+    
+    # Member read settings
+    member_cache_size: int = 64 * 1024 * 1024
+    
     # Format settings
     enable_zip: bool = True
     enable_rar: bool = True
@@ -62,6 +155,13 @@ class ArchiveConfig:
                 config_data['base_dir'] = Path(config_data['base_dir'])
             if 'log_file' in config_data and config_data['log_file']:
                 config_data['log_file'] = Path(config_data['log_file'])
+            if config_data.get('coordination_dir'):
+                config_data['coordination_dir'] = Path(config_data['coordination_dir'])
+            if config_data.get('dedup_index_file'):
+                config_data['dedup_index_file'] = Path(config_data['dedup_index_file'])
+            for key in ('failure_cache_file', 'quarantine_dir', 'password_file'):
+                if config_data.get(key):
+                    config_data[key] = Path(config_data[key])
             
             return cls(**config_data)
         
@@ -99,12 +199,95 @@ class ArchiveConfig:
         if self.max_workers < 1:
             raise ValueError("max_workers must be at least 1")
         
+        if self.schedule_policy not in ('fifo', 'smallest', 'newest', 'shortest-time'):
+            raise ValueError(
+                "schedule_policy must be one of: fifo, smallest, newest, shortest-time"
+            )
+        
+        if self.durability not in ('none', 'archive', 'directory', 'file'):
+            raise ValueError("durability must be one of: none, archive, directory, file")
+        
+        if self.scan_workers < 0:
+            raise ValueError("scan_workers must not be negative")
+        
+        if any(limit < 1 for limit in self.device_workers.values()):
+            raise ValueError("device_workers limits must be at least 1")
+        
+        if self.starvation_limit < 1:
+            raise ValueError("starvation_limit must be at least 1")
+        
+        if self.min_free_space < 0:
+            raise ValueError("min_free_space must not be negative")
+        
+        if self.max_compression_ratio < 0:
+            raise ValueError("max_compression_ratio must not be negative")
+        
+        if self.max_output_size < 0:
+            raise ValueError("max_output_size must not be negative")
+        
+        if self.max_archive_members < 0:
+            raise ValueError("max_archive_members must not be negative")
+        
+        if self.max_write_rate < 0:
+            raise ValueError("max_write_rate must not be negative")
+        
+        if not 0 <= self.nice <= 19:
+            raise ValueError("nice must be between 0 and 19")
+        
+        if self.latency_threshold <= 1:
+            raise ValueError("latency_threshold must be greater than 1")
+        
+        if self.hook_workers < 1:
+            raise ValueError("hook_workers must be at least 1")
+        
+        if self.hook_batch_window < 0:
+            raise ValueError("hook_batch_window must not be negative")
+        
+        if self.hook_batch_size < 1:
+            raise ValueError("hook_batch_size must be at least 1")
+        
+        if self.hook_group_by not in ('directory', 'none'):
+            raise ValueError("hook_group_by must be one of: directory, none")
+        
+        if self.hook_timeout < 0:
+            raise ValueError("hook_timeout must not be negative")
+        
+        if self.lease_ttl <= 0:
+            raise ValueError("lease_ttl must be positive")
+        
+        if self.failure_backoff < 0 or self.failure_backoff_max < self.failure_backoff:
+            raise ValueError("failure_backoff must be between 0 and failure_backoff_max")
+        
+        if self.quarantine_after < 1:
+            raise ValueError("quarantine_after must be at least 1")
+        
         if self.max_depth < 1:
             raise ValueError("max_depth must be at least 1")
         
         if self.log_file and not isinstance(self.log_file, Path):
             raise ValueError("log_file must be a Path object")
         
+        for name in ('min_member_size', 'max_member_size'):
+            value = getattr(self, name)
+            if value is not None and value < 0:
+                raise ValueError(f"{name} must not be negative")
+        
+        if self.member_cache_size < 0:
+            raise ValueError("member_cache_size must not be negative")
+        
+        if self.password_file is not None and not self.password_file.is_file():
+            raise ValueError(f"password_file does not exist: {self.password_file}")
+        
+        if self.dedup_mode not in ('off', 'hardlink', 'reflink'):
+            raise ValueError("dedup_mode must be one of: off, hardlink, reflink")
+        
+        if (
+            self.min_member_size is not None
+            and self.max_member_size is not None
+            and self.min_member_size > self.max_member_size
+        ):
+            raise ValueError("min_member_size must not exceed max_member_size")
+        
         # Validate base_dir exists if not in dry run mode
         if not self.dry_run and not self.base_dir.exists():
             raise ValueError(f"base_dir does not exist: {self.base_dir}")
@@ -0,0 +1,262 @@
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..extractors.base import ArchiveMember
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archives (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    member_count INTEGER NOT NULL DEFAULT 0,
+    total_size INTEGER NOT NULL DEFAULT 0,
+    indexed REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY,
+    archive_id INTEGER NOT NULL REFERENCES archives(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    compressed_size INTEGER,
+    crc INTEGER,
+    is_dir INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS members_archive ON members(archive_id);
+"""
+
+# Full text index over member names, kept in sync by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS member_names USING fts5(
+    name, content='members', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS members_insert AFTER INSERT ON members BEGIN
+    INSERT INTO member_names(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS members_delete AFTER DELETE ON members BEGIN
+    INSERT INTO member_names(member_names, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+def default_index_path() -> Path:
+    """Return the default location of the content index.
+
+    Returns:
+        Path inside ``$XDG_CACHE_HOME``, or ``~/.cache``
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_dir) / 'archiver' / 'index.sqlite'
+
+class ContentIndex:
+    """SQLite index of archive members, for searching without extracting.
+
+    Each archive is stored with the size and modification time it had when
+    it was listed, so an update only lists archives that are new or have
+    changed. Member names are searchable through an FTS5 full text index
+    when SQLite is built with it, and through ``LIKE`` otherwise.
+
+    The index must be used from the thread that opened it.
+    """
+
+    def __init__(self, db_path: Path):
+        """Open or create the index.
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            logger.debug("SQLite lacks FTS5, searching member names with LIKE")
+            self.full_text = False
+        self.conn.commit()
+
+    def close(self) -> None:
+        """Close the database."""
+        self.conn.close()
+
+    def __enter__(self) -> 'ContentIndex':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _key(archive_path: Path) -> str:
+        return str(Path(archive_path).absolute())
+
+    def is_current(self, archive_path: Path, size: int, mtime_ns: int) -> bool:
+        """Check whether an archive is indexed as it is now.
+
+        Args:
+            archive_path: Path to the archive file
+            size: Current size of the archive
+            mtime_ns: Current modification time of the archive
+
+        Returns:
+            True if the indexed size and mtime match
+        """
+        row = self.conn.execute(
+            'SELECT size, mtime_ns FROM archives WHERE path = ?',
+            (self._key(archive_path),)
+        ).fetchone()
+        return row == (size, mtime_ns)
+
+    def update(
+        self,
+        archive_path: Path,
+        size: int,
+        mtime_ns: int,
+        members: List[ArchiveMember],
+        error: Optional[str] = None
+    ) -> None:
+        """Replace the indexed members of an archive.
+
+        Args:
+            archive_path: Path to the archive file
+            size: Size of the archive when it was listed
+            mtime_ns: Modification time of the archive when it was listed
+            members: Members of the archive
+            error: Why the archive could not be listed, if it couldn't
+        """
+        key = self._key(archive_path)
+        with self.conn:
+            self.conn.execute('DELETE FROM archives WHERE path = ?', (key,))
+            archive_id = self.conn.execute(
+                'INSERT INTO archives (path, size, mtime_ns, member_count, total_size, indexed, error) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    key, size, mtime_ns, len(members),
+                    sum(m.size for m in members if not m.is_dir),
+                    time.time(), error
+                )
+            ).lastrowid
+            self.conn.executemany(
+                'INSERT INTO members (archive_id, name, size, compressed_size, crc, is_dir) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    (archive_id, m.name, m.size, m.compressed_size, m.crc, int(m.is_dir))
+                    for m in members
+                )
+            )
+
+    def prune(self, directory: Path, present: Iterable[Path]) -> int:
+        """Drop archives below a directory that no longer exist.
+
+        Args:
+            directory: Directory that was scanned
+            present: Archives found by the scan
+
+        Returns:
+            Number of archives removed from the index
+        """
+        prefix = self._key(directory).rstrip(os.sep) + os.sep
+        keep = {self._key(path) for path in present}
+        stale = [
+            path for (path,) in self.conn.execute(
+                'SELECT path FROM archives WHERE substr(path, 1, ?) = ?',
+                (len(prefix), prefix)
+            )
+            if path not in keep
+        ]
+        with self.conn:
+            self.conn.executemany('DELETE FROM archives WHERE path = ?', ((p,) for p in stale))
+        return len(stale)
+
+    def archives(self) -> List[Tuple[Path, int, int, Optional[str]]]:
+        """List the indexed archives.
+
+        Returns:
+            Tuples of archive path, member count, total uncompressed size
+            and listing error
+        """
+        return [
+            (Path(path), count, total, error)
+            for path, count, total, error in self.conn.execute(
+                'SELECT path, member_count, total_size, error FROM archives ORDER BY path'
+            )
+        ]
+
+    def members(self, archive_path: Path) -> List[ArchiveMember]:
+        """Return the indexed members of an archive.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            List of archive members, empty if the archive isn't indexed
+        """
+        return [
+            ArchiveMember(name, size, compressed_size, crc, bool(is_dir))
+            for name, size, compressed_size, crc, is_dir in self.conn.execute(
+                'SELECT m.name, m.size, m.compressed_size, m.crc, m.is_dir '
+                'FROM members m JOIN archives a ON a.id = m.archive_id '
+                'WHERE a.path = ? ORDER BY m.id',
+                (self._key(archive_path),)
+            )
+        ]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[Path, ArchiveMember]]:
+        """Find members whose names contain all words of a query.
+
+        With FTS5 the words match the beginnings of words in member names,
+        so ``"big buck"`` finds ``Big.Buck.Bunny.1080p.mkv``.
+
+        Args:
+            query: Words to search for
+            limit: Optional maximum number of results
+
+        Returns:
+            Tuples of archive path and matching member
+        """
+        words = query.split()
+        if not words:
+            return []
+
+        columns = (
+            'SELECT a.path, m.name, m.size, m.compressed_size, m.crc, m.is_dir '
+            'FROM members m JOIN archives a ON a.id = m.archive_id '
+        )
+        if self.full_text:
+            match = ' '.join('"' + word.replace('"', '""') + '"*' for word in words)
+            sql = columns + (
+                'JOIN member_names f ON f.rowid = m.id '
+                'WHERE member_names MATCH ? ORDER BY a.path, m.id'
+            )
+            params: list = [match]
+        else:
+            sql = columns + 'WHERE ' + ' AND '.join(['m.name LIKE ?'] * len(words))
+            sql += ' ORDER BY a.path, m.id'
+            params = [f'%{word}%' for word in words]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        return [
+            (Path(path), ArchiveMember(name, size, compressed_size, crc, bool(is_dir)))
+            for path, name, size, compressed_size, crc, is_dir in self.conn.execute(sql, params)
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of indexed archives and members.
+
+        Returns:
+            Dictionary with ``archives`` and ``members`` counts
+        """
+        (archives,), = self.conn.execute('SELECT COUNT(*) FROM archives')
+        (members,), = self.conn.execute('SELECT COUNT(*) FROM members')
+        return {'archives': archives, 'members': members}
@@ -0,0 +1,247 @@
+import errno
+import json
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl request number of FICLONE (_IOW(0x94, 9, int)) on Linux
+FICLONE = 0x40049409
+
+DEDUP_MODES = ('off', 'hardlink', 'reflink')
+
+def clone_file(source: Path, destination: Path, mode: str) -> str:
+    """Make ``destination`` share the data of ``source``.
+
+    The destination is replaced atomically. Reflinks fall back to a plain
+    copy and hardlinks fall back to a copy when the files are on different
+    filesystems, so the call only fails on real I/O errors.
+
+    Args:
+        source: Existing file with the wanted content
+        destination: Path to create or replace
+        mode: Either 'hardlink' or 'reflink'
+
+    Returns:
+        The method actually used: 'hardlink', 'reflink' or 'copy'
+    """
+    temp_path = destination.with_name(f".{destination.name}.archiver-dedup")
+    temp_path.unlink(missing_ok=True)
+    try:
+        if mode == 'hardlink':
+            try:
+                os.link(source, temp_path)
+                os.replace(temp_path, destination)
+                return 'hardlink'
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+        elif mode == 'reflink' and fcntl is not None:
+            with open(source, 'rb') as src, open(temp_path, 'wb') as dst:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    cloned = True
+                except OSError:
+                    cloned = False
+            if cloned:
+                os.replace(temp_path, destination)
+                return 'reflink'
+
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, destination)
+        return 'copy'
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+class DedupIndex:
+    """Index of extracted files keyed by size and CRC32.
+
+    Entries are only hints: a candidate is always compared byte for byte
+    against the new content before it is linked, so stale or colliding
+    entries cost a short read and never produce wrong output.
+
+    Besides the two lookup tables, the index keeps the keys held by each
+    path and the indexed paths below each directory, so forgetting a path
+    or relocating a tree only touches the entries concerned.
+    """
+
+    def __init__(self, mode: str = 'hardlink', min_size: int = 0):
+        """Initialize the deduplication index.
+
+        Args:
+            mode: How duplicates are materialized ('hardlink' or 'reflink')
+            min_size: Files smaller than this are never deduplicated
+        """
+        self.mode = mode
+        self.min_size = min_size
+        self._by_crc: Dict[Tuple[int, int], str] = {}
+        self._by_size: Dict[int, str] = {}
+        self._keys: Dict[str, List[Tuple[Dict[Any, str], Any]]] = {}
+        self._children: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'deduplicated_files': 0, 'deduplicated_bytes': 0}
+
+    def lookup(self, size: Optional[int], crc: Optional[int] = None) -> Optional[Path]:
+        """Find an existing file that may have the given content.
+
+        Args:
+            size: Uncompressed size from the archive metadata
+            crc: CRC32 from the archive metadata, if the format records one
+
+        Returns:
+            Path of a candidate file, or None
+        """
+        if size is None or size < self.min_size:
+            return None
+        with self._lock:
+            if crc is not None:
+                candidate = self._by_crc.get((size, crc))
+            else:
+                candidate = self._by_size.get(size)
+        if candidate is None:
+            return None
+        try:
+            if os.stat(candidate).st_size == size:
+                return Path(candidate)
+        except OSError:
+            pass
+        self.forget(Path(candidate))
+        return None
+
+    def register(self, path: Path, size: int, crc: int) -> None:
+        """Record a newly written file.
+
+        Args:
+            path: Path of the written file
+            size: Size in bytes
+            crc: CRC32 of the content
+        """
+        if size < self.min_size:
+            return
+        with self._lock:
+            self._add_key(str(path), self._by_crc, (size, crc))
+            self._add_key(str(path), self._by_size, size)
+
+    def _add_key(self, path: str, table: Dict[Any, str], key: Any) -> None:
+        """Point a free key of a lookup table at a path. Call with the lock held.
+
+        Args:
+            path: Path of the file
+            table: Lookup table
+            key: Key in the table
+        """
+        if key in table:
+            return
+        table[key] = path
+        keys = self._keys.get(path)
+        if keys is None:
+            keys = self._keys[path] = []
+            self._link(path)
+        keys.append((table, key))
+
+    def _link(self, path: str) -> None:
+        """Record a path below its ancestors. Call with the lock held.
+
+        Args:
+            path: Newly indexed path
+        """
+        child, parent = path, os.path.dirname(path)
+        while parent != child:
+            siblings = self._children.get(parent)
+            if siblings is not None:
+                siblings.add(child)
+                return
+            self._children[parent] = {child}
+            child, parent = parent, os.path.dirname(parent)
+
+    def forget(self, path: Path) -> None:
+        """Drop all entries pointing at a path.
+
+        Args:
+            path: Path that no longer holds the indexed content
+        """
+        target = str(path)
+        with self._lock:
+            for table, key in self._keys.pop(target, ()):
+                del table[key]
+            self._children.get(os.path.dirname(target), set()).discard(target)
+
+    def relocate(self, old_root: Path, new_root: Path) -> None:
+        """Update entries after a directory tree has been moved.
+
+        Args:
+            old_root: Previous location of the tree
+            new_root: New location of the tree
+        """
+        old, new = str(old_root), str(new_root)
+        with self._lock:
+            moved = []
+            pending = [old]
+            while pending:
+                for child in self._children.pop(pending.pop(), ()):
+                    if child in self._keys:
+                        moved.append(child)
+                    pending.append(child)
+            self._children.get(os.path.dirname(old), set()).discard(old)
+
+            for path in moved:
+                new_path = os.path.join(new, path[len(old) + 1:])
+                keys = self._keys.pop(path)
+                for table, key in keys:
+                    table[key] = new_path
+                if new_path in self._keys:
+                    self._keys[new_path].extend(keys)
+                else:
+                    self._keys[new_path] = keys
+                    self._link(new_path)
+
+    def record_duplicate(self, size: int) -> None:
+        """Count a member that was materialized from an existing copy.
+
+        Args:
+            size: Size of the deduplicated member in bytes
+        """
+        with self._lock:
+            self.stats['deduplicated_files'] += 1
+            self.stats['deduplicated_bytes'] += size
+
+    def load(self, index_file: Path) -> None:
+        """Load entries saved by a previous run.
+
+        Args:
+            index_file: Path to the JSON index file
+        """
+        try:
+            with open(index_file, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dedup index {index_file}: {e}")
+            return
+        for size, crc, path in entries:
+            self.register(Path(path), size, crc)
+
+    def save(self, index_file: Path) -> None:
+        """Save the index so later runs can link against earlier output.
+
+        Args:
+            index_file: Path to the JSON index file
+        """
+        with self._lock:
+            entries = [[size, crc, path] for (size, crc), path in self._by_crc.items()]
+        try:
+            index_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(index_file, 'w') as f:
+                json.dump(entries, f)
+        except Exception as e:
+            logger.error(f"Error saving dedup index {index_file}: {e}")
@@ -0,0 +1,237 @@
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import ArchiveConfig
+    from .scheduling import ArchiveJob
+
+logger = logging.getLogger(__name__)
+
+# Starting limit of a spinning disk when limits are tuned automatically;
+# more concurrent streams than this mostly add seeks
+ROTATIONAL_DEVICE_WORKERS = 2
+
+def device_of(path: Union[str, Path]) -> int:
+    """Return the device number of the filesystem holding a path.
+
+    Args:
+        path: Any existing path
+
+    Returns:
+        ``st_dev`` of the path
+    """
+    return os.stat(path).st_dev
+
+def is_rotational(device: int) -> Optional[bool]:
+    """Tell whether a block device is a spinning disk.
+
+    Args:
+        device: Device number as found in ``st_dev``
+
+    Returns:
+        True for a spinning disk, False for solid state, or None for
+        network and virtual filesystems and where sysfs is not available
+    """
+    block = Path(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}")
+    try:
+        if not (block / 'queue').exists():
+            # Partitions keep their queue settings on the parent disk
+            block = block.resolve().parent
+        return (block / 'queue' / 'rotational').read_text().strip() == '1'
+    except OSError:
+        return None
+
+class DeviceState:
+    """Running jobs, limit and throughput measurements of one device."""
+
+    def __init__(self, limit: int, max_limit: int):
+        """Initialize the device state.
+
+        Args:
+            limit: Starting number of concurrent jobs
+            max_limit: Highest limit automatic tuning may reach
+        """
+        self.limit = limit
+        self.max_limit = max_limit
+        self.running = 0
+        self.direction = 1 if limit < max_limit else -1
+        self.rate: Optional[float] = None
+        self._window_start = time.monotonic()
+        self._window_bytes = 0
+        self._window_jobs = 0
+
+    def observe(self, size: int, window: int) -> None:
+        """Account for a finished job and retune the limit once per window.
+
+        Throughput is the bytes of all jobs finished on the device during
+        a window, divided by the window's wall time. The limit is moved
+        one step at a time: on in the same direction while throughput
+        improves, back the other way once it falls.
+
+        Args:
+            size: Bytes the job moved on this device
+            window: Jobs finished between adjustments
+        """
+        self._window_bytes += size
+        self._window_jobs += 1
+        if self._window_jobs < max(window, self.limit * 2):
+            return
+        now = time.monotonic()
+        rate = self._window_bytes / max(now - self._window_start, 1e-6)
+        if self.rate is not None and rate < self.rate:
+            self.direction = -self.direction
+        self.rate = rate
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_jobs = 0
+
+        limit = min(self.max_limit, max(1, self.limit + self.direction))
+        if limit == self.limit:
+            # At a bound; probe the other way next time
+            self.direction = -self.direction
+        self.limit = limit
+
+class DeviceLimiter:
+    """Caps the number of concurrent jobs per device.
+
+    Jobs are grouped by the device of the archive and of the directory it
+    is extracted into, and a job is only admitted while every one of its
+    devices is below its limit. Limits come from the configuration, keyed
+    by any path on the device. With automatic tuning, devices without a
+    configured limit start at ``ROTATIONAL_DEVICE_WORKERS`` on spinning
+    disks and at the worker count otherwise, and then follow their
+    measured throughput.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        limits: Optional[Dict[int, int]] = None,
+        auto_tune: bool = False,
+        window: int = 8
+    ):
+        """Initialize the limiter.
+
+        Args:
+            max_workers: Global worker limit, the highest any device gets
+            limits: Configured limits by device number
+            auto_tune: Whether to tune limits from measured throughput
+            window: Jobs finished on a device between adjustments
+        """
+        self.max_workers = max_workers
+        self.limits = dict(limits or {})
+        self.auto_tune = auto_tune
+        self.window = window
+        self._devices: Dict[int, DeviceState] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: 'ArchiveConfig') -> 'DeviceLimiter':
+        """Create a limiter from the device settings of a configuration.
+
+        Args:
+            config: Configuration settings
+
+        Returns:
+            DeviceLimiter instance
+        """
+        limits: Dict[int, int] = {}
+        for path, limit in config.device_workers.items():
+            try:
+                limits[device_of(path)] = limit
+            except OSError as e:
+                logger.warning(f"Ignoring worker limit for {path}: {e}")
+        return cls(config.max_workers, limits, auto_tune=config.auto_device_workers)
+
+    def _state(self, device: int) -> DeviceState:
+        """Return the state of a device, creating it on first use."""
+        state = self._devices.get(device)
+        if state is None:
+            limit = self.limits.get(device)
+            if limit is None:
+                limit = self.max_workers
+                if self.auto_tune and is_rotational(device):
+                    limit = ROTATIONAL_DEVICE_WORKERS
+            limit = min(limit, self.max_workers)
+            state = DeviceState(limit, self.max_workers if self.auto_tune else limit)
+            self._devices[device] = state
+        return state
+
+    def devices(self, job: 'ArchiveJob') -> Tuple[int, ...]:
+        """Return the devices a job reads from and writes to.
+
+        Args:
+            job: Job in the work queue
+
+        Returns:
+            Device numbers of the archive and its target directory, once
+            each
+        """
+        if not job.devices:
+            source = device_of(job.path)
+            target = device_of(job.path.parent)
+            job.devices = (source,) if source == target else (source, target)
+        return job.devices
+
+    def try_acquire(self, job: 'ArchiveJob') -> bool:
+        """Claim a slot on every device of a job if all have one free.
+
+        Args:
+            job: Job about to be dispatched
+
+        Returns:
+            True if the job may run
+        """
+        devices = self.devices(job)
+        with self._lock:
+            states = [self._state(d) for d in devices]
+            if any(s.running >= s.limit for s in states):
+                return False
+            for state in states:
+                state.running += 1
+        return True
+
+    def release(self, job: 'ArchiveJob') -> None:
+        """Give back the slots of a job, feeding its throughput when tuning.
+
+        Args:
+            job: Finished or cancelled job
+        """
+        with self._lock:
+            for i, device in enumerate(job.devices):
+                state = self._devices[device]
+                state.running -= 1
+                if not self.auto_tune or job.abandoned or not job.success:
+                    continue
+                # The archive is read from the first device and written to
+                # the last one; a single device does both
+                moved = 0
+                if i == 0:
+                    moved += job.size
+                if i == len(job.devices) - 1:
+                    moved += job.bytes_written or job.size
+                previous = state.limit
+                state.observe(moved, self.window)
+                if state.limit != previous:
+                    logger.info(
+                        f"Device {os.major(device)}:{os.minor(device)} throughput "
+                        f"{(state.rate or 0) / (1024 * 1024):.1f} MiB/s, "
+                        f"limit {previous} -> {state.limit}"
+                    )
+
+    @property
+    def stats(self) -> Dict[str, str]:
+        """Return the current limit of every device seen.
+
+        Returns:
+            Dictionary with the limits as ``major:minor=limit`` pairs
+        """
+        with self._lock:
+            limits = ', '.join(
+                f"{os.major(d)}:{os.minor(d)}={s.limit}" for d, s in sorted(self._devices.items())
+            )
+        return {'device_limits': limits} if limits else {}
@@ -0,0 +1,85 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class DiskSpaceGovernor:
+    """Reserves free space per filesystem for extractions in flight.
+
+    Reservations are counted against the free space reported by
+    ``os.statvfs`` at admission time. Space written by running jobs is
+    reflected in that figure while their reservations are still held, so the
+    accounting errs on the side of deferring jobs, never of overcommitting.
+    """
+
+    def __init__(self, min_free_space: int = 0):
+        """Initialize the disk space governor.
+
+        Args:
+            min_free_space: Bytes to always leave free on every filesystem
+        """
+        self.min_free_space = min_free_space
+        self._reserved: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def available(self, path: Path) -> int:
+        """Return the space usable for new extractions on a filesystem.
+
+        Args:
+            path: Any existing path on the filesystem
+
+        Returns:
+            Free bytes minus the safety margin, ignoring reservations
+        """
+        st = os.statvfs(path)
+        return st.f_bavail * st.f_frsize - self.min_free_space
+
+    def try_reserve(self, path: Path, size: int) -> bool:
+        """Reserve space for an extraction if it fits.
+
+        Args:
+            path: Directory the extraction writes into
+            size: Bytes the extraction is expected to write
+
+        Returns:
+            True if the space was reserved
+        """
+        device = os.stat(path).st_dev
+        available = self.available(path)
+        with self._lock:
+            reserved = self._reserved.get(device, 0)
+            if size > available - reserved:
+                logger.debug(
+                    f"Deferring {size} byte extraction into {path}: "
+                    f"{available - reserved} bytes unreserved"
+                )
+                return False
+            self._reserved[device] = reserved + size
+            return True
+
+    def reserved(self, path: Path) -> int:
+        """Return the space reserved on the filesystem of a path.
+
+        Args:
+            path: Any existing path on the filesystem
+
+        Returns:
+            Bytes reserved by extractions in flight
+        """
+        device = os.stat(path).st_dev
+        with self._lock:
+            return self._reserved.get(device, 0)
+
+    def release(self, path: Path, size: int) -> None:
+        """Release a reservation made with ``try_reserve``.
+
+        Args:
+            path: Directory passed to ``try_reserve``
+            size: Size passed to ``try_reserve``
+        """
+        device = os.stat(path).st_dev
+        with self._lock:
+            self._reserved[device] = max(0, self._reserved.get(device, 0) - size)
@@ -0,0 +1,158 @@
+import ctypes
+import functools
+import logging
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# How extracted data is made to survive a crash or power loss:
+#   none       leave it to the kernel's writeback
+#   archive    one syncfs() of the target filesystem per archive
+#   directory  fsync the files of each directory in batches on a thread pool
+#   file       fsync every file before it is closed
+DURABILITY_MODES = ('none', 'archive', 'directory', 'file')
+
+def fsync_path(path: Path, directory: bool = False) -> None:
+    """Flush a file or directory to stable storage.
+
+    Args:
+        path: File or directory
+        directory: Whether the path is a directory
+    """
+    flags = os.O_RDONLY | (getattr(os, 'O_DIRECTORY', 0) if directory else 0)
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@functools.lru_cache(maxsize=None)
+def _libc_syncfs():
+    if not sys.platform.startswith('linux'):
+        return None
+    return getattr(ctypes.CDLL(None, use_errno=True), 'syncfs', None)
+
+def syncfs(path: Path) -> None:
+    """Flush everything written to the filesystem holding a path.
+
+    Falls back to ``sync()`` of all filesystems where ``syncfs`` is not
+    available.
+
+    Args:
+        path: Any path on the filesystem
+
+    Raises:
+        OSError: If syncfs fails
+    """
+    libc_syncfs = _libc_syncfs()
+    if libc_syncfs is None:
+        os.sync()
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if libc_syncfs(fd) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), str(path))
+    finally:
+        os.close(fd)
+
+def wait_all(futures: List[Future]) -> None:
+    """Wait for futures, raising the first error once all are done.
+
+    Args:
+        futures: Futures to wait for
+
+    Raises:
+        Exception: The first exception raised by any of the futures
+    """
+    error: Optional[BaseException] = None
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+
+class Durability:
+    """Durability mode and the thread pool issuing the fsyncs it needs.
+
+    One instance is shared by all extractions, so the number of fsyncs in
+    flight is bounded by the pool rather than by the number of workers.
+    """
+
+    # Files per directory collected before their fsyncs are issued
+    BATCH_SIZE = 256
+
+    def __init__(self, mode: str = 'none', workers: int = 8):
+        """Initialize the durability settings.
+
+        Args:
+            mode: One of DURABILITY_MODES
+            workers: Threads issuing fsyncs in parallel
+
+        Raises:
+            ValueError: If the mode is unknown
+        """
+        if mode not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Thread pool for fsync calls, created on first use."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix='archiver-fsync'
+            )
+        return self._pool
+
+    def submit_fsync(self, path: Path, directory: bool = False) -> Future:
+        """Fsync a file or directory on the pool.
+
+        Args:
+            path: File or directory
+            directory: Whether the path is a directory
+
+        Returns:
+            Future completing once the path is flushed
+        """
+        return self.pool.submit(fsync_path, path, directory)
+
+    def sync_dirs(self, directories: Iterable[Path]) -> None:
+        """Fsync directories in parallel so renames into them are durable.
+
+        Args:
+            directories: Directories whose entries changed
+        """
+        wait_all([self.submit_fsync(d, directory=True) for d in set(directories)])
+
+    def after_extraction(self, target_dir: Path, changed_dirs: Iterable[Path] = ()) -> None:
+        """Make an extraction durable once its output is in place.
+
+        In ``archive`` mode this is the single ``syncfs`` of the target
+        filesystem. In ``directory`` and ``file`` mode the file data was
+        already flushed by the writer, and only the directories that
+        received renamed entries are left to flush.
+
+        Args:
+            target_dir: Directory the archive was extracted into
+            changed_dirs: Directories whose entries changed after writing
+        """
+        if self.mode == 'archive':
+            syncfs(target_dir)
+        elif self.mode in ('directory', 'file'):
+            self.sync_dirs(changed_dirs)
+
+    def close(self) -> None:
+        """Shut the thread pool down."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,178 @@
+import errno
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Errors caused by the machine rather than the archive; retrying may succeed
+TRANSIENT_ERRNOS = {
+    errno.ENOSPC, errno.EDQUOT, errno.EACCES, errno.EPERM, errno.EROFS,
+    errno.EMFILE, errno.ENFILE, errno.ENOMEM, errno.EINTR, errno.EAGAIN,
+}
+
+def default_failure_cache_path() -> Path:
+    """Return the default location of the failure cache.
+
+    Returns:
+        Path inside ``$XDG_CACHE_HOME``, or ``~/.cache``
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_dir) / 'archiver' / 'failures.json'
+
+def is_transient(error: Optional[BaseException]) -> bool:
+    """Check whether an extraction error says nothing about the archive.
+
+    Args:
+        error: Exception that made the extraction fail
+
+    Returns:
+        True for out-of-space, permission and resource errors
+    """
+    return isinstance(error, OSError) and error.errno in TRANSIENT_ERRNOS
+
+@dataclass
+class FailureRecord:
+    """A failed archive, as it was when it failed."""
+    path: str
+    reason: str
+    failures: int
+    last_failure: float
+    next_retry: float
+
+class FailureCache:
+    """Archives that failed to extract, with when to try them again.
+
+    Records are keyed by device, inode, size and modification time, so an
+    archive that is replaced, re-downloaded or appended to is tried again
+    right away, while an unchanged one is skipped for a backoff period
+    that doubles with every failure. Looking an archive up costs nothing
+    beyond the ``stat`` the directory scan already does.
+    """
+
+    def __init__(self, backoff: float = 3600.0, max_backoff: float = 7 * 24 * 3600.0):
+        """Initialize the failure cache.
+
+        Args:
+            backoff: Seconds before retrying an archive that failed once
+            max_backoff: Longest wait between retries
+        """
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.changed = False
+        self._records: Dict[str, FailureRecord] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(st: os.stat_result) -> str:
+        return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+    def lookup(self, st: os.stat_result) -> Optional[FailureRecord]:
+        """Return the failure record of an archive still backing off.
+
+        Args:
+            st: Current ``stat`` of the archive
+
+        Returns:
+            The record if the unchanged archive is not due for a retry yet
+        """
+        with self._lock:
+            record = self._records.get(self._key(st))
+        if record is not None and time.time() < record.next_retry:
+            return record
+        return None
+
+    def record_failure(self, archive_path: Path, reason: str) -> FailureRecord:
+        """Record a failed extraction.
+
+        Args:
+            archive_path: Path to the archive file
+            reason: Why the extraction failed
+
+        Returns:
+            The updated record
+        """
+        key = self._key(archive_path.stat())
+        now = time.time()
+        with self._lock:
+            previous = self._records.get(key)
+            failures = previous.failures + 1 if previous is not None else 1
+            delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            record = FailureRecord(
+                path=str(archive_path.absolute()),
+                reason=reason,
+                failures=failures,
+                last_failure=now,
+                next_retry=now + delay
+            )
+            self._records[key] = record
+            self.changed = True
+        logger.info(
+            f"Not retrying {archive_path} for {delay:.0f}s "
+            f"unless it changes (failure {failures}: {reason})"
+        )
+        return record
+
+    def forget(self, archive_path: Path) -> None:
+        """Drop the records of an archive that was extracted successfully.
+
+        Args:
+            archive_path: Path to the archive file
+        """
+        path = str(archive_path.absolute())
+        with self._lock:
+            for key in [k for k, r in self._records.items() if r.path == path]:
+                del self._records[key]
+                self.changed = True
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def load(self, cache_file: Path) -> None:
+        """Load records saved by a previous run.
+
+        Args:
+            cache_file: Path to the JSON cache file
+        """
+        try:
+            with open(cache_file, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable failure cache {cache_file}: {e}")
+            return
+        with self._lock:
+            for key, entry in entries.items():
+                self._records[key] = FailureRecord(**entry)
+
+    def save(self, cache_file: Path) -> None:
+        """Save the records, dropping those of archives that are gone.
+
+        Args:
+            cache_file: Path to the JSON cache file
+        """
+        with self._lock:
+            records = dict(self._records)
+        entries = {}
+        for key, record in records.items():
+            try:
+                if self._key(os.stat(record.path)) != key:
+                    continue
+            except OSError:
+                continue
+            entries[key] = asdict(record)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_name(cache_file.name + '.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp, cache_file)
+            self.changed = False
+        except Exception as e:
+            logger.error(f"Error saving failure cache {cache_file}: {e}")
@@ -0,0 +1,108 @@
+from fnmatch import fnmatchcase
+from typing import Iterable, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..extractors.base import ArchiveMember
+    from .config import ArchiveConfig
+
+class MemberFilter:
+    """Selects archive members by glob pattern and size before extraction.
+
+    Patterns are matched case-insensitively. A pattern without a slash is
+    matched against the member's base name (``*.epub``), a pattern containing
+    a slash is matched against the full member path (``Extras/*.nfo``) and a
+    pattern ending in a slash matches any directory component (``Proof/``).
+    """
+
+    def __init__(
+        self,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None
+    ):
+        """Initialize the member filter.
+
+        Args:
+            include: Patterns a file must match at least one of (all if empty)
+            exclude: Patterns that reject a member when any of them matches
+            min_size: Minimum uncompressed file size in bytes
+            max_size: Maximum uncompressed file size in bytes
+        """
+        self.include: List[str] = [p.lower() for p in include or []]
+        self.exclude: List[str] = [p.lower() for p in exclude or []]
+        self.min_size = min_size
+        self.max_size = max_size
+
+    @classmethod
+    def from_config(cls, config: 'ArchiveConfig') -> 'MemberFilter':
+        """Create a filter from the member filter settings of a configuration.
+
+        Args:
+            config: Configuration settings
+
+        Returns:
+            MemberFilter instance
+        """
+        return cls(
+            include=config.include_patterns,
+            exclude=config.exclude_patterns,
+            min_size=config.min_member_size,
+            max_size=config.max_member_size
+        )
+
+    @property
+    def active(self) -> bool:
+        """Whether the filter can reject anything at all."""
+        return bool(
+            self.include
+            or self.exclude
+            or self.min_size is not None
+            or self.max_size is not None
+        )
+
+    @staticmethod
+    def _pattern_matches(pattern: str, name: str) -> bool:
+        """Check a single lower-cased pattern against a normalized member name.
+
+        Args:
+            pattern: Glob pattern
+            name: Lower-cased member path using forward slashes
+
+        Returns:
+            True if the pattern matches
+        """
+        if pattern.endswith('/'):
+            directory = pattern.rstrip('/')
+            return any(fnmatchcase(part, directory) for part in name.split('/')[:-1])
+        if '/' in pattern:
+            return fnmatchcase(name, pattern.strip('/'))
+        return fnmatchcase(name.rsplit('/', 1)[-1], pattern)
+
+    def matches(self, member: 'ArchiveMember') -> bool:
+        """Check whether a member should be extracted.
+
+        Directory entries are never selected by an active filter; the
+        directories needed by the selected files are created on demand.
+
+        Args:
+            member: Archive member to check
+
+        Returns:
+            True if the member passes the filter
+        """
+        if not self.active:
+            return True
+        if member.is_dir:
+            return False
+
+        name = member.name.replace('\\', '/').strip('/').lower()
+        if any(self._pattern_matches(p, name) for p in self.exclude):
+            return False
+        if self.include and not any(self._pattern_matches(p, name) for p in self.include):
+            return False
+        if self.min_size is not None and member.size < self.min_size:
+            return False
+        if self.max_size is not None and member.size > self.max_size:
+            return False
+        return True
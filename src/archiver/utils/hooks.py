@@ -0,0 +1,325 @@
+import importlib
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import ArchiveConfig
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class HookEvent:
+    """An archive that was extracted, as reported to post-extraction hooks."""
+    archive: Path
+    directory: Path
+    outputs: List[Path] = field(default_factory=list)
+    bytes: int = 0
+    duration: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the event as a JSON serializable dictionary."""
+        return {
+            'archive': str(self.archive),
+            'directory': str(self.directory),
+            'outputs': [str(p) for p in self.outputs],
+            'bytes': self.bytes,
+            'duration': round(self.duration, 3),
+        }
+
+@dataclass
+class HookBatch:
+    """Extraction events coalesced into one hook invocation."""
+    events: List[HookEvent] = field(default_factory=list)
+
+    @property
+    def directory(self) -> Path:
+        """Deepest directory holding the archives of every event."""
+        return Path(os.path.commonpath([e.directory for e in self.events]))
+
+    @property
+    def archives(self) -> List[Path]:
+        """Archives extracted, in the order they finished."""
+        return [e.archive for e in self.events]
+
+    def to_json(self) -> str:
+        """Return the batch as a single line of JSON."""
+        return json.dumps({
+            'directory': str(self.directory),
+            'archives': [e.to_dict() for e in self.events],
+        })
+
+class PostExtractionHook(ABC):
+    """Action run on batches of extracted archives."""
+
+    name: str = ''
+
+    @abstractmethod
+    def run(self, batch: HookBatch) -> None:
+        """Run the hook for a batch.
+
+        Args:
+            batch: Extraction events to act on
+
+        Raises:
+            Exception: If the hook failed
+        """
+        pass
+
+class CommandHook(PostExtractionHook):
+    """Run a shell command per batch.
+
+    The batch is passed as one line of JSON on standard input. The
+    directory, the archive paths (newline separated) and their number are
+    also set in ``ARCHIVER_DIRECTORY``, ``ARCHIVER_ARCHIVES`` and
+    ``ARCHIVER_COUNT``. A non-zero exit status fails the hook.
+    """
+
+    def __init__(self, command: str, timeout: float = 0.0):
+        """Initialize the command hook.
+
+        Args:
+            command: Shell command line
+            timeout: Seconds the command may run, 0 for no limit
+        """
+        self.command = command
+        self.timeout = timeout
+        self.name = command
+
+    def run(self, batch: HookBatch) -> None:
+        env = dict(
+            os.environ,
+            ARCHIVER_DIRECTORY=str(batch.directory),
+            ARCHIVER_ARCHIVES='\n'.join(str(p) for p in batch.archives),
+            ARCHIVER_COUNT=str(len(batch.events))
+        )
+        result = subprocess.run(
+            self.command,
+            shell=True,
+            input=batch.to_json() + '\n',
+            capture_output=True,
+            text=True,
+            env=env,
+            timeout=self.timeout or None
+        )
+        if result.stdout:
+            logger.debug(f"Hook {self.command}: {result.stdout.strip()}")
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"exited with status {result.returncode}: {result.stderr.strip()[-500:]}"
+            )
+
+class CallableHook(PostExtractionHook):
+    """Call a Python function with each batch."""
+
+    def __init__(self, function: Callable[[HookBatch], Any], name: Optional[str] = None):
+        """Initialize the callable hook.
+
+        Args:
+            function: Function taking a HookBatch
+            name: Name used in log messages, defaulting to the function's
+        """
+        self.function = function
+        self.name = name or getattr(function, '__qualname__', repr(function))
+
+    def run(self, batch: HookBatch) -> None:
+        self.function(batch)
+
+def import_callable(spec: str) -> Callable[[HookBatch], Any]:
+    """Import a function given as ``package.module:function``.
+
+    Args:
+        spec: Module path and attribute, separated by a colon
+
+    Returns:
+        The function
+
+    Raises:
+        ValueError: If the spec is malformed or does not name a callable
+        ImportError: If the module cannot be imported
+    """
+    module_name, sep, attribute = spec.partition(':')
+    if not sep or not module_name or not attribute:
+        raise ValueError(f"Expected module:function, got {spec!r}")
+    target: Any = importlib.import_module(module_name)
+    for part in attribute.split('.'):
+        target = getattr(target, part)
+    if not callable(target):
+        raise ValueError(f"{spec} is not callable")
+    return target
+
+def hooks_from_config(config: 'ArchiveConfig') -> List[PostExtractionHook]:
+    """Create the hooks configured in a configuration, commands first.
+
+    Args:
+        config: Configuration settings
+
+    Returns:
+        List of hooks, in the order they run
+    """
+    hooks: List[PostExtractionHook] = [
+        CommandHook(command, timeout=config.hook_timeout) for command in config.hook_commands
+    ]
+    hooks.extend(CallableHook(import_callable(spec), name=spec) for spec in config.hook_callables)
+    return hooks
+
+class HookPipeline:
+    """Runs post-extraction hooks on a bounded pool while extraction goes on.
+
+    Events are coalesced per directory, or all together, into batches. A
+    batch is handed to the pool once ``window`` seconds passed since its
+    first event or once it holds ``max_batch`` events. While all workers
+    are busy, batches keep growing instead of queueing up, so a slow
+    downstream service gets fewer, larger notifications. The hooks of a
+    batch run in order, and a failing hook skips the rest for that batch.
+    """
+
+    def __init__(
+        self,
+        hooks: List[PostExtractionHook],
+        workers: int = 2,
+        window: float = 5.0,
+        max_batch: int = 100,
+        group_by: str = 'directory'
+    ):
+        """Initialize the hook pipeline.
+
+        Args:
+            hooks: Hooks to run on every batch, in order
+            workers: Batches processed at once
+            window: Seconds to collect events before a batch is sent
+            max_batch: Events that send a batch before its window ends
+            group_by: ``directory`` for a batch per directory, ``none``
+                for one batch of all events
+
+        Raises:
+            ValueError: If the grouping is unknown
+        """
+        if group_by not in ('directory', 'none'):
+            raise ValueError(f"Unknown hook grouping: {group_by}")
+        self.hooks = hooks
+        self.workers = workers
+        self.window = window
+        self.max_batch = max_batch
+        self.group_by = group_by
+        self.batches_run = 0
+        self.failures = 0
+        self._pending: Dict[Optional[Path], HookBatch] = {}
+        self._deadlines: Dict[Optional[Path], float] = {}
+        self._in_flight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archiver-hook')
+        self._flusher: Optional[threading.Thread] = None
+
+    def submit(self, event: HookEvent) -> None:
+        """Add an extraction event to its batch.
+
+        Args:
+            event: Extraction event
+        """
+        key = event.directory if self.group_by == 'directory' else None
+        with self._cond:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = HookBatch()
+                self._deadlines[key] = time.monotonic() + self.window
+            batch.events.append(event)
+            if len(batch.events) >= self.max_batch:
+                self._dispatch_ready()
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name='archiver-hook-flusher', daemon=True
+                )
+                self._flusher.start()
+            self._cond.notify_all()
+
+    def _dispatch_ready(self, force: bool = False) -> None:
+        """Hand batches that are due to free workers; the lock must be held.
+
+        Args:
+            force: Whether to send batches before their window ends
+        """
+        now = time.monotonic()
+        due = sorted(
+            (key for key, batch in self._pending.items()
+             if force or self._deadlines[key] <= now or len(batch.events) >= self.max_batch),
+            key=lambda key: self._deadlines[key]
+        )
+        for key in due:
+            if self._in_flight >= self.workers:
+                break
+            batch = self._pending.pop(key)
+            del self._deadlines[key]
+            self._in_flight += 1
+            self._pool.submit(self._run, batch)
+
+    def _flush_loop(self) -> None:
+        """Send batches as their windows end, until the pipeline is closed."""
+        with self._cond:
+            while not self._closed:
+                self._dispatch_ready()
+                timeout = None
+                if self._pending and self._in_flight < self.workers:
+                    timeout = max(0.0, min(self._deadlines.values()) - time.monotonic())
+                self._cond.wait(timeout)
+
+    def _run(self, batch: HookBatch) -> None:
+        """Run every hook on a batch.
+
+        Args:
+            batch: Batch to process
+        """
+        failed = False
+        try:
+            for hook in self.hooks:
+                try:
+                    hook.run(batch)
+                except Exception as e:
+                    logger.error(
+                        f"Post-extraction hook {hook.name} failed for "
+                        f"{len(batch.events)} archives in {batch.directory}: {e}"
+                    )
+                    failed = True
+                    break
+            logger.debug(f"Ran post-extraction hooks for {len(batch.events)} archives")
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self.batches_run += 1
+                self.failures += failed
+                self._cond.notify_all()
+
+    def flush(self) -> None:
+        """Send every pending batch now and wait until all hooks finished."""
+        with self._cond:
+            while self._pending or self._in_flight:
+                self._dispatch_ready(force=True)
+                self._cond.wait()
+
+    def close(self) -> None:
+        """Flush pending batches and stop the workers."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        self._pool.shutdown()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return how many hook batches ran and failed.
+
+        Returns:
+            Dictionary with the number of batches and of failed batches
+        """
+        return {'hook_batches': self.batches_run, 'hook_failures': self.failures}
@@ -0,0 +1,317 @@
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass(eq=False)
+class Lease:
+    """Exclusive claim of one host on one archive."""
+    key: str
+    path: Path
+    token: str
+    archive_path: Path
+    lost: bool = False
+
+class LeaseManager:
+    """Coordinates several hosts extracting from the same shared directory.
+
+    Every archive is claimed with a lease file created with ``O_EXCL`` in a
+    coordination directory on the shared storage; whoever creates the file
+    extracts the archive. A background thread touches the lease files held
+    by this process every ``heartbeat_interval`` seconds. A lease file that
+    hasn't been touched for ``ttl`` seconds belongs to a dead node and is
+    stolen by renaming it away, so an archive whose extractor crashed is
+    picked up again. Successfully extracted archives get a done marker
+    recording the size and modification time of the archive, so other hosts
+    skip them until the archive is replaced. Failed archives get none, so
+    any host may retry them; the failure cache decides when.
+
+    Expiry compares lease modification times with the local clock, so the
+    hosts' clocks must agree to well within ``ttl``.
+    """
+
+    def __init__(
+        self,
+        coordination_dir: Path,
+        base_dir: Path,
+        ttl: float = 60.0,
+        heartbeat_interval: Optional[float] = None
+    ):
+        """Initialize the lease manager.
+
+        Args:
+            coordination_dir: Shared directory holding lease files and done markers
+            base_dir: Directory archive keys are relative to, so hosts mounting
+                the share at different paths agree on them
+            ttl: Seconds without heartbeat after which a lease expires
+            heartbeat_interval: Seconds between heartbeats, defaulting to a
+                third of ``ttl``
+        """
+        self.coordination_dir = Path(coordination_dir)
+        self.base_dir = Path(base_dir).absolute()
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval or ttl / 3
+        self.owner = f"{socket.gethostname()}-{os.getpid()}"
+        self._held: Dict[str, Lease] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.coordination_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, archive_path: Path) -> str:
+        """Return the key identifying an archive across hosts.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Hex digest of the archive path relative to the base directory
+        """
+        path = Path(archive_path).absolute()
+        try:
+            name = path.relative_to(self.base_dir).as_posix()
+        except ValueError:
+            name = path.as_posix()
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+    def _done_path(self, key: str) -> Path:
+        return self.coordination_dir / f"{key}.done"
+
+    def _lease_path(self, key: str) -> Path:
+        return self.coordination_dir / f"{key}.lease"
+
+    def is_done(self, archive_path: Path) -> bool:
+        """Check whether some host already processed this version of an archive.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            True if a done marker of a successful extraction matches the
+            archive's size and mtime
+        """
+        try:
+            with open(self._done_path(self._key(archive_path)), 'r') as f:
+                marker = json.load(f)
+            st = os.stat(archive_path)
+        except (OSError, ValueError):
+            return False
+        return (
+            marker.get('success') is True
+            and marker.get('size') == st.st_size
+            and marker.get('mtime_ns') == st.st_mtime_ns
+        )
+
+    def _is_expired(self, lease_path: Path) -> bool:
+        """Check whether a lease file has missed its heartbeats.
+
+        Args:
+            lease_path: Lease file
+
+        Returns:
+            True if the lease is older than the TTL
+        """
+        try:
+            return time.time() - os.stat(lease_path).st_mtime > self.ttl
+        except FileNotFoundError:
+            return True
+
+    def _create(self, key: str, archive_path: Path) -> Optional[Lease]:
+        """Create a lease file, failing if it already exists.
+
+        Args:
+            key: Archive key
+            archive_path: Path to the archive file
+
+        Returns:
+            Lease, or None if another process holds it
+        """
+        path = self._lease_path(key)
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, 'w') as f:
+            json.dump({
+                'owner': self.owner,
+                'token': token,
+                'archive': str(archive_path),
+                'acquired': time.time(),
+            }, f)
+        return Lease(key=key, path=path, token=token, archive_path=archive_path)
+
+    def _steal(self, key: str) -> bool:
+        """Remove an expired lease file of a dead node.
+
+        The file is renamed to a name unique to this process first, so of
+        several hosts noticing the expiry only one gets to remove it. If a
+        live lease was created in the meantime and got renamed instead, it
+        is put back.
+
+        Args:
+            key: Archive key
+
+        Returns:
+            True if the expired lease was removed
+        """
+        path = self._lease_path(key)
+        stolen = path.with_name(f"{path.name}.{self.owner}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(path, stolen)
+        except FileNotFoundError:
+            return False
+        if not self._is_expired(stolen):
+            try:
+                os.link(stolen, path)
+            except OSError:
+                pass
+            os.unlink(stolen)
+            return False
+        logger.warning(f"Taking over expired lease {path.name}")
+        os.unlink(stolen)
+        return True
+
+    def acquire(self, archive_path: Path) -> Optional[Lease]:
+        """Try to claim an archive for this process.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Lease, or None if the archive is done or held by another host
+        """
+        if self.is_done(archive_path):
+            logger.debug(f"Skipping {archive_path}: already processed by another host")
+            return None
+
+        key = self._key(archive_path)
+        lease = self._create(key, archive_path)
+        if lease is None and self._is_expired(self._lease_path(key)) and self._steal(key):
+            lease = self._create(key, archive_path)
+        if lease is None:
+            logger.debug(f"Skipping {archive_path}: leased by another host")
+            return None
+
+        # A host may have finished the archive between our check and our claim
+        if self.is_done(archive_path):
+            self._remove(lease)
+            return None
+
+        with self._lock:
+            self._held[key] = lease
+            self._start_heartbeat()
+        return lease
+
+    def _owns(self, lease: Lease) -> bool:
+        """Check whether the lease file still carries this lease's token.
+
+        Args:
+            lease: Held lease
+
+        Returns:
+            True if the lease file is ours
+        """
+        try:
+            with open(lease.path, 'r') as f:
+                return json.load(f).get('token') == lease.token
+        except (OSError, ValueError):
+            return False
+
+    def renew(self, lease: Lease) -> bool:
+        """Refresh a lease's heartbeat.
+
+        Args:
+            lease: Held lease
+
+        Returns:
+            False if the lease was lost to another host
+        """
+        if lease.lost:
+            return False
+        if self._owns(lease):
+            try:
+                os.utime(lease.path)
+                return True
+            except OSError:
+                pass
+        logger.error(f"Lost lease on {lease.archive_path}")
+        lease.lost = True
+        return False
+
+    def _remove(self, lease: Lease) -> None:
+        """Delete a lease file if it is still ours.
+
+        Args:
+            lease: Held lease
+        """
+        if self._owns(lease):
+            try:
+                os.unlink(lease.path)
+            except FileNotFoundError:
+                pass
+
+    def release(self, lease: Lease, success: Optional[bool]) -> None:
+        """Release a lease, recording the archive as done if it was extracted.
+
+        Args:
+            lease: Held lease
+            success: Whether the archive was processed successfully, or
+                None if it was given up; only a success marks it done
+        """
+        with self._lock:
+            self._held.pop(lease.key, None)
+        if success and not lease.lost:
+            try:
+                st = os.stat(lease.archive_path)
+                marker = {
+                    'size': st.st_size,
+                    'mtime_ns': st.st_mtime_ns,
+                    'success': success,
+                    'owner': self.owner,
+                    'finished': time.time(),
+                }
+            except FileNotFoundError:
+                # Deleted after extraction; nobody will see it again
+                marker = None
+            if marker is not None:
+                done_path = self._done_path(lease.key)
+                tmp_path = done_path.with_name(f"{done_path.name}.{lease.token}")
+                with open(tmp_path, 'w') as f:
+                    json.dump(marker, f)
+                os.replace(tmp_path, done_path)
+        self._remove(lease)
+
+    def _start_heartbeat(self) -> None:
+        """Start the heartbeat thread if it isn't running."""
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._stopping.clear()
+            self._heartbeat = threading.Thread(
+                target=self._heartbeat_loop,
+                name='archiver-lease-heartbeat',
+                daemon=True
+            )
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self) -> None:
+        """Renew all held leases until stopped."""
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._lock:
+                leases = list(self._held.values())
+            for lease in leases:
+                self.renew(lease)
+
+    def close(self) -> None:
+        """Stop the heartbeat thread."""
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
@@ -0,0 +1,171 @@
+from typing import Iterable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..extractors.base import ArchiveMember
+    from .config import ArchiveConfig
+
+# Output below this size is never rejected for its compression ratio, so
+# small archives of very compressible data still extract
+RATIO_FLOOR = 16 * 1024 * 1024
+
+class ExtractionLimitExceeded(Exception):
+    """Raised when an archive expands beyond the configured limits."""
+
+class OutputBudget:
+    """Running totals of one archive's output, checked against its limits.
+
+    Every byte and member goes through ``add_bytes`` and ``add_member``,
+    so these stay a counter increment and a comparison. The ratio limit
+    for the whole archive is turned into a byte limit up front from the
+    archive size.
+    """
+
+    def __init__(self, limits: 'ExtractionLimits', archive_size: Optional[int] = None):
+        """Initialize the budget.
+
+        Args:
+            limits: Limits to enforce
+            archive_size: Size of the archive file, for the ratio limit
+        """
+        self.limits = limits
+        self.bytes = 0
+        self.members = 0
+        self.byte_limit: Optional[int] = None
+        self._byte_reason = ''
+        ratio_limit = limits.ratio_limit(archive_size)
+        if ratio_limit is not None:
+            self.byte_limit = ratio_limit
+            self._byte_reason = (
+                f"expands more than {limits.max_ratio:g}x its size of {archive_size} bytes"
+            )
+        if limits.max_output and (self.byte_limit is None or limits.max_output < self.byte_limit):
+            self.byte_limit = limits.max_output
+            self._byte_reason = f"expands to more than {limits.max_output} bytes"
+
+    def add_bytes(self, size: int) -> None:
+        """Account for output data.
+
+        Args:
+            size: Bytes about to be written
+
+        Raises:
+            ExtractionLimitExceeded: If the archive's output grew too large
+        """
+        self.bytes += size
+        if self.byte_limit is not None and self.bytes > self.byte_limit:
+            raise ExtractionLimitExceeded(f"Archive {self._byte_reason}")
+
+    def add_member(self) -> None:
+        """Account for a file, directory or link.
+
+        Raises:
+            ExtractionLimitExceeded: If the archive has too many members
+        """
+        self.members += 1
+        if self.limits.max_members and self.members > self.limits.max_members:
+            raise ExtractionLimitExceeded(
+                f"Archive has more than {self.limits.max_members} members"
+            )
+
+    def check_declared(self, members: Iterable['ArchiveMember']) -> None:
+        """Check the sizes an archive declares before extracting anything.
+
+        Headers can lie, so this complements the checks made while writing
+        rather than replacing them.
+
+        Args:
+            members: Members listed from the archive headers
+
+        Raises:
+            ExtractionLimitExceeded: If the declared output exceeds a limit
+        """
+        for member in members:
+            self.add_member()
+            if member.is_dir:
+                continue
+            self.add_bytes(member.size)
+            self.limits.check_member(member.name, member.size, member.compressed_size)
+
+class ExtractionLimits:
+    """Limits protecting against decompression bombs.
+
+    An archive is aborted as soon as its output exceeds a multiple of the
+    archive size, a total size or a number of members. A member whose
+    compressed size is known is also held to the ratio on its own, so a
+    bomb at the start of an otherwise normal archive is caught early.
+    """
+
+    def __init__(self, max_ratio: float = 0.0, max_output: int = 0, max_members: int = 0):
+        """Initialize the limits.
+
+        Args:
+            max_ratio: Highest ratio of output to compressed size, 0 for no limit
+            max_output: Most bytes written per archive, 0 for no limit
+            max_members: Most members per archive, 0 for no limit
+        """
+        self.max_ratio = max_ratio
+        self.max_output = max_output
+        self.max_members = max_members
+
+    @classmethod
+    def from_config(cls, config: 'ArchiveConfig') -> 'ExtractionLimits':
+        """Create limits from the decompression bomb settings of a configuration.
+
+        Args:
+            config: Configuration settings
+
+        Returns:
+            ExtractionLimits instance
+        """
+        return cls(
+            max_ratio=config.max_compression_ratio,
+            max_output=config.max_output_size,
+            max_members=config.max_archive_members
+        )
+
+    @property
+    def active(self) -> bool:
+        """Whether any limit is set."""
+        return bool(self.max_ratio or self.max_output or self.max_members)
+
+    def ratio_limit(self, compressed_size: Optional[int]) -> Optional[int]:
+        """Return the output size the ratio limit allows for compressed data.
+
+        Args:
+            compressed_size: Size of the compressed data, if known
+
+        Returns:
+            Most bytes allowed, or None if the ratio is not limited
+        """
+        if not self.max_ratio or compressed_size is None:
+            return None
+        return max(int(compressed_size * self.max_ratio), RATIO_FLOOR)
+
+    def check_member(self, name: str, size: int, compressed_size: Optional[int]) -> None:
+        """Check a member's output against its compressed size.
+
+        Args:
+            name: Member name
+            size: Bytes of the member written so far
+            compressed_size: Compressed size of the member, if known
+
+        Raises:
+            ExtractionLimitExceeded: If the member expands too much
+        """
+        limit = self.ratio_limit(compressed_size)
+        if limit is not None and size > limit:
+            raise ExtractionLimitExceeded(
+                f"Member {name} expands more than {self.max_ratio:g}x "
+                f"its compressed size of {compressed_size} bytes"
+            )
+
+    def budget(self, archive_size: Optional[int] = None) -> OutputBudget:
+        """Start accounting for the output of one archive.
+
+        Args:
+            archive_size: Size of the archive file
+
+        Returns:
+            Budget to charge the output against
+        """
+        return OutputBudget(self, archive_size)
@@ -0,0 +1,117 @@
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from .random_access import archive_key
+
+if TYPE_CHECKING:
+    from .config import ArchiveConfig
+
+# Volume numbers and archive extensions stripped from a file name to get the
+# name of the release it belongs to: name.part01.rar, name.r00, name.7z.001,
+# name.z01, name.zip
+_RELEASE_SUFFIX = re.compile(
+    r'(\.part\d+)?\.(rar|zip|7z)(\.\d{3})?$|\.(r|s|z)\d{2}$|\.\d{3}$',
+    re.IGNORECASE
+)
+
+class PasswordNotFound(Exception):
+    """Raised when no candidate password opens an encrypted archive."""
+
+def release_key(archive_path: Path) -> Tuple[str, str]:
+    """Return the directory and release name an archive belongs to.
+
+    All volumes of a release, and archives that only differ in their
+    extension, map to the same key.
+
+    Args:
+        archive_path: Path to the archive file
+
+    Returns:
+        Tuple of the absolute directory and the lower-cased release name
+    """
+    name = _RELEASE_SUFFIX.sub('', archive_path.name)
+    return str(archive_path.parent.absolute()), name.lower()
+
+def password_candidates(config: 'ArchiveConfig') -> List[str]:
+    """Collect the candidate passwords of a configuration, in order.
+
+    Args:
+        config: Configuration settings
+
+    Returns:
+        The single password, the password list and the lines of the password
+        file, without duplicates
+
+    Raises:
+        OSError: If the password file cannot be read
+    """
+    candidates = [config.password] if config.password else []
+    candidates.extend(config.passwords)
+    if config.password_file is not None:
+        with open(config.password_file, 'r', encoding='utf-8') as f:
+            candidates.extend(line.rstrip('\r\n') for line in f)
+    return list(dict.fromkeys(p for p in candidates if p))
+
+class PasswordCache:
+    """Passwords that opened archives, remembered per release and directory.
+
+    Once one volume or archive of a release is opened, the others try the
+    same password first, so the candidate search runs once per release. A
+    password that worked elsewhere in the same directory is tried next.
+    The outcome for each archive is kept as well, so listing, verifying
+    and extracting the same archive check its password only once.
+    """
+
+    def __init__(self):
+        """Initialize an empty password cache."""
+        self._by_archive: Dict[Tuple[str, int, int], Optional[str]] = {}
+        self._by_release: Dict[Tuple[str, str], str] = {}
+        self._by_directory: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, archive_path: Path) -> Tuple[bool, Optional[str]]:
+        """Return the password found for this version of an archive.
+
+        Args:
+            archive_path: Path to the archive file
+
+        Returns:
+            Tuple of whether the archive was seen before and its password,
+            which is None for an archive that is not encrypted
+        """
+        key = archive_key(archive_path)
+        with self._lock:
+            return key in self._by_archive, self._by_archive.get(key)
+
+    def candidates(self, archive_path: Path, passwords: List[str]) -> List[str]:
+        """Order candidate passwords by how likely they open an archive.
+
+        Args:
+            archive_path: Path to the archive file
+            passwords: Configured candidate passwords
+
+        Returns:
+            The candidates, with the release and directory passwords first
+        """
+        key = release_key(archive_path)
+        with self._lock:
+            preferred = [self._by_release.get(key), self._by_directory.get(key[0])]
+        preferred = [p for p in preferred if p is not None]
+        return list(dict.fromkeys(preferred + passwords))
+
+    def remember(self, archive_path: Path, password: Optional[str]) -> None:
+        """Remember the password that opened an archive.
+
+        Args:
+            archive_path: Path to the archive file
+            password: Password that worked, or None if none is needed
+        """
+        key = release_key(archive_path)
+        version = archive_key(archive_path)
+        with self._lock:
+            self._by_archive[version] = password
+            if password is not None:
+                self._by_release[key] = password
+                self._by_directory[key[0]] = password
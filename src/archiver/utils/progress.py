@@ -1,8 +1,11 @@
 from pathlib import Path
-from typing import Iterator, List
-from tqdm import tqdm
+from typing import Iterable, Iterator, List, Optional, TypeVar
 import os
 
+from .walker import parallel_walk
+
+T = TypeVar('T')
+
 class ProgressTracker:
     """Handles progress tracking for archive operations."""
 
@@ -21,39 +24,59 @@ class ProgressTracker:
     @staticmethod
     def walk_with_progress(
         base_dir: Path,
-        desc: str = "Scanning directories"
+        desc: str = "Scanning directories",
+        workers: int = 1
     ) -> Iterator[tuple[str, List[str], List[str]]]:
         """Generator that yields os.walk results with a progress bar.
 
+        With more than one worker the tree is walked by ``parallel_walk``
+        and not counted up front, which would cost a sequential pass over
+        it; the total grows as directories are found instead.
+
         Args:
             base_dir: Base directory to walk
             desc: Description for the progress bar
+            workers: Directories listed at once
 
         Yields:
             Same as os.walk: (dirpath, dirnames, filenames)
         """
-        total_dirs = ProgressTracker.count_directories(base_dir)
-        
-        with tqdm(total=total_dirs, desc=desc) as pbar:
-            for root, dirs, files in os.walk(base_dir):
-                pbar.update(1)
+        from tqdm import tqdm
+
+        if workers <= 1:
+            total_dirs = ProgressTracker.count_directories(base_dir)
+            with tqdm(total=total_dirs, desc=desc) as pbar:
+                for root, dirs, files in os.walk(base_dir):
+                    pbar.update(1)
+                    yield root, dirs, files
+            return
+
+        with tqdm(total=1, desc=desc) as pbar:
+            for root, dirs, files in parallel_walk(base_dir, workers):
                 yield root, dirs, files
+                # Only count the subdirectories the caller didn't prune
+                pbar.total += len(dirs)
+                pbar.update(1)
 
     @staticmethod
     def process_archives_with_progress(
-        archives: List[Path],
-        desc: str = "Extracting archives"
-    ) -> Iterator[Path]:
+        archives: Iterable[T],
+        desc: str = "Extracting archives",
+        total: Optional[int] = None
+    ) -> Iterator[T]:
         """Process archives with a progress bar.
 
         Args:
-            archives: List of archive paths to process
+            archives: Archive paths, or jobs with a ``name``, to process
             desc: Description for the progress bar
+            total: Number of archives, for iterables without a length
 
         Yields:
-            Each archive path in turn
+            Each archive in turn
         """
-        with tqdm(archives, desc=desc) as pbar:
+        from tqdm import tqdm
+
+        with tqdm(archives, desc=desc, total=total) as pbar:
             for archive in pbar:
                 pbar.set_postfix(file=archive.name)
                 yield archive
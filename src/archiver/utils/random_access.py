@@ -0,0 +1,331 @@
+import bisect
+import io
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Hashable, List, Optional, Tuple
+
+READ_CHUNK_SIZE = 64 * 1024
+
+def archive_key(archive_path: Path) -> Tuple[str, int, int]:
+    """Return a key identifying the current version of an archive.
+
+    Args:
+        archive_path: Path to the archive file
+
+    Returns:
+        Tuple of absolute path, size and modification time
+    """
+    st = os.stat(archive_path)
+    return (str(Path(archive_path).absolute()), st.st_size, st.st_mtime_ns)
+
+class LRUCache:
+    """Thread-safe least recently used cache bounded by entry count."""
+
+    def __init__(self, max_entries: int):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Number of entries kept
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """Return a cached value, or None.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value or None
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> List[Any]:
+        """Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to store
+
+        Returns:
+            Values evicted to make room
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+            return evicted
+
+class MemberCache:
+    """Least recently used cache of decompressed member data, bounded in bytes.
+
+    Entries are keyed by ``archive_key`` plus the member name, so a
+    replaced archive never serves stale data.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_item: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Total size of the cached data
+            max_item: Largest member cached, defaulting to a quarter of ``max_bytes``
+        """
+        self.max_bytes = max_bytes
+        self.max_item = max_item if max_item is not None else max_bytes // 4
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        """Return cached member data, or None.
+
+        Args:
+            key: ``archive_key`` of the archive plus the member name
+
+        Returns:
+            Member data or None
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def __contains__(self, key: Tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def fits(self, size: Optional[int]) -> bool:
+        """Check whether a member of the given size would be cached.
+
+        Args:
+            size: Member size, or None if unknown
+
+        Returns:
+            True if the member is small enough
+        """
+        return size is not None and size <= self.max_item
+
+    def put(self, key: Tuple, data: bytes) -> None:
+        """Cache member data, evicting the least recently used entries.
+
+        Args:
+            key: ``archive_key`` of the archive plus the member name
+            data: Member data
+        """
+        if not self.fits(len(data)):
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+class FileSlice(io.RawIOBase):
+    """Read-only view of a byte range of a seekable file."""
+
+    def __init__(self, fileobj: BinaryIO, offset: int, size: int):
+        """Initialize the slice.
+
+        Args:
+            fileobj: Seekable file, closed together with the slice
+            offset: Start of the range
+            size: Length of the range
+        """
+        super().__init__()
+        self.fileobj = fileobj
+        self.offset = offset
+        self.length = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.length
+        self.position = min(max(offset, 0), self.length)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.length - self.position)
+        if count <= 0:
+            return 0
+        self.fileobj.seek(self.offset + self.position)
+        data = self.fileobj.read(count)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self.fileobj.close()
+        super().close()
+
+@dataclass
+class _Checkpoint:
+    """Decompressor state at a position of a gzip stream."""
+    out_offset: int
+    in_offset: int
+    state: Any
+
+@dataclass
+class GzipSeekIndex:
+    """Seek points into a gzip file, for resuming decompression midway.
+
+    Every ``span`` bytes of output a copy of the zlib decompressor is kept
+    together with the compressed and uncompressed offsets it belongs to.
+    Reading at an offset then decompresses at most ``span`` bytes that are
+    thrown away, instead of everything before the offset.
+    """
+    span: int = 16 * 1024 * 1024
+    checkpoints: List[_Checkpoint] = field(default_factory=list)
+
+    def find(self, offset: int) -> _Checkpoint:
+        """Return the last checkpoint at or before an uncompressed offset.
+
+        Args:
+            offset: Uncompressed offset
+
+        Returns:
+            Checkpoint to resume from
+        """
+        positions = [cp.out_offset for cp in self.checkpoints]
+        return self.checkpoints[max(bisect.bisect_right(positions, offset) - 1, 0)]
+
+class _GzipStream(io.RawIOBase):
+    """Sequential gzip decompression, optionally recording seek points."""
+
+    def __init__(self, fileobj: BinaryIO, index: Optional[GzipSeekIndex] = None):
+        super().__init__()
+        self.fileobj = fileobj
+        self.index = index
+        self._buffer = b''
+        self._eof = False
+        self._start(_Checkpoint(0, 0, zlib.decompressobj(zlib.MAX_WBITS | 16)))
+        if index is not None:
+            index.checkpoints.append(_Checkpoint(0, 0, self.decompressor.copy()))
+
+    def _start(self, checkpoint: _Checkpoint) -> None:
+        self.fileobj.seek(checkpoint.in_offset)
+        self.decompressor = checkpoint.state.copy()
+        self.in_offset = checkpoint.in_offset
+        self.out_offset = checkpoint.out_offset
+        self._buffer = b''
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def _fill(self) -> None:
+        """Decompress the next chunk of input into the buffer."""
+        chunk = self.fileobj.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return
+        self.in_offset += len(chunk)
+        data = self.decompressor.decompress(chunk)
+        # Concatenated gzip members continue in the unused data
+        while self.decompressor.eof and self.decompressor.unused_data:
+            rest = self.decompressor.unused_data
+            self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            data += self.decompressor.decompress(rest)
+        produced_before = self.out_offset + len(self._buffer)
+        self._buffer += data
+        if self.index is not None:
+            last = self.index.checkpoints[-1].out_offset
+            produced = produced_before + len(data)
+            if produced - last >= self.index.span:
+                # The whole chunk is consumed, so the copy resumes right after it
+                self.index.checkpoints.append(
+                    _Checkpoint(produced, self.in_offset, self.decompressor.copy())
+                )
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer and not self._eof:
+            self._fill()
+        count = min(len(buffer), len(self._buffer))
+        buffer[:count] = self._buffer[:count]
+        self._buffer = self._buffer[count:]
+        self.out_offset += count
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            self.fileobj.close()
+        super().close()
+
+def gzip_indexing_reader(archive_path: Path, index: GzipSeekIndex) -> BinaryIO:
+    """Open a gzip file for one sequential pass that fills a seek index.
+
+    Args:
+        archive_path: Path to the gzip file
+        index: Empty index to fill
+
+    Returns:
+        Buffered reader of the decompressed data
+    """
+    return io.BufferedReader(_GzipStream(open(archive_path, 'rb'), index), READ_CHUNK_SIZE)
+
+class IndexedGzipReader(_GzipStream):
+    """Seekable reader of a gzip file, resuming from the nearest seek point."""
+
+    def __init__(self, archive_path: Path, index: GzipSeekIndex):
+        """Open the gzip file.
+
+        Args:
+            archive_path: Path to the gzip file
+            index: Seek index built by a previous pass
+        """
+        self.seek_index = index
+        super().__init__(open(archive_path, 'rb'))
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.out_offset
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.out_offset
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("can't seek from the end of a gzip stream")
+        checkpoint = self.seek_index.find(offset)
+        if offset < self.out_offset or checkpoint.out_offset > self.out_offset:
+            self._start(checkpoint)
+        # Decompress and drop the data up to the offset
+        while self.out_offset < offset:
+            skipped = self.read(min(offset - self.out_offset, READ_CHUNK_SIZE))
+            if not skipped:
+                break
+        return self.out_offset
@@ -0,0 +1,307 @@
+import heapq
+import itertools
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+@dataclass(eq=False)
+class ArchiveJob:
+    """An archive in the work queue, and the outcome once processed."""
+    path: Path
+    size: int
+    mtime: float
+    format: str
+    sequence: int = 0
+    declared_size: Optional[int] = None
+    queued_at: int = 0
+    devices: Tuple[int, ...] = ()
+    success: Optional[bool] = None
+    duration: float = 0.0
+    bytes_written: int = 0
+    outputs: List[Path] = field(default_factory=list)
+    cancelled: bool = False
+    skipped: bool = False
+    lease: Optional[Any] = None
+    failure_reason: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """File name of the archive."""
+        return self.path.name
+
+    @property
+    def abandoned(self) -> bool:
+        """Whether the job was cancelled or lost its lease while running."""
+        return self.cancelled or (self.lease is not None and self.lease.lost)
+
+class OrderingPolicy(ABC):
+    """Decides which pending archive is processed next."""
+
+    name: str = ''
+
+    @abstractmethod
+    def key(self, job: ArchiveJob) -> Any:
+        """Return the sort key of a job; lower keys are processed first.
+
+        Args:
+            job: Pending job
+
+        Returns:
+            Sortable key
+        """
+        pass
+
+    def record(self, job: ArchiveJob, seconds: float) -> bool:
+        """Feed back how long a job took.
+
+        Args:
+            job: Finished job
+            seconds: Wall time spent processing it
+
+        Returns:
+            True if the keys of pending jobs may have changed
+        """
+        return False
+
+class FifoPolicy(OrderingPolicy):
+    """Process archives in the order they were discovered."""
+
+    name = 'fifo'
+
+    def key(self, job: ArchiveJob) -> Any:
+        return job.sequence
+
+class SmallestFirstPolicy(OrderingPolicy):
+    """Process the smallest archives first."""
+
+    name = 'smallest'
+
+    def key(self, job: ArchiveJob) -> Any:
+        return (job.size, job.sequence)
+
+class NewestFirstPolicy(OrderingPolicy):
+    """Process the most recently modified archives first."""
+
+    name = 'newest'
+
+    def key(self, job: ArchiveJob) -> Any:
+        return (-job.mtime, job.sequence)
+
+class ShortestExpectedTimePolicy(OrderingPolicy):
+    """Process the archives expected to finish soonest first.
+
+    The expected time is the archive size divided by the throughput of its
+    format, measured as an exponentially weighted average over the jobs
+    finished so far in this run. Formats that haven't been seen yet are
+    assumed to run at the average throughput of the others.
+    """
+
+    name = 'shortest-time'
+
+    def __init__(self, smoothing: float = 0.3):
+        """Initialize the policy.
+
+        Args:
+            smoothing: Weight of the newest sample in the moving average
+        """
+        self.smoothing = smoothing
+        self.throughput: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def key(self, job: ArchiveJob) -> Any:
+        with self._lock:
+            rate = self.throughput.get(job.format)
+            if rate is None and self.throughput:
+                rate = sum(self.throughput.values()) / len(self.throughput)
+        return (job.size / rate if rate else float(job.size), job.sequence)
+
+    def record(self, job: ArchiveJob, seconds: float) -> bool:
+        if seconds <= 0 or job.size <= 0:
+            return False
+        sample = job.size / seconds
+        with self._lock:
+            previous = self.throughput.get(job.format)
+            self.throughput[job.format] = (
+                sample if previous is None
+                else previous + self.smoothing * (sample - previous)
+            )
+        return True
+
+ORDERING_POLICIES = {
+    policy.name: policy
+    for policy in (FifoPolicy, SmallestFirstPolicy, NewestFirstPolicy, ShortestExpectedTimePolicy)
+}
+
+def create_policy(name: str) -> OrderingPolicy:
+    """Create an ordering policy by name.
+
+    Args:
+        name: One of the names in ORDERING_POLICIES
+
+    Returns:
+        OrderingPolicy instance
+
+    Raises:
+        ValueError: If the name is unknown
+    """
+    try:
+        return ORDERING_POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"Unknown ordering policy: {name}")
+
+def _in_order(heap: List[Tuple[Any, int, ArchiveJob]]) -> Iterator[ArchiveJob]:
+    """Yield the jobs of a heap in order without modifying it.
+
+    The heap is walked as a tree from the root, always descending into the
+    smallest entry seen so far, so yielding k jobs costs O(k log k)
+    whatever the size of the heap.
+
+    Args:
+        heap: Heap of (key, sequence, job) entries
+
+    Yields:
+        Jobs in key order
+    """
+    if not heap:
+        return
+    frontier = [(heap[0], 0)]
+    while frontier:
+        entry, index = heapq.heappop(frontier)
+        yield entry[2]
+        for child in (2 * index + 1, 2 * index + 2):
+            if child < len(heap):
+                heapq.heappush(frontier, (heap[child], child))
+
+class WorkQueue:
+    """Pending archives in policy order, with starvation protection.
+
+    Jobs are kept in a heap ordered by the policy and in a FIFO of arrival.
+    The queue counts the jobs it dispatches, and each job records the count
+    when it was queued. A job that has waited while ``starvation_limit``
+    jobs were dispatched is considered starving and moves to the front of
+    the queue, whatever the policy says. Since jobs are queued in order,
+    the starving jobs are always the head of the FIFO.
+
+    Dispatched jobs are only dropped from the heap and the FIFO once they
+    reach the front, or when either holds twice as many entries as there
+    are pending jobs, so iterating over the candidates while taking some of
+    them is safe.
+    """
+
+    def __init__(self, policy: OrderingPolicy, starvation_limit: int = 100):
+        """Initialize the work queue.
+
+        Args:
+            policy: Policy ordering the pending jobs
+            starvation_limit: Dispatches a job waits through before it goes first
+        """
+        self.policy = policy
+        self.starvation_limit = starvation_limit
+        self._pending: Set[ArchiveJob] = set()
+        self._heap: List[Tuple[Any, int, ArchiveJob]] = []
+        self._fifo: Deque[ArchiveJob] = deque()
+        self._counter = itertools.count()
+        self._dispatched = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def push(self, job: ArchiveJob) -> None:
+        """Add a job to the queue.
+
+        Args:
+            job: Job to add
+        """
+        job.sequence = next(self._counter)
+        job.queued_at = self._dispatched
+        self._pending.add(job)
+        self._fifo.append(job)
+        heapq.heappush(self._heap, (self.policy.key(job), job.sequence, job))
+
+    def is_starving(self, job: ArchiveJob, dispatched: Optional[int] = None) -> bool:
+        """Check whether a job has waited too long.
+
+        Args:
+            job: Pending job
+            dispatched: Dispatch count to compare against, defaulting to
+                the current one
+
+        Returns:
+            True if the job must go first
+        """
+        if dispatched is None:
+            dispatched = self._dispatched
+        return dispatched - job.queued_at >= self.starvation_limit
+
+    def _rebuild(self) -> None:
+        """Recompute the heap keys and drop dispatched jobs."""
+        self._fifo = deque(job for job in self._fifo if job in self._pending)
+        self._heap = [(self.policy.key(job), job.sequence, job) for job in self._fifo]
+        heapq.heapify(self._heap)
+
+    def candidates(self) -> Iterator[ArchiveJob]:
+        """Yield the pending jobs in dispatch order.
+
+        Jobs may be taken while iterating; starvation is judged as of the
+        start of the iteration.
+
+        Yields:
+            Starving jobs oldest first, then the rest in policy order
+        """
+        while self._fifo and self._fifo[0] not in self._pending:
+            self._fifo.popleft()
+        while self._heap and self._heap[0][2] not in self._pending:
+            heapq.heappop(self._heap)
+
+        dispatched = self._dispatched
+        fifo, heap = self._fifo, self._heap
+        for job in fifo:
+            if not self.is_starving(job, dispatched):
+                break
+            if job in self._pending:
+                yield job
+        for job in _in_order(heap):
+            if job in self._pending and not self.is_starving(job, dispatched):
+                yield job
+
+    def take(self, job: ArchiveJob) -> ArchiveJob:
+        """Remove a job for dispatch.
+
+        Args:
+            job: Pending job to dispatch
+
+        Returns:
+            The same job
+        """
+        self._pending.remove(job)
+        self._dispatched += 1
+        if len(self._heap) > 2 * len(self._pending) + 64:
+            self._rebuild()
+        return job
+
+    def pop(self) -> ArchiveJob:
+        """Remove and return the next job to dispatch.
+
+        Returns:
+            Next job
+        """
+        return self.take(next(self.candidates()))
+
+    def record(self, job: ArchiveJob, seconds: float) -> None:
+        """Feed a finished job back into the policy.
+
+        Args:
+            job: Finished job
+            seconds: Wall time spent processing it
+        """
+        if job.skipped:
+            return
+        if self.policy.record(job, seconds):
+            self._rebuild()
+
+    def __iter__(self) -> Iterator[ArchiveJob]:
+        while self._pending:
+            yield self.pop()
@@ -0,0 +1,327 @@
+import hashlib
+import logging
+import os
+import shutil
+import socket
+import stat
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .checkpoint import CheckpointJournal
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR_NAME = '.archiver-staging'
+RESUME_PREFIX = 'resume-'
+JOURNAL_SUFFIX = '.journal'
+# Directory inside a staging area holding the entries a commit replaced
+REPLACED_DIR_NAME = '.archiver-replaced'
+
+def _pid_alive(pid: int) -> bool:
+    """Check whether a process with the given PID exists on this host.
+
+    Args:
+        pid: Process ID
+
+    Returns:
+        True if the process exists
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _archive_identity(archive_path: Path) -> Dict[str, Any]:
+    """Return what identifies the version of an archive a journal belongs to.
+
+    Args:
+        archive_path: Path to the archive file
+
+    Returns:
+        Dictionary with the archive name, size and modification time
+    """
+    st = os.stat(archive_path)
+    return {'name': archive_path.name, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def _resume_abandoned(directory: Path, entry: Path) -> bool:
+    """Check whether a resumable staging directory can never be resumed.
+
+    Args:
+        directory: Directory holding the staging root
+        entry: Resumable staging directory
+
+    Returns:
+        True if its archive is gone or has changed and no process holds it
+    """
+    journal = CheckpointJournal(entry.with_name(entry.name + JOURNAL_SUFFIX))
+    if not journal.open():
+        return False
+    try:
+        identity = journal.identity
+        if identity is None:
+            return True
+        try:
+            return _archive_identity(directory / identity['name']) != identity
+        except OSError:
+            return True
+    finally:
+        journal.close()
+
+def cleanup_stale_staging(directory: Path) -> int:
+    """Remove staging directories left behind by crashed runs on this host.
+
+    Each extraction stages into its own subdirectory named after the host
+    and PID that owns it, so cleaning up after a crash is a single
+    ``rmtree`` per interrupted extraction. Staging directories of live
+    processes and of other hosts are left alone, and so are resumable ones
+    whose archive is still there unchanged.
+
+    Args:
+        directory: Directory that may contain a staging root
+
+    Returns:
+        Number of staging directories removed
+    """
+    root = directory / STAGING_DIR_NAME
+    if not root.is_dir():
+        return 0
+
+    hostname = socket.gethostname()
+    removed = 0
+    for entry in root.iterdir():
+        if entry.name.startswith(RESUME_PREFIX):
+            if entry.is_dir() and _resume_abandoned(directory, entry):
+                logger.info(f"Removing staging directory of a changed archive: {entry}")
+                shutil.rmtree(entry, ignore_errors=True)
+                entry.with_name(entry.name + JOURNAL_SUFFIX).unlink(missing_ok=True)
+                removed += 1
+            continue
+        owner = entry.name.rpartition('-')[0]
+        host, _, pid = owner.rpartition('-')
+        if host != hostname or not pid.isdigit() or _pid_alive(int(pid)):
+            continue
+        logger.info(f"Removing staging directory of crashed run: {entry}")
+        shutil.rmtree(entry, ignore_errors=True)
+        removed += 1
+
+    try:
+        root.rmdir()
+    except OSError:
+        pass
+    return removed
+
+class StagingArea:
+    """Hidden directory an archive is extracted into before being committed.
+
+    The staging directory lives inside the target directory, so it is on the
+    same filesystem and committing is a batch of ``rename`` calls. Nothing
+    appears in the target directory unless the extraction succeeded.
+
+    A resumable staging area is named after its archive and keeps a
+    checkpoint journal next to it. When an extraction is interrupted it is
+    left in place, and the next extraction of the same archive picks up the
+    members already written.
+
+    Every rename of a commit is recorded, and entries it replaces are kept
+    aside in the staging directory until the commit is done. A commit that
+    fails halfway is rolled back; if even that fails, the staging directory
+    is kept for manual recovery.
+    """
+
+    def __init__(self, target_dir: Path, archive_path: Optional[Path] = None):
+        """Initialize the staging area.
+
+        Args:
+            target_dir: Directory the extracted files are committed into
+            archive_path: Archive to stage resumably, if any
+        """
+        self.target_dir = Path(target_dir).absolute()
+        self.root = self.target_dir / STAGING_DIR_NAME
+        self.archive_path = archive_path
+        self.journal: Optional[CheckpointJournal] = None
+        # Directories that received entries on commit
+        self.changed_dirs: Set[Path] = set()
+        # Renames of the current commit: source, destination and the
+        # replaced entry kept aside, if any
+        self._renames: List[Tuple[Path, Path, Optional[Path]]] = []
+        self.rollback_failed = False
+        if archive_path is not None:
+            key = hashlib.sha1(archive_path.name.encode('utf-8')).hexdigest()[:16]
+            self.path = self.root / f"{RESUME_PREFIX}{key}"
+        else:
+            self.path = self._unique_path()
+
+    def _unique_path(self) -> Path:
+        return self.root / f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+    def _open_journal(self) -> bool:
+        """Lock the journal of a resumable staging area and load it.
+
+        Returns:
+            False if another process is extracting the same archive, in
+            which case the staging area falls back to a fresh directory
+        """
+        journal = CheckpointJournal(self.path.with_name(self.path.name + JOURNAL_SUFFIX))
+        if not journal.open(_archive_identity(self.archive_path)):
+            logger.debug(f"{self.path} is in use, staging {self.archive_path} elsewhere")
+            self.archive_path = None
+            self.path = self._unique_path()
+            return False
+        if not journal.files and not journal.dirs:
+            # Nothing to resume from: start over with an empty directory
+            shutil.rmtree(self.path, ignore_errors=True)
+        self.journal = journal
+        self.path.mkdir(exist_ok=True)
+        return True
+
+    def create(self) -> Path:
+        """Create the staging directory.
+
+        Returns:
+            Path of the staging directory
+        """
+        while True:
+            try:
+                self.root.mkdir(exist_ok=True)
+                if self.archive_path is None or not self._open_journal():
+                    self.path.mkdir()
+                break
+            except (FileExistsError, FileNotFoundError):
+                # Another extraction removed the empty staging root in between
+                if self.journal is not None:
+                    self.journal.close()
+                    self.journal = None
+                continue
+        return self.path
+
+    def size(self) -> int:
+        """Return the total size of the staged files.
+
+        Returns:
+            Sum of the sizes of all regular files in the staging directory
+        """
+        total = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                st = os.lstat(os.path.join(root, name))
+                if stat.S_ISREG(st.st_mode):
+                    total += st.st_size
+        return total
+
+    def _replace(self, source: Path, destination: Path) -> None:
+        """Rename a staged entry into place, keeping what it replaces aside.
+
+        Args:
+            source: Staged file, link or directory
+            destination: Final location
+        """
+        backup = None
+        if os.path.lexists(destination) and not (
+            destination.is_dir() and not destination.is_symlink()
+        ):
+            replaced_dir = self.path / REPLACED_DIR_NAME
+            replaced_dir.mkdir(exist_ok=True)
+            backup = replaced_dir / str(len(self._renames))
+            try:
+                os.link(destination, backup, follow_symlinks=False)
+            except OSError:
+                # No hard links here; move the old entry aside instead
+                os.rename(destination, backup)
+        try:
+            os.replace(source, destination)
+        except OSError:
+            if backup is not None and not os.path.lexists(destination):
+                os.rename(backup, destination)
+            raise
+        self._renames.append((source, destination, backup))
+        self.changed_dirs.add(destination.parent)
+
+    def _merge(self, source: Path, destination: Path) -> None:
+        """Move a staged entry into place, merging into existing directories.
+
+        Args:
+            source: Staged file or directory
+            destination: Final location
+        """
+        if (
+            source.is_dir() and not source.is_symlink()
+            and destination.is_dir() and not destination.is_symlink()
+        ):
+            for child in source.iterdir():
+                self._merge(child, destination / child.name)
+            source.rmdir()
+        else:
+            self._replace(source, destination)
+
+    def _rollback(self) -> None:
+        """Undo the renames of a failed commit, newest first.
+
+        If an entry can't be moved back, the remaining ones are left in
+        place, logged, and the staging directory is kept.
+        """
+        while self._renames:
+            source, destination, backup = self._renames[-1]
+            try:
+                source.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(destination, source)
+                if backup is not None:
+                    os.replace(backup, destination)
+            except OSError as e:
+                self.rollback_failed = True
+                logger.error(
+                    f"Failed to roll back commit of {self.path} at {destination}: {e}; "
+                    f"already committed: {', '.join(str(d) for _, d, _ in self._renames)}"
+                )
+                return
+            self._renames.pop()
+
+    def commit(self) -> List[Path]:
+        """Rename all staged entries into the target directory.
+
+        Returns:
+            Top-level paths that were committed
+
+        Raises:
+            OSError: If an entry can't be renamed; the entries committed
+                before it are moved back first
+        """
+        committed = []
+        self._renames = []
+        entries = [e for e in self.path.iterdir() if e.name != REPLACED_DIR_NAME]
+        try:
+            for entry in entries:
+                destination = self.target_dir / entry.name
+                self._merge(entry, destination)
+                committed.append(destination)
+        except BaseException:
+            self._rollback()
+            raise
+        self._renames = []
+        shutil.rmtree(self.path / REPLACED_DIR_NAME, ignore_errors=True)
+        return committed
+
+    def release(self) -> None:
+        """Leave an interrupted resumable staging area for the next run."""
+        if self.journal is not None:
+            self.journal.close()
+
+    def discard(self) -> None:
+        """Delete whatever is left in the staging directory.
+
+        A staging directory whose commit couldn't be rolled back is kept.
+        """
+        if self.rollback_failed:
+            logger.error(f"Keeping {self.path} for recovery of a partial commit")
+            self.release()
+            return
+        if self.journal is not None:
+            self.journal.remove()
+        shutil.rmtree(self.path, ignore_errors=True)
+        try:
+            self.root.rmdir()
+        except OSError:
+            pass
@@ -0,0 +1,297 @@
+import ctypes
+import functools
+import logging
+import os
+import platform
+import shutil
+import sys
+import threading
+import time
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ioprio_set(2) is not wrapped by the os module
+IOPRIO_SET_SYSCALLS = {
+    'x86_64': 251,
+    'i386': 289,
+    'i686': 289,
+    'aarch64': 30,
+    'armv7l': 314,
+    'ppc64le': 273,
+    's390x': 282,
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+# Writes smaller than this say little about device latency
+LATENCY_SAMPLE_MIN_BYTES = 64 * 1024
+
+@functools.lru_cache(maxsize=None)
+def _ioprio_set() -> Optional[Callable[..., int]]:
+    """Return the raw syscall function for ioprio_set, if there is one."""
+    number = IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if not sys.platform.startswith('linux') or number is None:
+        return None
+    syscall = ctypes.CDLL(None, use_errno=True).syscall
+    return functools.partial(syscall, number)
+
+def set_io_idle(tid: int = 0) -> bool:
+    """Put a thread in the idle I/O scheduling class.
+
+    Idle class I/O is only served when no other process wants the disk.
+    The I/O priority belongs to the thread and is inherited by processes
+    it starts.
+
+    Args:
+        tid: Native thread ID, or 0 for the calling thread
+
+    Returns:
+        True if the priority was changed
+    """
+    ioprio_set = _ioprio_set()
+    if ioprio_set is None:
+        return False
+    if ioprio_set(IOPRIO_WHO_PROCESS, tid, IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) != 0:
+        logger.debug(f"ioprio_set failed: {os.strerror(ctypes.get_errno())}")
+        return False
+    return True
+
+def set_nice(nice: int, tid: int = 0) -> bool:
+    """Lower the CPU priority of a thread to a nice level.
+
+    On Linux the nice value belongs to the thread. The priority is never
+    raised.
+
+    Args:
+        nice: Nice level to lower to
+        tid: Native thread ID, or 0 for the calling thread
+
+    Returns:
+        True if the priority was changed
+    """
+    tid = tid or threading.get_native_id()
+    try:
+        if os.getpriority(os.PRIO_PROCESS, tid) >= nice:
+            return False
+        os.setpriority(os.PRIO_PROCESS, tid, nice)
+    except OSError as e:
+        logger.debug(f"setpriority failed: {e}")
+        return False
+    return True
+
+class TokenBucket:
+    """Thread-safe token bucket limiting a rate of bytes per second."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """Initialize the token bucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity, defaulting to one second worth of tokens
+        """
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.waited = 0.0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int) -> float:
+        """Take tokens, waiting until the bucket has enough.
+
+        Amounts larger than the bucket go into debt, so the caller waits
+        for the whole amount instead of forever.
+
+        Args:
+            amount: Tokens to take
+
+        Returns:
+            Seconds spent waiting
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+class AdaptiveConcurrency:
+    """Worker limit driven by write latency, by additive increase and halving.
+
+    The latency of large writes per byte is smoothed into a moving
+    average and compared to the lowest average seen, which stands for the
+    latency of the idle disk. Every ``window`` samples the limit is halved
+    if the average exceeds ``threshold`` times the baseline, and raised by
+    one otherwise.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        threshold: float = 3.0,
+        window: int = 32,
+        alpha: float = 0.2
+    ):
+        """Initialize the controller.
+
+        Args:
+            max_limit: Highest worker limit, and the starting one
+            min_limit: Lowest worker limit
+            threshold: Latency increase over the baseline that counts as congestion
+            window: Samples between adjustments
+            alpha: Weight of a new sample in the moving average
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.threshold = threshold
+        self.window = window
+        self.alpha = alpha
+        self.limit = max_limit
+        self.average: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, size: int) -> None:
+        """Feed the duration of a write.
+
+        Args:
+            seconds: Time the write took
+            size: Bytes written
+        """
+        if size < LATENCY_SAMPLE_MIN_BYTES:
+            return
+        latency = seconds / size
+        with self._lock:
+            if self.average is None:
+                self.average = latency
+            else:
+                self.average += self.alpha * (latency - self.average)
+            self._samples += 1
+            if self._samples < self.window:
+                return
+            if self.baseline is None or self.average < self.baseline:
+                self.baseline = self.average
+            if self._samples % self.window:
+                return
+
+            if self.average > self.baseline * self.threshold:
+                if self.limit > self.min_limit:
+                    self.limit = max(self.min_limit, self.limit // 2)
+                    logger.info(
+                        f"Write latency {self.average / self.baseline:.1f}x baseline, "
+                        f"lowering workers to {self.limit}"
+                    )
+            elif self.limit < self.max_limit:
+                self.limit += 1
+                logger.debug(f"Write latency normal, raising workers to {self.limit}")
+
+class ResourceGovernor:
+    """Keeps extraction from starving other services on the host.
+
+    Writes of all workers share one token bucket, worker threads and the
+    processes they start run at a lower CPU and I/O priority, and the
+    number of concurrent extractions follows the write latency.
+    """
+
+    def __init__(
+        self,
+        max_write_rate: int = 0,
+        nice: int = 0,
+        io_idle: bool = False,
+        adaptive: Optional[AdaptiveConcurrency] = None
+    ):
+        """Initialize the resource governor.
+
+        Args:
+            max_write_rate: Bytes per second written by all workers, 0 for no limit
+            nice: Nice level for workers, 0 to leave it alone
+            io_idle: Whether workers use the idle I/O scheduling class
+            adaptive: Optional controller for the number of workers
+        """
+        self.bucket = TokenBucket(max_write_rate) if max_write_rate else None
+        self.nice = nice
+        self.io_idle = io_idle
+        self.adaptive = adaptive
+        self._deprioritized = threading.local()
+
+    def write(self, f: BinaryIO, data: bytes) -> None:
+        """Write output data within the rate limit, measuring the latency.
+
+        Args:
+            f: Output file
+            data: Data to write
+        """
+        if self.bucket is not None:
+            self.bucket.consume(len(data))
+        start = time.monotonic()
+        f.write(data)
+        if self.adaptive is not None:
+            self.adaptive.observe(time.monotonic() - start, len(data))
+
+    def concurrency(self, max_workers: int) -> int:
+        """Return how many extractions may run at once.
+
+        Args:
+            max_workers: Configured number of workers
+
+        Returns:
+            Current worker limit
+        """
+        if self.adaptive is None:
+            return max_workers
+        return min(max_workers, self.adaptive.limit)
+
+    def deprioritize_current_thread(self) -> None:
+        """Lower the priority of the calling thread, once per thread."""
+        if getattr(self._deprioritized, 'done', False):
+            return
+        self._deprioritized.done = True
+        if self.nice:
+            set_nice(self.nice)
+        if self.io_idle:
+            set_io_idle()
+
+    def command_prefix(self) -> List[str]:
+        """Return a command prefix running a child process at the worker priority.
+
+        Children inherit the priority of the thread starting them, which is
+        not lowered when it is the event loop thread, so the priority is
+        set with ``nice`` and ``ionice`` rather than in the forked child.
+
+        Returns:
+            Arguments to put in front of the command, empty if none are needed
+        """
+        prefix: List[str] = []
+        if self.nice and shutil.which('nice'):
+            try:
+                current = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+            except OSError:
+                current = 0
+            if current < self.nice:
+                prefix += ['nice', '-n', str(self.nice - current)]
+        if self.io_idle and sys.platform.startswith('linux') and shutil.which('ionice'):
+            prefix += ['ionice', '-c', '3']
+        return prefix
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Return how much throttling slowed extraction down.
+
+        Returns:
+            Dictionary with the seconds spent waiting for the rate limit
+            and the current worker limit, if adaptive
+        """
+        stats: Dict[str, float] = {}
+        if self.bucket is not None:
+            stats['throttled_seconds'] = round(self.bucket.waited, 1)
+        if self.adaptive is not None:
+            stats['worker_limit'] = self.adaptive.limit
+        return stats
@@ -0,0 +1,138 @@
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Deque, Iterator, List, Set, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Filesystem types where every readdir and stat is a network round trip
+NETWORK_FILESYSTEMS = {
+    'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p', 'ceph',
+    'glusterfs', 'lustre', 'gpfs', 'beegfs', 'fuse.sshfs', 'fuse.rclone',
+    'fuse.glusterfs', 'fuse.cephfs', 'fuse.s3fs', 'fuse.gcsfuse',
+}
+
+# Directories listed at once on a network filesystem when not configured
+NETWORK_SCAN_WORKERS = 16
+
+# Spaces and other special characters in the mount table are octal escaped
+_MOUNT_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+def filesystem_type(path: Union[str, Path]) -> str:
+    """Return the type of the filesystem a path is on.
+
+    Args:
+        path: Any existing path
+
+    Returns:
+        Filesystem type from the mount table (``nfs4``, ``ext4``, ...), or
+        an empty string if it cannot be determined
+    """
+    path = os.path.realpath(path)
+    best, fs_type = '', ''
+    try:
+        with open('/proc/self/mounts', 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = _MOUNT_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), fields[1])
+                inside = path == mount_point or path.startswith(mount_point.rstrip('/') + '/')
+                if inside and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return ''
+    return fs_type
+
+def scan_workers_for(path: Union[str, Path], configured: int = 0) -> int:
+    """Choose how many directories to list at once below a path.
+
+    Args:
+        path: Directory about to be scanned
+        configured: Configured number of workers, 0 to choose automatically
+
+    Returns:
+        The configured number, or many workers on a network filesystem and
+        one on a local one, where listing is too fast to gain from threads
+    """
+    if configured:
+        return configured
+    fs_type = filesystem_type(path)
+    if fs_type in NETWORK_FILESYSTEMS:
+        logger.debug(f"{path} is on {fs_type}, listing {NETWORK_SCAN_WORKERS} directories at once")
+        return NETWORK_SCAN_WORKERS
+    return 1
+
+def _list_directory(path: str) -> Tuple[str, List[str], List[str], Set[str]]:
+    """List one directory, splitting its entries like ``os.walk``.
+
+    Args:
+        path: Directory to list
+
+    Returns:
+        Tuple of the directory, its subdirectories, its other entries and
+        the subdirectories that are symbolic links
+    """
+    dirs: List[str] = []
+    files: List[str] = []
+    links: Set[str] = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.append(entry.name)
+                continue
+            dirs.append(entry.name)
+            try:
+                if entry.is_symlink():
+                    links.add(entry.name)
+            except OSError:
+                links.add(entry.name)
+    return path, dirs, files, links
+
+def parallel_walk(
+    top: Union[str, Path],
+    workers: int = NETWORK_SCAN_WORKERS
+) -> Iterator[Tuple[str, List[str], List[str]]]:
+    """Walk a directory tree listing many directories at once.
+
+    Yields the same tuples as ``os.walk`` without following symbolic
+    links, but in the order the listings complete rather than top-down.
+    Listings run on a thread pool, with at most twice as many requests
+    outstanding as there are workers. As with ``os.walk``, removing names
+    from the yielded subdirectory list keeps the walk out of them, and
+    directories that cannot be listed are skipped.
+
+    Args:
+        top: Directory to walk
+        workers: Directories listed at once; 1 falls back to ``os.walk``
+
+    Yields:
+        Tuples of (dirpath, dirnames, filenames)
+    """
+    top = os.fspath(top)
+    if workers <= 1:
+        yield from os.walk(top)
+        return
+
+    waiting: Deque[str] = deque([top])
+    in_flight: Set[Future] = set()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='archiver-scan') as pool:
+        while waiting or in_flight:
+            while waiting and len(in_flight) < workers * 2:
+                in_flight.add(pool.submit(_list_directory, waiting.popleft()))
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    root, dirs, files, links = future.result()
+                except OSError as e:
+                    logger.debug(f"Skipping unreadable directory: {e}")
+                    continue
+                yield root, dirs, files
+                waiting.extend(os.path.join(root, d) for d in dirs if d not in links)
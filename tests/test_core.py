@@ -0,0 +1,1879 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+from archiver.core import ArchiveProcessor
+from archiver.utils.config import ArchiveConfig
+from archiver.utils.leases import LeaseManager
+
+def _python_env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(SRC_DIR), env.get("PYTHONPATH")]))
+    return env
+
+def _run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    """Run a snippet in a fresh interpreter that can import the package."""
+    return subprocess.run(
+        [sys.executable, *args, "-c", textwrap.dedent(code)],
+        capture_output=True, text=True, env=_python_env(), check=True
+    )
+
+def _make_zips(directory: Path, count: int) -> list:
+    names = []
+    for i in range(count):
+        with zipfile.ZipFile(directory / f"archive{i:02}.zip", "w") as archive:
+            archive.writestr(f"out{i:02}/data.txt", "x" * 1000 * i)
+        names.append(f"archive{i:02}.zip")
+    return names
+
+def test_cli_import_loads_no_heavy_modules():
+    result = _run_python("""
+        import json, sys
+        import archiver.cli
+        print(json.dumps(sorted(sys.modules)))
+    """)
+    loaded = set(json.loads(result.stdout))
+    for module in (
+        "py7zr", "asyncio", "tqdm", "sqlite3",
+        "archiver.daemon", "archiver.benchmark", "archiver.utils.content_index",
+    ):
+        assert module not in loaded
+
+def test_extractors_load_only_for_formats_present(tmp_path):
+    with zipfile.ZipFile(tmp_path / "sample.zip", "w") as archive:
+        archive.writestr("hello.txt", "hello")
+
+    result = _run_python(f"""
+        import json, sys
+        from pathlib import Path
+        from archiver.core import ArchiveProcessor
+        from archiver.utils.config import ArchiveConfig
+
+        processor = ArchiveProcessor(ArchiveConfig(base_dir=Path({str(tmp_path)!r})))
+        stats = processor.process_directory()
+        print(json.dumps({{
+            "stats": stats,
+            "loaded": [e.format for e in processor.extractors if e.loaded],
+            "modules": [m for m in ("py7zr", "archiver.extractors.rar") if m in sys.modules],
+        }}))
+    """)
+    report = json.loads(result.stdout)
+    assert report["stats"]["successful_extractions"] == 1
+    assert report["loaded"] == ["zip"]
+    assert report["modules"] == []
+    assert (tmp_path / "hello.txt").read_text() == "hello"
+
+def test_lease_coordination_splits_work_between_processes(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    names = _make_zips(share, 24)
+    go = tmp_path / "go"
+
+    worker = textwrap.dedent(f"""
+        import json, os, time
+        from pathlib import Path
+        from archiver.core import ArchiveProcessor
+        from archiver.utils.config import ArchiveConfig
+
+        while not os.path.exists({str(go)!r}):
+            time.sleep(0.01)
+        config = ArchiveConfig(
+            base_dir=Path({str(share)!r}),
+            coordination_dir=Path({str(tmp_path / "leases")!r}),
+        )
+        processor = ArchiveProcessor(config)
+        print(json.dumps([
+            job.name for job in processor.iter_directory()
+            if job.success and not job.skipped
+        ]))
+    """)
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", worker],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, env=_python_env()
+        )
+        for _ in range(4)
+    ]
+    go.touch()
+
+    extracted = []
+    for process in workers:
+        stdout, _ = process.communicate(timeout=60)
+        assert process.returncode == 0
+        extracted.extend(json.loads(stdout))
+
+    assert sorted(extracted) == names
+    for i in range(24):
+        assert (share / f"out{i:02}" / "data.txt").stat().st_size == 1000 * i
+    assert not list((tmp_path / "leases").glob("*.lease"))
+
+def test_expired_lease_is_taken_over(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_zips(share, 2)
+    leases = LeaseManager(tmp_path / "leases", share, ttl=30)
+
+    # A live lease held elsewhere, and one left behind by a dead node
+    live = leases.acquire(share / "archive00.zip")
+    dead = leases.acquire(share / "archive01.zip")
+    leases.close()
+    stale = time.time() - 3600
+    os.utime(dead.path, (stale, stale))
+
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=share,
+        coordination_dir=tmp_path / "leases",
+        lease_ttl=30,
+    ))
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert stats["skipped_archives"] == 1
+    assert not (share / "out00").exists()
+    assert (share / "out01" / "data.txt").exists()
+    assert live.path.exists()
+    assert leases.is_done(share / "archive01.zip")
+
+def test_failed_archive_is_not_marked_done_for_other_hosts(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_corrupt_zip(share / "broken.zip")
+    config = dict(base_dir=share, coordination_dir=tmp_path / "leases")
+
+    first = ArchiveProcessor(ArchiveConfig(**config)).process_directory()
+    second = ArchiveProcessor(ArchiveConfig(**config)).process_directory()
+
+    assert first["failed_extractions"] == 1
+    assert second["failed_extractions"] == 1
+    assert second["skipped_archives"] == 0
+    assert not LeaseManager(tmp_path / "leases", share).is_done(share / "broken.zip")
+
+def test_post_extraction_hooks_run_stub_command_per_batch(tmp_path):
+    share = tmp_path / "share"
+    for name in ("movies", "music"):
+        (share / name).mkdir(parents=True)
+    _make_zips(share / "movies", 3)
+    _make_zips(share / "music", 1)
+    out = tmp_path / "hook-out"
+    out.mkdir()
+
+    # Stub command saving every batch it receives on stdin to its own file
+    stub = f'cat > "{out}/$ARCHIVER_COUNT-$$.json"'
+    callable_batches = []
+    processor = ArchiveProcessor(
+        ArchiveConfig(
+            base_dir=share,
+            hook_commands=[stub],
+            hook_batch_window=60,
+            hook_batch_size=2,
+            failure_cache=False,
+        ),
+        hooks=[callable_batches.append],
+    )
+    stats = processor.process_directory()
+    processor.close()
+
+    assert stats["successful_extractions"] == 4
+    assert stats["hook_batches"] == 3
+    assert stats["hook_failures"] == 0
+
+    batches = {}
+    for path in out.iterdir():
+        batch = json.loads(path.read_text())
+        assert path.name.startswith(f"{len(batch['archives'])}-")
+        batches.setdefault(Path(batch["directory"]).name, []).append(len(batch["archives"]))
+    assert {name: sorted(sizes) for name, sizes in batches.items()} == {
+        "movies": [1, 2],
+        "music": [1],
+    }
+    extracted = [a for b in callable_batches for a in b.archives]
+    assert sorted(a.name for a in extracted) == sorted(
+        ["archive00.zip", "archive01.zip", "archive02.zip", "archive00.zip"]
+    )
+
+def _escape_attempt(tmp_path: Path):
+    """Return an archive directory and a directory outside of it."""
+    share = tmp_path / "share"
+    outside = tmp_path / "outside"
+    share.mkdir()
+    outside.mkdir()
+    return share, outside
+
+def _extract_one(share: Path, name: str):
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=share, failure_cache=False))
+    return processor.process_archive(share / name)
+
+def test_7z_symlink_cannot_redirect_members_outside_target(tmp_path):
+    import py7zr
+
+    share, outside = _escape_attempt(tmp_path)
+    (tmp_path / "evil").symlink_to(outside)
+    with py7zr.SevenZipFile(share / "evil.7z", "w") as archive:
+        archive.write(tmp_path / "evil", "evil")
+        archive.writestr(b"pwned", "evil/pwned.txt")
+
+    job = _extract_one(share, "evil.7z")
+
+    assert not job.success
+    assert list(outside.iterdir()) == []
+
+def test_tar_symlink_cannot_redirect_members_outside_target(tmp_path):
+    import io
+    import tarfile
+
+    share, outside = _escape_attempt(tmp_path)
+    with tarfile.open(share / "evil.tar", "w") as archive:
+        link = tarfile.TarInfo("evil")
+        link.type = tarfile.SYMTYPE
+        link.linkname = str(outside)
+        archive.addfile(link)
+        member = tarfile.TarInfo("evil/pwned.txt")
+        member.size = 5
+        archive.addfile(member, io.BytesIO(b"pwned"))
+
+    job = _extract_one(share, "evil.tar")
+
+    assert not job.success
+    assert not (share / "evil").is_symlink()
+    assert list(outside.iterdir()) == []
+
+def test_zip_symlink_cannot_redirect_members_outside_target(tmp_path):
+    share, outside = _escape_attempt(tmp_path)
+    with zipfile.ZipFile(share / "evil.zip", "w") as archive:
+        link = zipfile.ZipInfo("evil")
+        link.create_system = 3
+        link.external_attr = 0o120777 << 16
+        archive.writestr(link, str(outside))
+        archive.writestr("evil/pwned.txt", "pwned")
+        archive.writestr("../pwned.txt", "pwned")
+
+    job = _extract_one(share, "evil.zip")
+
+    assert not job.success
+    assert list(outside.iterdir()) == []
+    assert not (tmp_path / "pwned.txt").exists()
+
+# Settings a configuration file may change that the extract command must
+# leave alone unless the matching option is given
+CONFIG_FILE_SETTINGS = {
+    "dedup_mode": "hardlink",
+    "reserve_disk_space": False,
+    "atomic_extraction": False,
+    "schedule_policy": "smallest",
+    "starvation_limit": 7,
+    "resumable_extraction": False,
+    "failure_cache": True,
+    "preserve_metadata": False,
+}
+
+def _cli_config(tmp_path: Path, monkeypatch, settings: dict, *args: str) -> ArchiveConfig:
+    """Run the extract command with a configuration file; return the final config."""
+    from click.testing import CliRunner
+    import archiver.cli
+
+    seen = []
+
+    class RecordingProcessor:
+        def __init__(self, config):
+            seen.append(config)
+
+        def process_directory(self):
+            return {
+                "directories_processed": 0,
+                "compressed_files_found": 0,
+                "successful_extractions": 0,
+                "failed_extractions": 0,
+            }
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(archiver.cli, "ArchiveProcessor", RecordingProcessor)
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({"base_dir": str(tmp_path), **settings}))
+    result = CliRunner().invoke(
+        archiver.cli.cli, ["extract", str(tmp_path), "--config", str(config_file), *args]
+    )
+    assert result.exit_code == 0, result.output
+    return seen[0]
+
+def test_config_file_settings_survive_cli_defaults(tmp_path, monkeypatch):
+    config = _cli_config(tmp_path, monkeypatch, CONFIG_FILE_SETTINGS)
+
+    for key, value in CONFIG_FILE_SETTINGS.items():
+        assert getattr(config, key) == value, key
+
+def test_cli_options_override_config_file(tmp_path, monkeypatch):
+    config = _cli_config(
+        tmp_path, monkeypatch, CONFIG_FILE_SETTINGS,
+        "--dedup", "reflink",
+        "--space-check",
+        "--atomic",
+        "--order", "newest",
+        "--starvation-limit", "3",
+        "--resume",
+        "--no-failure-cache",
+        "--preserve-metadata",
+    )
+
+    assert config.dedup_mode == "reflink"
+    assert config.reserve_disk_space is True
+    assert config.atomic_extraction is True
+    assert config.schedule_policy == "newest"
+    assert config.starvation_limit == 3
+    assert config.resumable_extraction is True
+    assert config.failure_cache is False
+    assert config.preserve_metadata is True
+
+def test_cli_flags_override_config_file_only_when_given(tmp_path, monkeypatch):
+    import click
+    import archiver.cli
+
+    params = {param.name: param for param in archiver.cli.main.params}
+    assert set(archiver.cli.EXTRACT_OPTION_SETTINGS) == set(params) - {"directory", "config"}
+    flags = {
+        archiver.cli.EXTRACT_OPTION_SETTINGS[name]: param for name, param in params.items()
+        if isinstance(param, click.Option) and param.secondary_opts
+    }
+    # The configuration file sets every --x/--no-x flag against its default
+    settings = {key: not param.default for key, param in flags.items()}
+
+    config = _cli_config(tmp_path, monkeypatch, settings)
+    for key, value in settings.items():
+        assert getattr(config, key) == value, key
+
+    # Giving a flag overrides the file, even in the direction of its default
+    config = _cli_config(tmp_path, monkeypatch, settings, *(
+        param.opts[0] if param.default else param.secondary_opts[0] for param in flags.values()
+    ))
+    for key, value in settings.items():
+        assert getattr(config, key) == (not value), key
+
+def _make_duplicate_zips(share: Path, payload: bytes) -> None:
+    for i in range(2):
+        with zipfile.ZipFile(share / f"copy{i}.zip", "w") as archive:
+            archive.writestr(f"copy{i}/data.bin", payload)
+
+def test_dedup_hardlinks_duplicate_members(tmp_path):
+    payload = os.urandom(64 * 1024)
+    _make_duplicate_zips(tmp_path, payload)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, dedup_mode="hardlink", dedup_min_size=0, failure_cache=False
+    ))
+
+    stats = processor.process_directory()
+
+    first, second = tmp_path / "copy0" / "data.bin", tmp_path / "copy1" / "data.bin"
+    assert stats["deduplicated_files"] == 1
+    assert stats["deduplicated_bytes"] == len(payload)
+    assert second.read_bytes() == payload
+    assert os.path.samefile(first, second)
+
+def test_dedup_reflinks_or_copies_duplicate_members(tmp_path):
+    payload = os.urandom(64 * 1024)
+    _make_duplicate_zips(tmp_path, payload)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, dedup_mode="reflink", dedup_min_size=0, failure_cache=False
+    ))
+
+    stats = processor.process_directory()
+
+    first, second = tmp_path / "copy0" / "data.bin", tmp_path / "copy1" / "data.bin"
+    assert stats["deduplicated_files"] == 1
+    assert second.read_bytes() == payload
+    # A reflink shares blocks, never the inode
+    assert not os.path.samefile(first, second)
+
+def test_dedup_index_relocates_and_forgets_only_affected_paths(tmp_path):
+    from archiver.utils.dedup import DedupIndex
+
+    staging, target, other = tmp_path / ".staging", tmp_path / "out", tmp_path / "other"
+    for directory in (staging / "sub", other):
+        directory.mkdir(parents=True)
+    index = DedupIndex()
+    index.register(staging / "a.bin", 1, 10)
+    index.register(staging / "sub" / "b.bin", 2, 20)
+    index.register(other / "c.bin", 3, 30)
+
+    index.relocate(staging, target)
+
+    assert index._by_crc == {
+        (1, 10): str(target / "a.bin"),
+        (2, 20): str(target / "sub" / "b.bin"),
+        (3, 30): str(other / "c.bin"),
+    }
+    assert index._by_size[2] == str(target / "sub" / "b.bin")
+    assert not any(str(staging) in path for path in index._keys)
+    assert str(staging) not in index._children
+
+    index.forget(target / "sub" / "b.bin")
+    index.relocate(target, staging)
+
+    assert index._by_crc == {(1, 10): str(staging / "a.bin"), (3, 30): str(other / "c.bin")}
+    assert index._by_size == {1: str(staging / "a.bin"), 3: str(other / "c.bin")}
+    assert set(index._keys) == {str(staging / "a.bin"), str(other / "c.bin")}
+
+def test_dedup_does_not_link_crc_collisions(tmp_path):
+    import io
+    import zlib
+    from archiver.extractors.writer import ExtractionWriter
+    from archiver.utils.dedup import DedupIndex
+
+    payload = b"a" * 4096
+    existing = tmp_path / "existing.bin"
+    existing.write_bytes(b"b" * 4096)
+    index = DedupIndex(mode="hardlink")
+    # Same size and CRC on record, different content on disk
+    index.register(existing, len(payload), zlib.crc32(payload))
+    writer = ExtractionWriter(tmp_path / "out", dedup_index=index)
+
+    path = writer.write_member(
+        "data.bin", io.BytesIO(payload), size=len(payload), crc=zlib.crc32(payload)
+    )
+    writer.finish()
+
+    assert path.read_bytes() == payload
+    assert not os.path.samefile(path, existing)
+    assert existing.read_bytes() == b"b" * 4096
+    assert index.stats["deduplicated_files"] == 0
+
+def test_dedup_index_follows_staged_output_into_place(tmp_path):
+    import zlib
+
+    payload = os.urandom(64 * 1024)
+    with zipfile.ZipFile(tmp_path / "copy0.zip", "w") as archive:
+        archive.writestr("copy0/data.bin", payload)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path,
+        dedup_mode="hardlink",
+        dedup_min_size=0,
+        atomic_extraction=True,
+        failure_cache=False,
+    ))
+
+    processor.process_directory()
+
+    assert processor.dedup_index.lookup(len(payload), zlib.crc32(payload)) == (
+        tmp_path / "copy0" / "data.bin"
+    )
+
+def test_member_filter_pattern_kinds():
+    from archiver.extractors.base import ArchiveMember
+    from archiver.utils.filters import MemberFilter
+
+    def selected(member_filter, *names):
+        return [n for n in names if member_filter.matches(ArchiveMember(n, 100))]
+
+    names = ["Movie/movie.MKV", "Movie/Extras/extra.mkv", "Movie/Proof/proof.jpg", "proof.jpg"]
+    # Base name, full path and directory component patterns
+    assert selected(MemberFilter(include=["*.mkv"]), *names) == names[:2]
+    assert selected(MemberFilter(include=["movie/extras/*.mkv"]), *names) == [names[1]]
+    assert selected(MemberFilter(include=["extras/*.mkv"]), *names) == []
+    assert selected(MemberFilter(include=["proof/"]), *names) == [names[2]]
+    assert selected(MemberFilter(exclude=["Proof/"]), *names) == [names[0], names[1], names[3]]
+    # Excludes win over includes
+    assert selected(MemberFilter(include=["*.mkv"], exclude=["extras/"]), *names) == names[:1]
+    # Directory entries are left to be created on demand
+    assert not MemberFilter(include=["*"]).matches(ArchiveMember("Movie/", 0, is_dir=True))
+    assert MemberFilter().matches(ArchiveMember("Movie/", 0, is_dir=True))
+
+def test_member_filter_size_bounds():
+    from archiver.extractors.base import ArchiveMember
+    from archiver.utils.filters import MemberFilter
+
+    member_filter = MemberFilter(min_size=10, max_size=100)
+
+    assert not member_filter.matches(ArchiveMember("small", 9))
+    assert member_filter.matches(ArchiveMember("low", 10))
+    assert member_filter.matches(ArchiveMember("high", 100))
+    assert not member_filter.matches(ArchiveMember("large", 101))
+
+# Members of the filtered extraction tests, by name and size
+FILTER_MEMBERS = {
+    "Movie/movie.mkv": 2000,
+    "Movie/info.nfo": 20,
+    "Movie/empty.nfo": 0,
+    "Movie/Sample/sample.mkv": 100,
+    "Movie/cover.jpg": 50,
+}
+
+def _write_filter_archive(path: Path) -> None:
+    import io
+    import tarfile
+    import py7zr
+
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, size in FILTER_MEMBERS.items():
+                archive.writestr(name, b"x" * size)
+    elif path.suffix == ".7z":
+        with py7zr.SevenZipFile(path, "w") as archive:
+            for name, size in FILTER_MEMBERS.items():
+                archive.writestr(b"x" * size, name)
+    else:
+        with tarfile.open(path, "w:gz") as archive:
+            for name, size in FILTER_MEMBERS.items():
+                info = tarfile.TarInfo(name)
+                info.size = size
+                archive.addfile(info, io.BytesIO(b"x" * size))
+
+def test_filtered_extraction_per_format(tmp_path):
+    for name in ("movie.zip", "movie.7z", "movie.tar.gz"):
+        share = tmp_path / name.partition(".")[2]
+        share.mkdir()
+        _write_filter_archive(share / name)
+        processor = ArchiveProcessor(ArchiveConfig(
+            base_dir=share,
+            include_patterns=["*.mkv", "*.nfo"],
+            exclude_patterns=["sample/"],
+            min_member_size=1,
+            failure_cache=False,
+        ))
+
+        stats = processor.process_directory()
+
+        assert stats["successful_extractions"] == 1, name
+        extracted = sorted(
+            p.relative_to(share).as_posix() for p in share.rglob("*") if p.is_file()
+        )
+        assert extracted == ["Movie/info.nfo", "Movie/movie.mkv", name], name
+        assert (share / "Movie" / "movie.mkv").stat().st_size == 2000
+
+def _limit_free_space(processor: ArchiveProcessor, free: int) -> list:
+    """Pretend filesystems have ``free`` bytes; return the reserved totals seen."""
+    governor = processor.space_governor
+    governor.available = lambda path: free
+    seen = []
+    try_reserve = governor.try_reserve
+
+    def recording_try_reserve(path, size):
+        reserved = try_reserve(path, size)
+        seen.append(sum(governor._reserved.values()))
+        return reserved
+
+    governor.try_reserve = recording_try_reserve
+    return seen
+
+def test_space_admission_fails_archive_that_cannot_fit_alone(tmp_path):
+    with zipfile.ZipFile(tmp_path / "huge.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("huge/data.bin", b"\0" * 200_000)
+    with zipfile.ZipFile(tmp_path / "small.zip", "w") as archive:
+        archive.writestr("small/data.bin", b"x" * 1000)
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False))
+    _limit_free_space(processor, 100_000)
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert stats["failed_extractions"] == 1
+    assert not (tmp_path / "huge").exists()
+    assert (tmp_path / "huge.zip").exists()
+    assert (tmp_path / "small" / "data.bin").exists()
+    assert not any(processor.space_governor._reserved.values())
+
+def test_space_admission_defers_archives_until_space_is_released(tmp_path):
+    for i in range(6):
+        with zipfile.ZipFile(tmp_path / f"part{i}.zip", "w") as archive:
+            archive.writestr(f"part{i}/data.bin", b"x" * 40_000)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, parallel_processing=True, max_workers=4, failure_cache=False
+    ))
+    # Room for two archives at a time although four workers are free
+    seen = _limit_free_space(processor, 100_000)
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 6
+    assert stats["failed_extractions"] == 0
+    assert max(seen) <= 80_000
+    # Some archives were refused at first and admitted later
+    assert len(seen) > 6
+    assert not any(processor.space_governor._reserved.values())
+
+def _make_corrupt_zip(path: Path) -> None:
+    """Write a zip whose second member fails its CRC check."""
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("out/first.txt", b"a" * 1000)
+        archive.writestr("out/second.txt", b"b" * 1000)
+    data = bytearray(path.read_bytes())
+    offset = data.rindex(b"b" * 1000)
+    data[offset:offset + 10] = b"c" * 10
+    path.write_bytes(bytes(data))
+
+def test_failed_atomic_extraction_leaves_nothing_behind(tmp_path):
+    _make_corrupt_zip(tmp_path / "broken.zip")
+    for resume in (False, True):
+        processor = ArchiveProcessor(ArchiveConfig(
+            base_dir=tmp_path,
+            verify_integrity=False,
+            resumable_extraction=resume,
+            failure_cache=False,
+        ))
+
+        stats = processor.process_directory()
+
+        assert stats["failed_extractions"] == 1
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["broken.zip"]
+
+def test_atomic_extraction_is_renamed_into_place(tmp_path):
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "kept.txt").write_text("kept")
+    with zipfile.ZipFile(tmp_path / "good.zip", "w") as archive:
+        archive.writestr("out/new.txt", "new")
+        archive.writestr("top.txt", "top")
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert (tmp_path / "out" / "new.txt").read_text() == "new"
+    assert (tmp_path / "out" / "kept.txt").read_text() == "kept"
+    assert (tmp_path / "top.txt").read_text() == "top"
+    assert not (tmp_path / ".archiver-staging").exists()
+
+def test_stale_staging_of_crashed_runs_is_cleaned_up(tmp_path):
+    import socket
+
+    finished = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    root = tmp_path / ".archiver-staging"
+    host = socket.gethostname()
+    crashed = root / f"{host}-{finished.pid}-0123456789ab"
+    live = root / f"{host}-{os.getpid()}-0123456789ab"
+    remote = root / f"elsewhere-{finished.pid}-0123456789ab"
+    for staging in (crashed, live, remote):
+        (staging / "out").mkdir(parents=True)
+        (staging / "out" / "partial.txt").write_text("partial")
+    _make_zips(tmp_path, 1)
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert not crashed.exists()
+    assert live.exists() and remote.exists()
+    assert not (tmp_path / "out" / "partial.txt").exists()
+
+def test_scan_skips_archives_that_cannot_be_stat(tmp_path):
+    _make_zips(tmp_path, 1)
+    (tmp_path / "gone.zip").symlink_to(tmp_path / "missing.zip")
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert stats["failed_extractions"] == 0
+
+def _queue(policy: str, *jobs, starvation_limit: int = 100):
+    from archiver.utils.scheduling import ArchiveJob, WorkQueue, create_policy
+
+    queue = WorkQueue(create_policy(policy), starvation_limit)
+    for name, size, mtime, fmt in jobs:
+        queue.push(ArchiveJob(path=Path(name), size=size, mtime=mtime, format=fmt))
+    return queue
+
+ORDERING_JOBS = [
+    ("a.zip", 300, 10.0, "zip"),
+    ("b.7z", 100, 30.0, "7z"),
+    ("c.zip", 200, 20.0, "zip"),
+]
+
+def test_ordering_policies():
+    def order(policy):
+        return [job.name for job in _queue(policy, *ORDERING_JOBS)]
+
+    assert order("fifo") == ["a.zip", "b.7z", "c.zip"]
+    assert order("smallest") == ["b.7z", "c.zip", "a.zip"]
+    assert order("newest") == ["b.7z", "c.zip", "a.zip"]
+
+def test_shortest_time_policy_learns_throughput_per_format():
+    from archiver.utils.scheduling import ArchiveJob
+
+    queue = _queue("shortest-time", *ORDERING_JOBS)
+    # Without measurements the smallest archive goes first
+    first = queue.pop()
+    assert first.name == "b.7z"
+    # 7z turned out ten times slower per byte than zip
+    queue.record(first, 10.0)
+    done = queue.pop()
+    assert done.name == "c.zip"
+    queue.record(done, 2.0)
+    queue.push(ArchiveJob(path=Path("d.7z"), size=50, mtime=0.0, format="7z"))
+
+    # 50 bytes of 7z take 5s, 300 bytes of zip take 3s
+    assert [job.name for job in queue] == ["a.zip", "d.7z"]
+
+def test_starving_archive_goes_first_after_starvation_limit():
+    jobs = [("big.zip", 10_000, 0.0, "zip")] + [
+        (f"small{i}.zip", i + 1, 0.0, "zip") for i in range(5)
+    ]
+    queue = _queue("smallest", *jobs, starvation_limit=3)
+
+    assert [job.name for job in queue] == [
+        "small0.zip", "small1.zip", "small2.zip", "big.zip", "small3.zip", "small4.zip"
+    ]
+
+def test_jobs_can_be_taken_while_iterating_candidates():
+    jobs = [(f"job{i}.zip", 100 - i, 0.0, "zip") for i in range(100)]
+    queue = _queue("smallest", *jobs, starvation_limit=10)
+
+    taken = []
+    for job in queue.candidates():
+        if len(taken) < 10 and int(job.name[3:-4]) % 2:
+            taken.append(queue.take(job).name)
+
+    assert taken == [f"job{i}.zip" for i in range(99, 79, -2)]
+    assert len(queue) == 90
+    # Ten dispatches later the oldest jobs starve and go first, oldest first
+    order = [job.name for job in queue]
+    assert order[:3] == ["job0.zip", "job1.zip", "job2.zip"]
+    assert sorted(order) == sorted(
+        name for name, _, _, _ in jobs if name not in taken
+    )
+
+def test_directory_is_processed_in_policy_order(tmp_path):
+    for i, size in enumerate((3000, 1000, 2000)):
+        with zipfile.ZipFile(tmp_path / f"archive{i}.zip", "w") as archive:
+            archive.writestr(f"out{i}/data.bin", os.urandom(size))
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, schedule_policy="smallest", failure_cache=False
+    ))
+
+    order = [job.name for job in processor.iter_directory()]
+
+    assert order == ["archive1.zip", "archive2.zip", "archive0.zip"]
+
+def _start_daemon(tmp_path: Path):
+    import threading
+    from archiver.daemon import ArchiveDaemon, send_request
+
+    socket_path = tmp_path / "archiver.sock"
+    daemon = ArchiveDaemon(
+        ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False)), socket_path
+    )
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(500):
+        try:
+            send_request({"op": "ping"}, socket_path, timeout=1)
+            break
+        except ConnectionError:
+            time.sleep(0.01)
+    return daemon, thread
+
+def test_daemon_socket_round_trip(tmp_path):
+    from archiver.daemon import send_request
+
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_zips(share, 2)
+    daemon, thread = _start_daemon(tmp_path)
+    socket_path = daemon.socket_path
+
+    assert send_request({"op": "ping"}, socket_path) == {"ok": True}
+
+    response = send_request(
+        {"op": "extract", "path": str(share / "archive01.zip"), "wait": True}, socket_path
+    )
+    assert response["ok"]
+    assert response["job"]["status"] == "done"
+    assert response["job"]["result"] == {"archives": 1, "successful": 1, "failed": 0}
+    assert (share / "out01" / "data.txt").stat().st_size == 1000
+
+    response = send_request({"op": "extract", "path": str(share), "wait": True}, socket_path)
+    assert response["job"]["result"]["successful"] == 2
+    assert (share / "out00" / "data.txt").exists()
+
+    status = send_request({"op": "status", "job": response["job"]["id"]}, socket_path)
+    assert status == {"ok": True, "job": response["job"]}
+    assert not send_request({"op": "status", "job": 999}, socket_path)["ok"]
+    assert not send_request({"op": "extract", "path": str(tmp_path / "nope")}, socket_path)["ok"]
+    assert not send_request({"op": "bogus"}, socket_path)["ok"]
+
+    assert send_request({"op": "shutdown"}, socket_path) == {"ok": True}
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+
+def test_daemon_socket_falls_back_to_a_private_directory(tmp_path, monkeypatch):
+    import stat
+    import tempfile
+    from archiver.daemon import ArchiveDaemon, default_socket_path
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    runtime_dir = tmp_path / f"archiver-{os.getuid()}"
+    assert default_socket_path() == runtime_dir / "archiver.sock"
+
+    daemon = ArchiveDaemon(ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False)))
+    try:
+        sock = daemon._bind()
+        sock.close()
+        assert stat.S_IMODE(runtime_dir.stat().st_mode) == 0o700
+        assert stat.S_IMODE((runtime_dir / "archiver.sock").stat().st_mode) == 0o600
+
+        # A directory others can enter may have been planted by them
+        runtime_dir.chmod(0o755)
+        with pytest.raises(RuntimeError, match="not a directory private"):
+            daemon._bind()
+    finally:
+        daemon.executor.shutdown()
+
+def test_daemon_refuses_to_replace_a_live_daemon(tmp_path):
+    import socket
+    import pytest
+    from archiver.daemon import ArchiveDaemon, send_request
+
+    daemon, thread = _start_daemon(tmp_path)
+    rival = ArchiveDaemon(
+        ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False)), daemon.socket_path
+    )
+    try:
+        with pytest.raises(RuntimeError, match="already running"):
+            rival._bind()
+        assert send_request({"op": "ping"}, daemon.socket_path) == {"ok": True}
+    finally:
+        rival.executor.shutdown()
+        daemon.shutdown()
+        thread.join(timeout=30)
+
+    # A socket file nobody listens on is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(daemon.socket_path))
+    stale.close()
+    sock = rival._bind()
+    sock.close()
+
+def _make_mixed_tree(share: Path) -> None:
+    import io
+    import tarfile
+
+    (share / "nested").mkdir(parents=True)
+    _make_zips(share, 3)
+    _make_corrupt_zip(share / "nested" / "broken.zip")
+    with tarfile.open(share / "nested" / "bundle.tar.gz", "w:gz") as archive:
+        info = tarfile.TarInfo("bundle/readme.txt")
+        info.size = 6
+        archive.addfile(info, io.BytesIO(b"readme"))
+
+def _comparable(share: Path, results) -> list:
+    return sorted(
+        (
+            r.path.relative_to(share).as_posix(),
+            r.outcome,
+            r.bytes,
+            sorted(p.relative_to(share).as_posix() for p in r.outputs),
+        )
+        for r in results
+    )
+
+def test_async_results_match_synchronous_processing(tmp_path):
+    import asyncio
+
+    def config(share):
+        return ArchiveConfig(
+            base_dir=share, max_workers=1, verify_integrity=False, failure_cache=False
+        )
+
+    sync_share, async_share = tmp_path / "sync", tmp_path / "async"
+    _make_mixed_tree(sync_share)
+    _make_mixed_tree(async_share)
+
+    processor = ArchiveProcessor(config(sync_share))
+    expected = [processor._result(job) for job in processor.iter_directory()]
+
+    async def consume():
+        processor = ArchiveProcessor(config(async_share))
+        results = []
+        async for result in processor.aprocess_directory(max_pending=1):
+            results.append(result)
+        return results
+
+    results = asyncio.run(consume())
+
+    assert len(results) == 5
+    assert _comparable(async_share, results) == _comparable(sync_share, expected)
+    assert [r.outcome for r in results].count("failed") == 1
+    assert sorted(p.relative_to(async_share) for p in async_share.rglob("*")) == sorted(
+        p.relative_to(sync_share) for p in sync_share.rglob("*")
+    )
+
+def test_async_extractors_run_on_the_processor_pool_with_a_journal(tmp_path):
+    import asyncio
+    from archiver.extractors.base import BaseExtractor
+
+    seen = {}
+
+    class EventLoopExtractor(BaseExtractor):
+        @property
+        def supported_extensions(self):
+            return (".evt",)
+
+        def extract(self, archive_path, target_dir=None, journal=None):
+            raise AssertionError("the async path must use aextract")
+
+        async def aextract(self, archive_path, target_dir=None, journal=None, executor=None):
+            loop = asyncio.get_running_loop()
+            seen["thread"] = await loop.run_in_executor(
+                executor, lambda: threading.current_thread().name
+            )
+            seen["journal"] = journal
+            (target_dir / "out").mkdir()
+            (target_dir / "out" / "data.txt").write_text(archive_path.read_text())
+            self.stats.successful_extractions += 1
+            return True
+
+    (tmp_path / "one.evt").write_text("payload")
+    processor = ArchiveProcessor(
+        ArchiveConfig(base_dir=tmp_path, verify_integrity=False),
+        extractors=[EventLoopExtractor]
+    )
+
+    async def consume():
+        return [result async for result in processor.aprocess_directory()]
+
+    results = asyncio.run(consume())
+
+    assert [r.outcome for r in results] == ["extracted"]
+    assert (tmp_path / "out" / "data.txt").read_text() == "payload"
+    assert seen["thread"].startswith("archiver")
+    assert seen["journal"] is not None
+
+def test_index_directory_lists_only_new_and_changed_archives(tmp_path):
+    from archiver.utils.content_index import ContentIndex
+
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_zips(share, 3)
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=share, failure_cache=False))
+
+    with ContentIndex(tmp_path / "index.db") as index:
+        first = processor.index_directory(index)
+        second = processor.index_directory(index)
+
+        with zipfile.ZipFile(share / "archive01.zip", "w") as archive:
+            archive.writestr("renamed/movie.mkv", "x" * 10)
+        os.utime(share / "archive01.zip", ns=(1_000_000_000, 1_000_000_000))
+        (share / "archive02.zip").unlink()
+        third = processor.index_directory(index)
+
+        assert first["archives_indexed"] == 3
+        assert second == {
+            "archives_indexed": 0, "archives_unchanged": 3, "archives_removed": 0, "index_errors": 0
+        }
+        assert third == {
+            "archives_indexed": 1, "archives_unchanged": 1, "archives_removed": 1, "index_errors": 0
+        }
+        assert [path.name for path, *_ in index.archives()] == ["archive00.zip", "archive01.zip"]
+        assert [m.name for m in index.members(share / "archive01.zip")] == ["renamed/movie.mkv"]
+        assert index.search("out02") == []
+
+def test_full_text_and_like_search_find_the_same_members(tmp_path):
+    from archiver.utils.content_index import ContentIndex
+    from archiver.extractors.base import ArchiveMember
+
+    names = [
+        "Big.Buck.Bunny.1080p.mkv",
+        "Big.Buck.Bunny.720p.mkv",
+        "Sintel/sintel-1080p.mkv",
+        "Docs/README.txt",
+        "docs/readme-old.txt",
+    ]
+    with ContentIndex(tmp_path / "index.db") as index:
+        assert index.full_text
+        index.update(tmp_path / "a.zip", 1, 1, [ArchiveMember(n, 10) for n in names[:3]])
+        index.update(tmp_path / "b.zip", 1, 1, [ArchiveMember(n, 10) for n in names[3:]])
+
+        for query in ("big buck", "1080p", "readme", "docs txt", "sintel 1080", "nothing"):
+            full_text = index.search(query)
+            index.full_text = False
+            like = index.search(query)
+            index.full_text = True
+            assert full_text == like, query
+        assert [m.name for _, m in index.search("1080p")] == [names[0], names[2]]
+        assert len(index.search("mkv", limit=2)) == 2
+
+# Members of the random access tests: small ones, and one too large for a
+# 1 MiB member cache
+OPEN_MEMBERS = {f"dir/member{i:02}.txt": f"member {i}\n".encode() * (i * 50 + 1) for i in range(20)}
+OPEN_MEMBERS["dir/large.bin"] = bytes(range(256)) * 2048
+
+def _write_open_archive(path: Path, members: dict) -> None:
+    import io
+    import tarfile
+    import py7zr
+
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+    elif path.suffix == ".7z":
+        with py7zr.SevenZipFile(path, "w") as archive:
+            for name, data in members.items():
+                archive.writestr(data, name)
+    else:
+        with tarfile.open(path, "w:gz" if path.name.endswith(".gz") else "w") as archive:
+            dir_info = tarfile.TarInfo("dir")
+            dir_info.type = tarfile.DIRTYPE
+            archive.addfile(dir_info)
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+def test_open_member_reads_single_members_per_format(tmp_path):
+    import pytest
+
+    for name in ("members.tar", "members.tar.gz", "members.zip", "members.7z"):
+        archive_path = tmp_path / name
+        _write_open_archive(archive_path, OPEN_MEMBERS)
+        processor = ArchiveProcessor(ArchiveConfig(
+            base_dir=tmp_path, member_cache_size=1024 * 1024, failure_cache=False
+        ))
+        cache = processor.member_cache
+
+        # Backwards, so that tar.gz reads resume from seek points
+        for member, data in reversed(OPEN_MEMBERS.items()):
+            with processor.open_member(archive_path, member) as f:
+                assert f.read() == data, (name, member)
+        assert cache.hits + cache.misses > 0
+
+        hits = cache.hits
+        with processor.open_member(archive_path, "dir/member05.txt") as f:
+            assert f.read() == OPEN_MEMBERS["dir/member05.txt"]
+        assert cache.hits == hits + 1, name
+        with processor.open_member(archive_path, "dir/large.bin") as f:
+            assert f.read() == OPEN_MEMBERS["dir/large.bin"]
+        assert cache.hits == hits + 1, name
+
+        for missing in ("dir/missing.txt", "dir"):
+            with pytest.raises(KeyError):
+                processor.open_member(archive_path, missing)
+        assert not (tmp_path / "dir").exists()
+
+def test_zip_open_member_closes_archive_on_error(tmp_path, monkeypatch):
+    from archiver.extractors.zip import ZipExtractor
+    from archiver.utils.passwords import PasswordNotFound
+
+    with zipfile.ZipFile(tmp_path / "data.zip", "w") as archive:
+        archive.writestr("data.txt", "data")
+    opened = []
+
+    class RecordingZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            opened.append(self)
+
+    monkeypatch.setattr(zipfile, "ZipFile", RecordingZipFile)
+    extractor = ZipExtractor(tmp_path)
+
+    with pytest.raises(KeyError):
+        extractor.open_member(tmp_path / "data.zip", "missing.txt")
+
+    def no_password(archive_path):
+        raise PasswordNotFound(f"{archive_path} is encrypted")
+
+    monkeypatch.setattr(extractor, "find_password", no_password)
+    with pytest.raises(PasswordNotFound):
+        extractor.open_member(tmp_path / "data.zip", "data.txt")
+
+    assert opened
+    assert all(zip_ref.fp is None for zip_ref in opened)
+
+def test_open_member_resumes_gzip_at_seek_points(tmp_path, monkeypatch):
+    import functools
+    import archiver.extractors.tar
+    from archiver.extractors.tar import TarExtractor
+    from archiver.utils.random_access import GzipSeekIndex
+
+    # Seek points every 64 KiB of output instead of every 16 MiB
+    monkeypatch.setattr(
+        archiver.extractors.tar, "GzipSeekIndex", functools.partial(GzipSeekIndex, span=64 * 1024)
+    )
+    members = {f"part{i:02}.txt": os.urandom(100_000).hex().encode() for i in range(12)}
+    archive_path = tmp_path / "big.tar.gz"
+    _write_open_archive(archive_path, members)
+    extractor = TarExtractor(tmp_path)
+
+    for member in ("part11.txt", "part00.txt", "part06.txt", "part07.txt"):
+        with extractor.open_member(archive_path, member) as f:
+            assert f.read() == members[member]
+
+    index = extractor._tar_index(archive_path)
+    assert len(index.gzip_index.checkpoints) > 10
+
+def _write_resume_archive(path: Path, count: int) -> None:
+    import io
+    import tarfile
+
+    members = {f"out/part{i:04}.bin": os.urandom(8192) for i in range(count)}
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+    else:
+        with tarfile.open(path, "w:gz") as archive:
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+def _staging_journal(directory: Path, archive_name: str) -> Path:
+    from archiver.utils.staging import StagingArea
+
+    staging = StagingArea(directory, directory / archive_name)
+    return staging.path.with_name(staging.path.name + ".journal")
+
+@pytest.mark.parametrize("name", ["resume.zip", "resume.tar.gz"])
+def test_killed_extraction_resumes_from_journal(tmp_path, name):
+    share, reference = tmp_path / "share", tmp_path / "reference"
+    share.mkdir()
+    # Fewer members than a metadata batch, so only the journal cadence records them
+    _write_resume_archive(share / name, 400)
+    reference.mkdir()
+    (reference / name).write_bytes((share / name).read_bytes())
+    journal = _staging_journal(share, name)
+
+    # Extract slowly in another process and kill it once members are journaled
+    process = subprocess.Popen(
+        [sys.executable, "-c", textwrap.dedent(f"""
+            from pathlib import Path
+            from archiver.core import ArchiveProcessor
+            from archiver.utils.config import ArchiveConfig
+
+            share = Path({str(share)!r})
+            ArchiveProcessor(ArchiveConfig(
+                base_dir=share, max_write_rate=1024 * 1024, failure_cache=False
+            )).process_archive(share / {name!r})
+        """)],
+        env=_python_env(),
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while '"file"' not in (journal.read_text() if journal.exists() else ""):
+            assert process.poll() is None, "extraction finished before it could be killed"
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        process.kill()
+        process.wait()
+
+    staged = journal.with_name(journal.name[:-len(".journal")])
+    journaled = {
+        json.loads(line)["file"] for line in journal.read_text().splitlines()
+        if '"file"' in line
+    }
+    inodes = {n: (staged / n).stat().st_ino for n in journaled}
+    assert 0 < len(journaled) < 400
+    assert not (share / "out").exists()
+
+    assert ArchiveProcessor(ArchiveConfig(base_dir=share, failure_cache=False)).process_archive(
+        share / name
+    ).success
+    assert ArchiveProcessor(ArchiveConfig(base_dir=reference, failure_cache=False)).process_archive(
+        reference / name
+    ).success
+
+    # Journaled members were kept, not written again
+    assert {n: (share / n).stat().st_ino for n in journaled} == inodes
+    assert sorted(p.name for p in (share / "out").iterdir()) == sorted(
+        p.name for p in (reference / "out").iterdir()
+    )
+    for path in (reference / "out").iterdir():
+        assert (share / "out" / path.name).read_bytes() == path.read_bytes()
+    assert not (share / ".archiver-staging").exists()
+
+def test_changed_archive_resets_the_journal(tmp_path):
+    import zlib
+    from archiver.utils.staging import StagingArea
+
+    with zipfile.ZipFile(tmp_path / "data.zip", "w") as archive:
+        archive.writestr("out/data.txt", "old content")
+    # An interrupted extraction of the old archive
+    staging = StagingArea(tmp_path, tmp_path / "data.zip")
+    staging.create()
+    staged = staging.path / "out" / "data.txt"
+    staged.parent.mkdir()
+    staged.write_text("old content")
+    # Recorded with the size and CRC of the new member, so only the archive
+    # identity tells the entry is stale
+    staging.journal.record_file(
+        "out/data.txt", staged.stat().st_size, zlib.crc32(b"new content"), staged.stat().st_mtime_ns
+    )
+    staging.release()
+
+    # Replaced by an archive with a member of the same name and size
+    with zipfile.ZipFile(tmp_path / "data.zip", "w") as archive:
+        archive.writestr("out/data.txt", "new content")
+    os.utime(tmp_path / "data.zip", ns=(1_000_000_000, 1_000_000_000))
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, failure_cache=False))
+
+    assert processor.process_archive(tmp_path / "data.zip").success
+    assert (tmp_path / "out" / "data.txt").read_text() == "new content"
+    assert not (tmp_path / ".archiver-staging").exists()
+
+@pytest.mark.parametrize("rollback_fails", [False, True])
+def test_failed_commit_is_rolled_back(tmp_path, monkeypatch, caplog, rollback_fails):
+    from archiver.utils.staging import REPLACED_DIR_NAME, StagingArea
+
+    (tmp_path / "out").mkdir()
+    (tmp_path / "out" / "keep.txt").write_text("old")
+    (tmp_path / "out" / "replaced.txt").write_text("old")
+    staging = StagingArea(tmp_path)
+    staging.create()
+    (staging.path / "out").mkdir()
+    staged = {"out/replaced.txt": "new", "out/new.txt": "new", "extra.txt": "new"}
+    for name, text in staged.items():
+        (staging.path / name).write_text(text)
+
+    real_replace = os.replace
+    commits, rollbacks = [], []
+
+    def failing_replace(src, dst):
+        src, dst = Path(src), Path(dst)
+        if src.is_relative_to(staging.path) and not dst.is_relative_to(staging.path):
+            if REPLACED_DIR_NAME not in src.parts:
+                commits.append(dst)
+                if len(commits) == 3:
+                    raise OSError("injected commit failure")
+        elif dst.is_relative_to(staging.path):
+            rollbacks.append(src)
+            if rollback_fails and len(rollbacks) == 2:
+                raise OSError("injected rollback failure")
+        return real_replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    with pytest.raises(OSError, match="injected commit failure"):
+        staging.commit()
+    monkeypatch.setattr(os, "replace", real_replace)
+    staging.discard()
+
+    assert (tmp_path / "out" / "keep.txt").read_text() == "old"
+    if not rollback_fails:
+        assert (tmp_path / "out" / "replaced.txt").read_text() == "old"
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["out"]
+        assert sorted(p.name for p in (tmp_path / "out").iterdir()) == ["keep.txt", "replaced.txt"]
+        return
+    # The newest commit was moved back, the oldest one is logged and the
+    # staging directory kept
+    assert staging.rollback_failed
+    assert str(commits[0]) in caplog.text
+    assert commits[0].read_text() == "new"
+    if commits[1].name == "replaced.txt":
+        assert commits[1].read_text() == "old"
+    else:
+        assert not commits[1].exists()
+    for name, text in staged.items():
+        if tmp_path / name != commits[0]:
+            assert (staging.path / name).read_text() == text
+
+def _failure_cache_processor(share: Path, **settings) -> ArchiveProcessor:
+    return ArchiveProcessor(ArchiveConfig(
+        base_dir=share,
+        failure_cache=True,
+        failure_cache_file=share.parent / "failures.json",
+        **settings
+    ))
+
+def test_unchanged_failed_archive_is_skipped_until_it_changes(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_corrupt_zip(share / "broken.zip")
+
+    first = _failure_cache_processor(share).process_directory()
+    second = _failure_cache_processor(share).process_directory()
+
+    assert first["failed_extractions"] == 1
+    assert second["failed_extractions"] == 0
+    assert second["known_bad_archives"] == 1
+
+    with zipfile.ZipFile(share / "broken.zip", "w") as archive:
+        archive.writestr("out/fixed.txt", b"fixed")
+    third = _failure_cache_processor(share).process_directory()
+
+    assert third["successful_extractions"] == 1
+    assert third["known_bad_archives"] == 0
+    assert (share / "out" / "fixed.txt").read_bytes() == b"fixed"
+    assert json.loads((tmp_path / "failures.json").read_text()) == {}
+
+def test_failure_backoff_doubles_up_to_the_limit(tmp_path, monkeypatch):
+    from archiver.utils.failure_cache import FailureCache
+
+    _make_corrupt_zip(tmp_path / "broken.zip")
+    st = (tmp_path / "broken.zip").stat()
+    cache = FailureCache(backoff=10, max_backoff=25)
+    now = [1000.0]
+    monkeypatch.setattr("archiver.utils.failure_cache.time.time", lambda: now[0])
+
+    delays = []
+    for _ in range(3):
+        record = cache.record_failure(tmp_path / "broken.zip", "corrupt")
+        delays.append(record.next_retry - record.last_failure)
+
+    assert delays == [10, 20, 25]
+    now[0] += 24
+    assert cache.lookup(st) is not None
+    now[0] += 1
+    assert cache.lookup(st) is None
+
+def test_archive_is_quarantined_after_repeated_failures(tmp_path):
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_corrupt_zip(share / "broken.zip")
+    quarantine = tmp_path / "quarantine"
+
+    for _ in range(2):
+        _failure_cache_processor(
+            share, failure_backoff=0, quarantine_dir=quarantine, quarantine_after=2
+        ).process_directory()
+
+    assert not (share / "broken.zip").exists()
+    assert (quarantine / "broken.zip").is_file()
+    assert "Bad CRC-32" in (quarantine / "broken.zip.reason").read_text()
+
+def test_transient_errors_are_not_cached(tmp_path, monkeypatch):
+    import errno
+    from archiver.extractors.writer import ExtractionWriter
+
+    share = tmp_path / "share"
+    share.mkdir()
+    _make_zips(share, 2)
+
+    def out_of_space(self, *args, **kwargs):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(ExtractionWriter, "write_member", out_of_space)
+        first = _failure_cache_processor(share).process_directory()
+    second = _failure_cache_processor(share).process_directory()
+
+    assert first["failed_extractions"] == 2
+    assert second["known_bad_archives"] == 0
+    assert second["successful_extractions"] == 2
+
+def test_sequential_run_leaves_caller_priority_alone(tmp_path):
+    _make_zips(tmp_path, 2)
+    tid = threading.get_native_id()
+    before = os.getpriority(os.PRIO_PROCESS, tid)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, parallel_processing=False, nice=min(before + 5, 19)
+    ))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 2
+    assert os.getpriority(os.PRIO_PROCESS, tid) == before
+
+def _write_durability_archive(path: Path) -> dict:
+    members = {f"out/{d}/file{i}.txt": f"{d}{i}".encode() * 100 for d in "ab" for i in range(3)}
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return members
+
+def _record_syncs(monkeypatch) -> dict:
+    import archiver.utils.durability as durability
+
+    synced = {"files": [], "dirs": [], "filesystems": [], "fsyncs": 0}
+    real_fsync_path, real_fsync = durability.fsync_path, os.fsync
+
+    def fsync_path(path, directory=False):
+        synced["dirs" if directory else "files"].append(Path(path))
+        real_fsync_path(path, directory)
+
+    def fsync(fd):
+        synced["fsyncs"] += 1
+        real_fsync(fd)
+
+    def syncfs(path):
+        synced["filesystems"].append(Path(path))
+
+    monkeypatch.setattr(durability, "fsync_path", fsync_path)
+    monkeypatch.setattr(os, "fsync", fsync)
+    monkeypatch.setattr(durability, "syncfs", syncfs)
+    return synced
+
+@pytest.mark.parametrize("mode", ["none", "archive", "directory", "file"])
+@pytest.mark.parametrize("atomic", [False, True])
+def test_every_durability_mode_extracts_correctly(tmp_path, monkeypatch, mode, atomic):
+    members = _write_durability_archive(tmp_path / "archive.zip")
+    synced = _record_syncs(monkeypatch)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, durability=mode, atomic_extraction=atomic
+    ))
+
+    stats = processor.process_directory()
+    processor.close()
+
+    assert stats["successful_extractions"] == 1
+    for name, data in members.items():
+        assert (tmp_path / name).read_bytes() == data
+    assert bool(synced["filesystems"]) == (mode == "archive")
+    if mode in ("directory", "file"):
+        assert synced["fsyncs"] >= len(members)
+    else:
+        assert synced["fsyncs"] == 0
+
+@pytest.mark.parametrize("atomic", [False, True])
+def test_directory_durability_fsyncs_changed_directories(tmp_path, monkeypatch, atomic):
+    members = _write_durability_archive(tmp_path / "archive.zip")
+    synced = _record_syncs(monkeypatch)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, durability="directory", atomic_extraction=atomic
+    ))
+
+    processor.process_directory()
+    processor.close()
+
+    assert sorted(p.name for p in synced["files"]) == sorted(Path(n).name for n in members)
+    if atomic:
+        # Members were flushed in staging; the rename into place changed the target
+        assert tmp_path in synced["dirs"]
+    else:
+        assert {tmp_path / "out" / "a", tmp_path / "out" / "b"} <= set(synced["dirs"])
+
+def _write_ratio_archive(path: Path, size: int) -> None:
+    """Write a zip or tar.gz of a small text member and a run of zeros."""
+    import io
+    import tarfile
+
+    members = {"out/first.txt": b"first", "out/zeros.bin": bytes(size)}
+    if path.suffix == ".zip":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        return
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+@pytest.mark.parametrize("name", ["bomb.zip", "bomb.tar.gz"])
+def test_archive_over_the_compression_ratio_leaves_no_output(tmp_path, name):
+    from archiver.utils.limits import RATIO_FLOOR
+
+    _write_ratio_archive(tmp_path / name, 2 * RATIO_FLOOR)
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, max_compression_ratio=100))
+
+    stats = processor.process_directory()
+
+    assert stats["failed_extractions"] == 1
+    assert not (tmp_path / "out").exists()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [name]
+
+def test_compression_ratio_is_limited_by_default(tmp_path):
+    from archiver.utils.limits import RATIO_FLOOR, ExtractionLimits
+
+    limits = ExtractionLimits.from_config(ArchiveConfig(base_dir=tmp_path))
+
+    assert limits.active
+    assert limits.ratio_limit(1 << 20) == 1000 << 20
+    assert limits.ratio_limit(1024) == RATIO_FLOOR
+
+@pytest.mark.parametrize("name", ["small.zip", "small.tar.gz"])
+def test_compressible_archive_below_the_ratio_floor_passes(tmp_path, name):
+    from archiver.utils.limits import RATIO_FLOOR
+
+    _write_ratio_archive(tmp_path / name, RATIO_FLOOR // 2)
+    assert (tmp_path / name).stat().st_size * 100 < RATIO_FLOOR // 2
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, max_compression_ratio=100))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 1
+    assert (tmp_path / "out" / "zeros.bin").stat().st_size == RATIO_FLOOR // 2
+
+def test_multi_member_gzip_has_no_declared_size(tmp_path):
+    import gzip
+    from archiver.extractors.tar import TarExtractor
+
+    _write_ratio_archive(tmp_path / "single.tar.gz", 1 << 20)
+    tar_data = gzip.decompress((tmp_path / "single.tar.gz").read_bytes())
+    middle = len(tar_data) // 2
+    (tmp_path / "multi.tar.gz").write_bytes(
+        gzip.compress(tar_data[:middle]) + gzip.compress(tar_data[middle:])
+    )
+    extractor = TarExtractor(tmp_path)
+
+    assert extractor.declared_size(tmp_path / "single.tar.gz") == len(tar_data)
+    assert extractor.declared_size(tmp_path / "multi.tar.gz") is None
+
+def test_gzip_over_the_scan_limit_is_not_read(tmp_path, monkeypatch):
+    from archiver.extractors import tar
+    from archiver.extractors.tar import TarExtractor
+
+    _write_ratio_archive(tmp_path / "large.tar.gz", 1 << 20)
+    monkeypatch.setattr(tar, "GZIP_SCAN_LIMIT", (tmp_path / "large.tar.gz").stat().st_size - 1)
+    monkeypatch.setattr(
+        TarExtractor, "_is_single_gzip_member",
+        lambda self, path: pytest.fail("scanned a gzip file over the limit")
+    )
+
+    assert TarExtractor(tmp_path).declared_size(tmp_path / "large.tar.gz") is None
+
+def _zipcrypto_keys(password: bytes) -> list:
+    import zlib
+
+    def update(keys, byte):
+        keys[0] = zlib.crc32(bytes([byte]), keys[0] ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+        keys[1] = ((keys[1] + (keys[0] & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        keys[2] = zlib.crc32(bytes([keys[1] >> 24]), keys[2] ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+    keys = [0x12345678, 0x23456789, 0x34567890]
+    for byte in password:
+        update(keys, byte)
+    return keys, update
+
+def _zipcrypto_encrypt(password: bytes, data: bytes) -> bytes:
+    """Encrypt data with traditional PKWARE encryption."""
+    keys, update = _zipcrypto_keys(password)
+    out = bytearray()
+    for byte in data:
+        temp = (keys[2] | 2) & 0xFFFF
+        out.append(byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF))
+        update(keys, byte)
+    return bytes(out)
+
+def _zipcrypto_check_byte(password: bytes, header: bytes) -> int:
+    """Return the last byte of an encryption header as decrypted with a password."""
+    keys, update = _zipcrypto_keys(password)
+    for byte in header:
+        temp = (keys[2] | 2) & 0xFFFF
+        plain = byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF)
+        update(keys, plain)
+    return plain
+
+def _write_encrypted_zip(path: Path, name: str, data: bytes, password: str) -> bytes:
+    """Write a zip with one deflated member encrypted with ZipCrypto.
+
+    Returns:
+        The encrypted 12 byte header, which is the same for every call
+    """
+    import struct
+    import zlib
+
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15)
+    compressed = compressor.compress(data) + compressor.flush()
+    crc = zlib.crc32(data)
+    payload = _zipcrypto_encrypt(
+        password.encode(), b"\x5a" * 11 + bytes([crc >> 24]) + compressed
+    )
+    raw_name = name.encode()
+    fields = struct.pack("<HHHHHIII", 20, 1, 8, 0, 0x21, crc, len(payload), len(data))
+    local = b"PK\x03\x04" + fields + struct.pack("<HH", len(raw_name), 0) + raw_name
+    central = (b"PK\x01\x02" + struct.pack("<H", 20) + fields
+               + struct.pack("<HHHHHII", len(raw_name), 0, 0, 0, 0, 0, 0) + raw_name)
+    end = b"PK\x05\x06" + struct.pack(
+        "<HHHHIIH", 0, 0, 1, 1, len(central), len(local) + len(payload), 0
+    )
+    path.write_bytes(local + payload + central + end)
+    return payload[:12]
+
+def _false_positive_password(header: bytes, right: str) -> str:
+    """Find a wrong password whose decrypted check byte matches the right one's."""
+    expected = _zipcrypto_check_byte(right.encode(), header)
+    return next(
+        candidate for candidate in (f"wrong{i}" for i in range(100_000))
+        if _zipcrypto_check_byte(candidate.encode(), header) == expected
+    )
+
+def test_zip_password_check_survives_false_positive_check_byte(tmp_path):
+    from archiver.extractors.zip import ZipExtractor
+
+    data = os.urandom(4096) + b"text" * 4096
+    header = _write_encrypted_zip(tmp_path / "secret.zip", "out/data.bin", data, "right")
+    wrong = _false_positive_password(header, "right")
+    extractor = ZipExtractor(
+        tmp_path, ArchiveConfig(base_dir=tmp_path, passwords=[wrong, "right"])
+    )
+
+    assert extractor.check_password(tmp_path / "secret.zip", wrong) is False
+    assert extractor.find_password(tmp_path / "secret.zip") == "right"
+
+    processor = ArchiveProcessor(ArchiveConfig(base_dir=tmp_path, passwords=[wrong, "right"]))
+    assert processor.process_directory()["successful_extractions"] == 1
+    assert (tmp_path / "out" / "data.bin").read_bytes() == data
+
+def test_rar_password_is_passed_on_stdin_not_argv(tmp_path, monkeypatch):
+    import asyncio
+    from archiver.extractors.rar import RarExtractor
+
+    log = tmp_path / "unrar.log"
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake_unrar = bin_dir / "unrar"
+    fake_unrar.write_text(textwrap.dedent(f"""\
+        #!{sys.executable}
+        import json, os, sys
+        answer = sys.stdin.read()
+        with open({str(log)!r}, "a") as f:
+            f.write(json.dumps({{"argv": sys.argv[1:], "stdin": answer, "sid": os.getsid(0)}}) + "\\n")
+        if answer != "right\\n":
+            sys.exit(11)
+        if sys.argv[1] == "lt":
+            print("Name: data.txt")
+            print("Type: File")
+            print("Size: 4")
+            print("Packed size: 4")
+            print("Flags: encrypted")
+    """))
+    fake_unrar.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    archive = tmp_path / "secret.rar"
+    archive.write_bytes(b"Rar!")
+    config = ArchiveConfig(base_dir=tmp_path, passwords=["wrong", "right"])
+
+    assert RarExtractor(tmp_path, config).extract(archive, tmp_path / "out")
+    assert asyncio.run(RarExtractor(tmp_path, config).aextract(archive, tmp_path / "out"))
+
+    calls = [json.loads(line) for line in log.read_text().splitlines()]
+    assert {call["argv"][0] for call in calls} == {"lt", "t", "x"}
+    for call in calls:
+        assert not any("right" in arg or "wrong" in arg for arg in call["argv"])
+        assert call["sid"] != os.getsid(0)
+        if "-p-" in call["argv"]:
+            assert call["stdin"] == ""
+        else:
+            assert "-p" in call["argv"]
+            assert call["stdin"] in ("right\n", "wrong\n")
+    assert [c["argv"][0] for c in calls if c["stdin"] == "right\n"].count("x") == 2
+
+def test_password_candidates_merge_list_and_file(tmp_path):
+    from archiver.utils.passwords import password_candidates
+
+    password_file = tmp_path / "passwords.txt"
+    password_file.write_text("from-file\r\n\nsecond\nfirst\n", encoding="utf-8")
+    config = ArchiveConfig(
+        base_dir=tmp_path, password="single", passwords=["first", "second"],
+        password_file=password_file
+    )
+
+    assert password_candidates(config) == ["single", "first", "second", "from-file"]
+
+def test_password_found_once_per_release(tmp_path, monkeypatch):
+    from archiver.extractors.zip import ZipExtractor
+
+    for name in ("release.part1.zip", "release.part2.zip"):
+        _write_encrypted_zip(tmp_path / name, f"out/{name}.txt", b"data" * 100, "right")
+    extractor = ZipExtractor(
+        tmp_path, ArchiveConfig(base_dir=tmp_path, passwords=["a", "b", "c", "right"])
+    )
+    checked = []
+    check_password = extractor.check_password
+
+    def counting_check(archive_path, password):
+        checked.append((archive_path.name, password))
+        return check_password(archive_path, password)
+
+    monkeypatch.setattr(extractor, "check_password", counting_check)
+
+    assert extractor.find_password(tmp_path / "release.part1.zip") == "right"
+    assert extractor.find_password(tmp_path / "release.part2.zip") == "right"
+    assert extractor.find_password(tmp_path / "release.part2.zip") == "right"
+    assert [c for c in checked if c[0] == "release.part2.zip"] == [("release.part2.zip", "right")]
+
+def test_archive_without_matching_password_fails(tmp_path):
+    from archiver.extractors.zip import ZipExtractor
+    from archiver.utils.passwords import PasswordNotFound
+
+    _write_encrypted_zip(tmp_path / "secret.zip", "out/data.txt", b"data" * 100, "right")
+    config = ArchiveConfig(base_dir=tmp_path, passwords=["wrong", "also-wrong"])
+
+    with pytest.raises(PasswordNotFound):
+        ZipExtractor(tmp_path, config).find_password(tmp_path / "secret.zip")
+    with pytest.raises(PasswordNotFound):
+        ZipExtractor(tmp_path, ArchiveConfig(base_dir=tmp_path)).find_password(
+            tmp_path / "secret.zip"
+        )
+
+    stats = ArchiveProcessor(config).process_directory()
+
+    assert stats["failed_extractions"] == 1
+    assert not (tmp_path / "out").exists()
+
+def _make_walk_tree(root: Path) -> None:
+    for i in range(4):
+        for j in range(3):
+            directory = root / f"d{i}" / f"sub{j}" / "deep"
+            directory.mkdir(parents=True)
+            (directory / "file.txt").write_text("x")
+            (directory.parent / f"file{j}.zip").write_text("x")
+    (root / "top.txt").write_text("x")
+    (root / "skip" / "inner").mkdir(parents=True)
+    (root / "skip" / "inner" / "hidden.zip").write_text("x")
+    (root / "link").symlink_to(root / "d0", target_is_directory=True)
+
+def _walk_set(walk) -> set:
+    return {(root, tuple(sorted(dirs)), tuple(sorted(files))) for root, dirs, files in walk}
+
+def test_parallel_walk_yields_the_same_entries_as_os_walk(tmp_path):
+    from archiver.utils.walker import parallel_walk
+
+    _make_walk_tree(tmp_path)
+
+    assert _walk_set(parallel_walk(tmp_path, workers=4)) == _walk_set(os.walk(tmp_path))
+
+def test_parallel_walk_honours_pruned_directories(tmp_path):
+    from archiver.utils.walker import parallel_walk
+
+    _make_walk_tree(tmp_path)
+    roots = []
+    for root, dirs, files in parallel_walk(tmp_path, workers=4):
+        roots.append(root)
+        dirs[:] = [d for d in dirs if d != "skip"]
+
+    assert str(tmp_path / "d3" / "sub2" / "deep") in roots
+    assert not any(r.startswith(str(tmp_path / "skip")) for r in roots)
+
+def test_parallel_walk_skips_unreadable_directories(tmp_path, monkeypatch):
+    import archiver.utils.walker as walker
+
+    _make_walk_tree(tmp_path)
+    unreadable = str(tmp_path / "d1")
+    scandir = os.scandir
+
+    def failing_scandir(path):
+        if os.fspath(path) == unreadable:
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(walker.os, "scandir", failing_scandir)
+
+    roots = {root for root, dirs, files in walker.parallel_walk(tmp_path, workers=4)}
+
+    assert str(tmp_path / "d2" / "sub0" / "deep") in roots
+    assert not any(r.startswith(unreadable) for r in roots)
+
+def _track_concurrency(monkeypatch, delay: float = 0.05) -> dict:
+    """Count extractions running at once, slowing each one down a little."""
+    seen = {"running": 0, "max": 0}
+    lock = threading.Lock()
+    timed_process = ArchiveProcessor._timed_process
+
+    def tracking(self, job):
+        with lock:
+            seen["running"] += 1
+            seen["max"] = max(seen["max"], seen["running"])
+        try:
+            time.sleep(delay)
+            return timed_process(self, job)
+        finally:
+            with lock:
+                seen["running"] -= 1
+
+    monkeypatch.setattr(ArchiveProcessor, "_timed_process", tracking)
+    return seen
+
+@pytest.mark.parametrize("cap", [1, 2])
+def test_device_cap_limits_concurrent_extractions(tmp_path, monkeypatch, cap):
+    _make_zips(tmp_path, 8)
+    seen = _track_concurrency(monkeypatch)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, parallel_processing=True, max_workers=4,
+        device_workers={str(tmp_path): cap}
+    ))
+
+    stats = processor.process_directory()
+
+    assert stats["successful_extractions"] == 8
+    assert seen["max"] == cap
+    assert stats["device_limits"].endswith(f"={cap}")
+
+def test_device_auto_tuning_stays_within_bounds(monkeypatch):
+    import random
+    from archiver.utils.devices import DeviceState
+
+    now = [0.0]
+    monkeypatch.setattr("archiver.utils.devices.time.monotonic", lambda: now[0])
+    state = DeviceState(limit=2, max_limit=4)
+    rng = random.Random(1)
+    limits = set()
+    for _ in range(400):
+        # Throughput peaks at three concurrent jobs, with some noise
+        now[0] += 1.0 / (1 + 3 - abs(state.limit - 3) + rng.random() * 0.5)
+        state.observe(1024 * 1024, window=4)
+        limits.add(state.limit)
+        assert 1 <= state.limit <= 4
+
+    assert 3 in limits and len(limits) > 1
+
+def test_runs_sharing_a_device_wait_instead_of_spinning(tmp_path, monkeypatch):
+    from archiver.utils.devices import DeviceLimiter
+
+    shares = [tmp_path / "a", tmp_path / "b"]
+    for share in shares:
+        share.mkdir()
+        _make_zips(share, 3)
+    _track_concurrency(monkeypatch, delay=0.2)
+    attempts = []
+    try_acquire = DeviceLimiter.try_acquire
+
+    def counting_acquire(self, job):
+        attempts.append(job.path)
+        return try_acquire(self, job)
+
+    monkeypatch.setattr(DeviceLimiter, "try_acquire", counting_acquire)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, parallel_processing=True, max_workers=2,
+        device_workers={str(tmp_path): 1}
+    ))
+    results = {}
+    runs = [
+        threading.Thread(target=lambda s=s: results.update({s: list(processor.iter_directory(s))}))
+        for s in shares
+    ]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+
+    assert all(job.success for jobs in results.values() for job in jobs)
+    assert sum(len(jobs) for jobs in results.values()) == 6
+    # Six jobs of 0.2s each; polling would try thousands of times
+    assert len(attempts) < 100
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_runs_wait_for_space_held_by_other_runs(tmp_path, monkeypatch, parallel):
+    shares = [tmp_path / "a", tmp_path / "b"]
+    for share in shares:
+        share.mkdir()
+        with zipfile.ZipFile(share / "part.zip", "w") as archive:
+            archive.writestr("part/data.bin", b"x" * 60_000)
+    _track_concurrency(monkeypatch, delay=0.2)
+    processor = ArchiveProcessor(ArchiveConfig(
+        base_dir=tmp_path, parallel_processing=parallel, max_workers=2
+    ))
+    # Room for one archive at a time across both runs
+    _limit_free_space(processor, 100_000)
+    results = {}
+    runs = [
+        threading.Thread(target=lambda s=s: results.update({s: list(processor.iter_directory(s))}))
+        for s in shares
+    ]
+    for run in runs:
+        run.start()
+    for run in runs:
+        run.join()
+
+    assert [job.success for s in shares for job in results[s]] == [True, True]
+    assert all((s / "part" / "data.bin").exists() for s in shares)
+
+def test_writer_without_config_preserves_metadata(tmp_path):
+    from archiver.extractors.zip import ZipExtractor
+
+    writer = ZipExtractor(tmp_path).create_writer(tmp_path / "out")
+
+    assert writer.preserve_metadata is True